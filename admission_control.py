@@ -0,0 +1,158 @@
+"""
+Admission control for the research and transcription endpoints.
+
+Each workload class gets a bounded pool of execution slots and a short,
+bounded wait queue. When both are full the request is rejected straight
+away so the server keeps finishing the work it already accepted instead of
+letting every request time out together.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+
+class PoolFullError(Exception):
+    """Raised when a request cannot be admitted to an admission pool"""
+
+    def __init__(self, pool_name, retry_after):
+        super().__init__(f"Admission pool '{pool_name}' is full")
+        self.pool_name = pool_name
+        self.retry_after = retry_after
+
+
+class AdmissionPool:
+    """
+    Bounded concurrency pool with a bounded wait queue.
+
+    Args:
+        name: Workload class name used in stats and errors
+        max_concurrency: Number of requests allowed to run at once
+        max_queue: Number of requests allowed to wait for a slot
+        max_wait: Seconds a queued request waits before being rejected
+        initial_service_time: Service time estimate used before any request completes
+    """
+
+    # Weight given to the newest observation in the service time average
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, name, max_concurrency, max_queue, max_wait, initial_service_time=1.0):
+        self.name = name
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.max_wait = float(max_wait)
+
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._service_time = float(initial_service_time)
+
+        # Counters exported through stats()
+        self._admitted = 0
+        self._completed = 0
+        self._rejected_full = 0
+        self._rejected_timeout = 0
+
+    def retry_after(self):
+        """Estimate in whole seconds until a new request could be served"""
+        with self._cond:
+            return self._retry_after_locked()
+
+    def _retry_after_locked(self):
+        backlog = self._waiting + 1
+        estimate = self._service_time * backlog / self.max_concurrency
+        return max(1, int(math.ceil(estimate)))
+
+    def acquire(self):
+        """Take a slot, waiting in the queue if needed. Raises PoolFullError on rejection."""
+        with self._cond:
+            if self._active < self.max_concurrency and self._waiting == 0:
+                self._active += 1
+                self._admitted += 1
+                return
+
+            if self._waiting >= self.max_queue:
+                self._rejected_full += 1
+                raise PoolFullError(self.name, self._retry_after_locked())
+
+            self._waiting += 1
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while self._active >= self.max_concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._rejected_timeout += 1
+                        raise PoolFullError(self.name, self._retry_after_locked())
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+            self._active += 1
+            self._admitted += 1
+
+    def release(self, service_time=None):
+        """Return a slot and fold the observed service time into the estimate"""
+        with self._cond:
+            self._active -= 1
+            self._completed += 1
+            if service_time is not None:
+                self._service_time += self.EWMA_ALPHA * (service_time - self._service_time)
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        """Context manager holding one slot for the duration of the block"""
+        self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def stats(self):
+        """Return a snapshot of the pool's queue depth and counters"""
+        with self._cond:
+            return {
+                "name": self.name,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "queue_depth": self._waiting,
+                "admitted": self._admitted,
+                "completed": self._completed,
+                "rejected_full": self._rejected_full,
+                "rejected_timeout": self._rejected_timeout,
+                "avg_service_time": round(self._service_time, 3),
+            }
+
+
+def admit(pool):
+    """
+    Decorator running a Flask view inside a slot of the given pool.
+
+    `pool` may also be a callable returning the pool to use, for views whose
+    workload class depends on the request. Streamed responses hold their slot
+    until the response is closed.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            target = pool() if callable(pool) and not isinstance(pool, AdmissionPool) else pool
+            target.acquire()
+            started = time.monotonic()
+            try:
+                response = view(*args, **kwargs)
+            except BaseException:
+                target.release(time.monotonic() - started)
+                raise
+
+            # Streamed responses keep working after the view returns, so the
+            # slot is held until the server closes the response.
+            if getattr(response, "is_streamed", False):
+                response.call_on_close(lambda: target.release(time.monotonic() - started))
+            else:
+                target.release(time.monotonic() - started)
+            return response
+        return wrapper
+    return decorator
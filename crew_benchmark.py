@@ -0,0 +1,174 @@
+"""
+Offline benchmark of the startup research crew.
+
+Records one live evaluation into an LLM fixture file, then replays it any
+number of times with simulated LLM latency, so orchestration overhead,
+checkpoint writes, report rendering and the effect of parallel task
+execution can be measured reproducibly and without API costs.
+
+Usage:
+    python crew_benchmark.py record --idea "AI tool for personalized mental health"
+    python crew_benchmark.py replay --runs 5 --parallel 1 3
+    python crew_benchmark.py replay --latency 0 --output crew_report.json
+
+Runs write their outputs, manifest and render cache into a scratch
+directory (a temporary one unless --workdir is given).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+DEFAULT_IDEA = "AI tool for personalized mental health"
+
+
+def _stage_totals(before, after):
+    """Per-stage (count, seconds) observed between two STAGE_SECONDS snapshots"""
+    totals = {}
+    for (service, stage_name), (count, seconds) in after.items():
+        previous_count, previous_seconds = before.get((service, stage_name), (0, 0.0))
+        if count > previous_count:
+            totals[stage_name] = (count - previous_count, seconds - previous_seconds)
+    return totals
+
+
+def _time_renderers(markdown_text, title):
+    """Seconds each registered renderer takes for one report, skipping unavailable ones"""
+    from report_renderers import RENDERERS
+
+    timings = {}
+    for extension, (_, render) in RENDERERS.items():
+        started = time.perf_counter()
+        try:
+            render(markdown_text, title)
+        except ImportError:
+            continue
+        timings[extension] = round(time.perf_counter() - started, 4)
+    return timings
+
+
+def run_config(crew_class, idea, runs, max_parallel, stage_histogram):
+    """Evaluate `idea` `runs` times on a crew running up to `max_parallel` tasks at once"""
+    from startup_research import FINAL_REPORT_FILE, LLM_FIXTURES
+
+    crew = crew_class(max_parallel=max_parallel)
+    walls, llm_seconds, task_seconds, failures = [], [], [], 0
+    before = stage_histogram.snapshot()
+    renders = {}
+    for _ in range(runs):
+        # Each run replays the fixture from its first recording
+        LLM_FIXTURES.reset()
+        started = time.perf_counter()
+        result = crew.evaluate_startup(idea, reuse=False)
+        walls.append(time.perf_counter() - started)
+        if result.get("status") == "error":
+            failures += 1
+            print(f"  run failed: {result.get('error')}", file=sys.stderr)
+            continue
+
+        usage = crew.get_usage(result["research_id"]) or {"attempts": []}
+        for attempt in usage["attempts"]:
+            llm_seconds.append(attempt["totals"]["llm_seconds"])
+            task_seconds.append(sum(task["wall_seconds"] or 0 for task in attempt["tasks"]))
+        report = crew.read_run_file(result["research_id"], FINAL_REPORT_FILE)
+        if report and not renders:
+            renders = _time_renderers(report, f"Startup Evaluation: {idea}")
+
+    stages = _stage_totals(before, stage_histogram.snapshot())
+    mean_wall = statistics.mean(walls) if walls else 0.0
+    mean_llm = statistics.mean(llm_seconds) if llm_seconds else 0.0
+    return {
+        "max_parallel": max_parallel,
+        "runs": runs,
+        "failures": failures,
+        "wall_seconds": {
+            "mean": round(mean_wall, 4),
+            "min": round(min(walls), 4) if walls else None,
+            "max": round(max(walls), 4) if walls else None,
+        },
+        # LLM time summed over tasks; above the wall time when tasks overlap
+        "llm_seconds_mean": round(mean_llm, 4),
+        "task_seconds_mean": round(statistics.mean(task_seconds), 4) if task_seconds else 0.0,
+        "parallel_speedup": round(mean_llm / mean_wall, 2) if mean_wall else None,
+        "stages": {
+            name: {"count": count, "seconds": round(seconds, 4)}
+            for name, (count, seconds) in sorted(stages.items())
+        },
+        "render_seconds": renders,
+    }
+
+
+def print_report(report):
+    """Print a compact human-readable report"""
+    print(f"Fixture: {report['fixture']} ({report['recorded_calls']} calls), "
+          f"latency {report['latency']} x{report['latency_scale']}")
+    for config in report["configs"]:
+        wall = config["wall_seconds"]
+        print(f"\nmax_parallel={config['max_parallel']}: {config['runs']} runs, {config['failures']} failed")
+        print(f"  wall     mean {wall['mean']:.3f}s  min {wall['min'] or 0:.3f}s  max {wall['max'] or 0:.3f}s")
+        print(f"  llm      {config['llm_seconds_mean']:.3f}s per run, speedup x{config['parallel_speedup']}")
+        print(f"  tasks    {config['task_seconds_mean']:.3f}s per run")
+        for name, stage_stats in config["stages"].items():
+            print(f"  {name:<24} {stage_stats['count']:>4}x  {stage_stats['seconds']:.4f}s")
+        for extension, seconds in config["render_seconds"].items():
+            print(f"  render {extension:<17} {seconds:.4f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or replay startup research crew runs")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--fixture", default="llm_fixtures.jsonl", help="LLM fixture file")
+    parser.add_argument("--idea", default=DEFAULT_IDEA, help="Startup idea to evaluate")
+    parser.add_argument("--runs", type=int, default=3, help="Replayed runs per configuration")
+    parser.add_argument("--parallel", type=int, nargs="+", default=[1, 3], help="max_parallel values to compare")
+    parser.add_argument("--latency", default="recorded", help="'recorded' or a fixed latency in seconds")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier for replayed latency")
+    parser.add_argument("--workdir", help="Directory for run outputs (default: a temporary directory)")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    fixture = os.path.abspath(args.fixture)
+    output = os.path.abspath(args.output) if args.output else None
+    if args.mode == "record" and os.path.exists(fixture):
+        parser.error(f"{fixture} exists; remove it or pick another --fixture")
+
+    # Fixture settings are read when startup_research is imported
+    os.environ["LLM_FIXTURE_MODE"] = args.mode
+    os.environ["LLM_FIXTURE_FILE"] = fixture
+    os.environ["LLM_REPLAY_LATENCY"] = args.latency
+    os.environ["LLM_REPLAY_LATENCY_SCALE"] = str(args.latency_scale)
+    os.chdir(args.workdir or tempfile.mkdtemp(prefix="crew_benchmark_"))
+    os.environ.setdefault("RESEARCH_CACHE_DIR", os.path.join(os.getcwd(), "research_cache"))
+
+    from instrumentation import STAGE_SECONDS
+    from startup_research import LLM_FIXTURES, StartupResearchCrew
+
+    if args.mode == "record":
+        crew = StartupResearchCrew()
+        result = crew.evaluate_startup(args.idea, reuse=False)
+        print(json.dumps(result, indent=2))
+        return
+
+    report = {
+        "fixture": fixture,
+        "recorded_calls": len(LLM_FIXTURES),
+        "latency": args.latency,
+        "latency_scale": args.latency_scale,
+        "workdir": os.getcwd(),
+        "configs": [
+            run_config(StartupResearchCrew, args.idea, args.runs, max_parallel, STAGE_SECONDS)
+            for max_parallel in args.parallel
+        ],
+    }
+    print_report(report)
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Weighted fair scheduling of LLM calls.
+
+Every LLM call takes a slot from a FairScheduler before it is sent. Waiting
+calls are grouped into flows, one per (priority class, client), and served
+in start-time fair queuing order, so a client with many queued calls gets
+one flow's share instead of every slot. Flows in higher priority classes
+get larger weights, and a few slots are held back for interactive calls so
+batch work can never occupy all of them.
+"""
+import base64
+import contextvars
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from instrumentation import REGISTRY
+
+# Relative share of each priority class; a flow's share grows with its weight
+CLASS_WEIGHTS = {"interactive": 8.0, "standard": 4.0, "batch": 1.0}
+
+LLM_QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "llm_queue_wait_seconds",
+    "Time LLM calls waited for a scheduler slot",
+    ("scheduler", "priority_class")
+)
+
+# Client and priority class for LLM calls made from code that has no request
+# at hand (crew tasks), set with llm_client()
+_current_client = contextvars.ContextVar("llm_client", default=("anonymous", "standard"))
+
+
+class _Waiter:
+    __slots__ = ("flow", "start_tag", "weight", "seq", "granted")
+
+    def __init__(self, flow, start_tag, weight, seq):
+        self.flow = flow
+        self.start_tag = start_tag
+        self.weight = weight
+        self.seq = seq
+        self.granted = False
+
+
+class FairScheduler:
+    """
+    Bounded pool of LLM call slots shared fairly between clients and classes.
+
+    Args:
+        name: Scheduler name used in metrics
+        capacity: Number of LLM calls allowed in flight at once
+        interactive_reserved: Slots only interactive calls may use
+    """
+
+    def __init__(self, name, capacity, interactive_reserved=1, class_weights=None):
+        self.name = name
+        self.capacity = max(1, int(capacity))
+        self.interactive_reserved = min(max(0, int(interactive_reserved)), self.capacity - 1)
+        self.class_weights = dict(class_weights or CLASS_WEIGHTS)
+
+        self._cond = threading.Condition()
+        self._active = 0
+        self._active_non_interactive = 0
+        self._virtual_time = 0.0
+        self._finish_tags = {}
+        self._waiters = []
+        self._seq = itertools.count()
+
+        # Per-class counters exported through stats()
+        self._served = {cls: 0 for cls in self.class_weights}
+        self._wait_total = {cls: 0.0 for cls in self.class_weights}
+        self._wait_max = {cls: 0.0 for cls in self.class_weights}
+
+    def _eligible(self, waiter):
+        if waiter.flow[0] == "interactive":
+            return True
+        return self._active_non_interactive < self.capacity - self.interactive_reserved
+
+    def _dispatch(self):
+        """Grant free slots to the waiters with the smallest start tags"""
+        granted = False
+        while self._active < self.capacity:
+            candidates = [w for w in self._waiters if self._eligible(w)]
+            if not candidates:
+                break
+            waiter = min(candidates, key=lambda w: (w.start_tag, -w.weight, w.seq))
+            self._waiters.remove(waiter)
+            waiter.granted = True
+            self._virtual_time = max(self._virtual_time, waiter.start_tag)
+            self._active += 1
+            if waiter.flow[0] != "interactive":
+                self._active_non_interactive += 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def acquire(self, client_id, priority_class="standard"):
+        """Wait for a slot for one LLM call. Returns the seconds spent waiting."""
+        if priority_class not in self.class_weights:
+            priority_class = "standard"
+        flow = (priority_class, client_id)
+        weight = self.class_weights[priority_class]
+        started = time.monotonic()
+
+        with self._cond:
+            start_tag = max(self._virtual_time, self._finish_tags.get(flow, 0.0))
+            self._finish_tags[flow] = start_tag + 1.0 / weight
+            waiter = _Waiter(flow, start_tag, weight, next(self._seq))
+            self._waiters.append(waiter)
+            self._dispatch()
+            while not waiter.granted:
+                self._cond.wait()
+
+            waited = time.monotonic() - started
+            self._served[priority_class] += 1
+            self._wait_total[priority_class] += waited
+            self._wait_max[priority_class] = max(self._wait_max[priority_class], waited)
+
+        LLM_QUEUE_WAIT_SECONDS.observe(waited, scheduler=self.name, priority_class=priority_class)
+        return waited
+
+    def release(self, priority_class="standard"):
+        """Return a slot taken by acquire()"""
+        with self._cond:
+            self._active -= 1
+            if priority_class != "interactive":
+                self._active_non_interactive -= 1
+            # Forget idle flows so the tag table does not grow without bound
+            if not self._waiters and self._active == 0:
+                self._finish_tags.clear()
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, client_id=None, priority_class=None):
+        """
+        Hold a slot for the duration of the block. Without arguments the
+        client and class set by llm_client() are used.
+        """
+        if client_id is None or priority_class is None:
+            default_client, default_class = _current_client.get()
+            client_id = client_id or default_client
+            priority_class = priority_class or default_class
+        if priority_class not in self.class_weights:
+            priority_class = "standard"
+
+        self.acquire(client_id, priority_class)
+        try:
+            yield
+        finally:
+            self.release(priority_class)
+
+    def stats(self):
+        """Return in-flight calls, queue depth and wait times per class"""
+        with self._cond:
+            waiting = {cls: 0 for cls in self.class_weights}
+            for waiter in self._waiters:
+                waiting[waiter.flow[0]] += 1
+            return {
+                "name": self.name,
+                "capacity": self.capacity,
+                "interactive_reserved": self.interactive_reserved,
+                "active": self._active,
+                "classes": {
+                    cls: {
+                        "waiting": waiting[cls],
+                        "served": self._served[cls],
+                        "avg_wait": round(self._wait_total[cls] / self._served[cls], 3) if self._served[cls] else 0.0,
+                        "max_wait": round(self._wait_max[cls], 3),
+                    }
+                    for cls in self.class_weights
+                },
+            }
+
+    def collect_metrics(self):
+        """Metric samples for instrumentation's /metrics collector"""
+        stats = self.stats()
+        return [
+            ("llm_scheduler_active_calls", "gauge", "LLM calls currently holding a scheduler slot",
+             [({"scheduler": self.name}, stats["active"])]),
+            ("llm_scheduler_waiting_calls", "gauge", "LLM calls waiting for a scheduler slot",
+             [({"scheduler": self.name, "priority_class": cls}, c["waiting"]) for cls, c in stats["classes"].items()]),
+        ]
+
+
+@contextmanager
+def llm_client(client_id, priority_class):
+    """Attribute LLM calls made inside the block to a client and priority class"""
+    token = _current_client.set((client_id, priority_class))
+    try:
+        yield
+    finally:
+        _current_client.reset(token)
+
+
+def current_llm_client():
+    """Return the (client_id, priority_class) set by llm_client()"""
+    return _current_client.get()
+
+
+def _b64decode(segment):
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def user_id_from_token(token, secret):
+    """Return the `id` claim of an HS256 JWT signed with `secret`, or None"""
+    try:
+        header_b64, payload_b64, signature_b64 = token.split(".")
+        header = json.loads(_b64decode(header_b64))
+        if header.get("alg") != "HS256":
+            return None
+        expected = hmac.new(secret.encode(), f"{header_b64}.{payload_b64}".encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature_b64)):
+            return None
+        payload = json.loads(_b64decode(payload_b64))
+        if payload.get("exp") and payload["exp"] < time.time():
+            return None
+        return str(payload.get("id")) if payload.get("id") is not None else None
+    except (ValueError, TypeError):
+        return None
+
+
+def request_client_id():
+    """
+    Identify the caller of the current Flask request: the user id from the
+    app's JWT (Authorization bearer token or `token` cookie) when JWT_SECRET
+    is configured, otherwise the remote address.
+    """
+    from flask import request
+    from flask_limiter.util import get_remote_address
+
+    secret = os.getenv("JWT_SECRET")
+    if secret:
+        auth = request.headers.get("Authorization", "")
+        token = auth.split(" ", 1)[1] if auth.startswith("Bearer ") else request.cookies.get("token")
+        if token:
+            user_id = user_id_from_token(token, secret)
+            if user_id:
+                return f"user:{user_id}"
+    return f"addr:{get_remote_address()}"
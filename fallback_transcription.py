@@ -13,21 +13,18 @@ from pydub import AudioSegment
 import requests
 from dotenv import load_dotenv
 
+from instrumentation import stage
+from logging_setup import configure_logging
+
 # Load environment variables
 load_dotenv()
 
 # Get API keys
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+OPENAI_API_BASE = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1").rstrip("/")
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("fallback_transcription.log"),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging (no-op if the importing service already configured it)
+configure_logging("fallback_transcription", log_file="fallback_transcription.log")
 logger = logging.getLogger(__name__)
 
 def transcribe_with_google(audio_segment, language="en-US"):
@@ -48,7 +45,8 @@ def transcribe_with_google(audio_segment, language="en-US"):
             audio_data = recognizer.record(source)
             
         # Perform the transcription
-        transcript = recognizer.recognize_google(audio_data, language=language)
+        with stage("google_transcribe"):
+            transcript = recognizer.recognize_google(audio_data, language=language)
         
         # Clean up temporary file
         if os.path.exists(temp_file_path):
@@ -76,7 +74,8 @@ def process_audio_data(audio_data_base64, audio_format="wav"):
         audio_buffer = BytesIO(audio_data)
         
         # Convert to AudioSegment
-        audio_segment = AudioSegment.from_file(audio_buffer, format=audio_format)
+        with stage("audio_decode"):
+            audio_segment = AudioSegment.from_file(audio_buffer, format=audio_format)
         
         # Normalize audio (adjust volume to a standard level)
         audio_segment = audio_segment.normalize()
@@ -122,23 +121,24 @@ def generate_summary(transcript):
         Include only what was actually discussed in the meeting - do not invent or assume additional content."""
         
         # API call to OpenAI
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {OPENAI_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "gpt-3.5-turbo",
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                "max_tokens": 1000,
-                "temperature": 0.7
-            },
-            timeout=30
-        )
+        with stage("openai_summary"):
+            response = requests.post(
+                f"{OPENAI_API_BASE}/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {OPENAI_API_KEY}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": "gpt-3.5-turbo",
+                    "messages": [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    "max_tokens": 1000,
+                    "temperature": 0.7
+                },
+                timeout=30
+            )
         
         if response.status_code != 200:
             logger.error(f"OpenAI API error: {response.status_code} - {response.text}")
@@ -177,7 +177,8 @@ def transcribe_audio_file(file_path):
     """
     try:
         # Load audio file
-        audio_segment = AudioSegment.from_file(file_path)
+        with stage("audio_decode"):
+            audio_segment = AudioSegment.from_file(file_path)
         
         # Transcribe
         transcript = transcribe_with_google(audio_segment)
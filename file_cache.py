@@ -0,0 +1,116 @@
+"""
+Validators and precompressed variants for served research files.
+
+Content-hash ETags are memoized per (path, mtime, size), and gzip / brotli
+copies of text files are written once into a cache directory next to the
+research outputs, so repeat downloads cost a hash lookup or a 304.
+"""
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # Optional: fall back to gzip only
+    brotli = None
+
+CACHE_DIR = Path(os.getenv("RESEARCH_CACHE_DIR", "research_cache"))
+
+# Formats that are already compressed gain nothing from another pass
+COMPRESSIBLE_MIME_TYPES = {"text/markdown", "text/html", "text/plain", "application/json"}
+
+# Files smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+_etag_cache = {}
+_lock = threading.Lock()
+
+
+def _file_key(path):
+    st = os.stat(path)
+    return (str(path), st.st_mtime_ns, st.st_size)
+
+
+def content_etag(path):
+    """Return a strong ETag value (without quotes) derived from the file's content"""
+    key = _file_key(path)
+    with _lock:
+        cached = _etag_cache.get(key)
+    if cached:
+        return cached
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    etag = digest.hexdigest()[:32]
+
+    with _lock:
+        # Drop stale entries for the same path
+        for stale in [k for k in _etag_cache if k[0] == key[0]]:
+            del _etag_cache[stale]
+        _etag_cache[key] = etag
+    return etag
+
+
+def available_encodings():
+    """Content encodings this process can produce, best first"""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick the best supported encoding from an Accept-Encoding header, or None"""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if token:
+            accepted[token.strip().lower()] = quality
+
+    for encoding in available_encodings():
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+def is_compressible(path, mime_type):
+    """Whether a precompressed variant is worth serving for this file"""
+    return mime_type in COMPRESSIBLE_MIME_TYPES and os.path.getsize(path) >= MIN_COMPRESS_SIZE
+
+
+def compressed_variant(path, encoding):
+    """
+    Return the path of a compressed copy of `path`, creating it on first use.
+
+    Variants are keyed by content hash, so an updated file gets a new variant
+    and unchanged files are compressed exactly once.
+    """
+    etag = content_etag(path)
+    suffix = {"gzip": ".gz", "br": ".br"}[encoding]
+    variant = CACHE_DIR / f"{etag}{suffix}"
+    if variant.exists():
+        return variant
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(path, "rb") as f:
+        data = f.read()
+    if encoding == "br":
+        compressed = brotli.compress(data, quality=11)
+    else:
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+
+    # Write atomically so concurrent requests never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(compressed)
+    os.replace(tmp_path, variant)
+    return variant
@@ -0,0 +1,156 @@
+"""
+GitLab REST client for the MCP server.
+
+Collections are read completely rather than just GitLab's first page:
+project lists are walked with keyset pagination, and issue lists fetch the
+first page and then the remaining pages concurrently, up to a configurable
+number of items. Every GET is revalidated with the ETag of its last
+response, so an unchanged page costs a 304 instead of a full payload.
+Projects are requested with simple=true and issues are projected down to
+the fields the dashboard uses.
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import requests
+
+from instrumentation import stage
+
+PER_PAGE = 100
+# Most items returned for one collection
+MAX_ITEMS = int(os.getenv("GITLAB_MAX_ITEMS", "2000"))
+# Pages of one collection fetched at once
+PAGE_CONCURRENCY = int(os.getenv("GITLAB_PAGE_CONCURRENCY", "4"))
+# Responses kept for conditional revalidation
+ETAG_CACHE_SIZE = int(os.getenv("GITLAB_ETAG_CACHE_SIZE", "512"))
+
+ISSUE_FIELDS = (
+    "id", "iid", "project_id", "title", "description", "state", "labels", "web_url",
+    "created_at", "updated_at", "closed_at", "author", "assignees", "milestone",
+)
+
+
+def project_issue(issue):
+    """An issue reduced to ISSUE_FIELDS"""
+    return {field: issue[field] for field in ISSUE_FIELDS if field in issue}
+
+
+class GitLabError(Exception):
+    """A GitLab request returned an error status"""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class GitLabClient:
+    """
+    Pooled, revalidating GitLab API v4 client.
+
+    Args:
+        base_url: GitLab instance URL, e.g. https://gitlab.com
+        token: Personal access token
+    """
+
+    def __init__(self, base_url, token):
+        self.api_url = f"{base_url.rstrip('/')}/api/v4"
+        self.token = token
+        self._http = requests.Session()
+        self._http.headers["Authorization"] = f"Bearer {token}"
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(PAGE_CONCURRENCY, 10))
+        self._http.mount("http://", adapter)
+        self._http.mount("https://", adapter)
+        self._pages = ThreadPoolExecutor(max_workers=PAGE_CONCURRENCY, thread_name_prefix="gitlab-page")
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "not_modified": 0}
+
+    def get(self, path, params=None):
+        """
+        GET a path under /api/v4 (or an absolute URL), revalidating a cached
+        copy with If-None-Match. Returns (json payload, response headers).
+
+        Raises:
+            GitLabError: on a non-2xx, non-304 response
+        """
+        url = path if path.startswith("http") else f"{self.api_url}{path}"
+        if params:
+            url = f"{url}?{urlencode(sorted(params.items()))}"
+
+        with self._lock:
+            cached = self._cache.get(url)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+        response = self._http.get(url, headers=headers, timeout=30)
+        with self._lock:
+            self.stats["requests"] += 1
+
+        if response.status_code == 304 and cached:
+            with self._lock:
+                self.stats["not_modified"] += 1
+                self._cache.move_to_end(url)
+            return cached[1], cached[2]
+        if not response.ok:
+            raise GitLabError(response.status_code, f"GitLab returned {response.status_code} for {path}")
+
+        payload = response.json()
+        etag = response.headers.get("ETag")
+        if etag:
+            with self._lock:
+                self._cache[url] = (etag, payload, response.headers)
+                self._cache.move_to_end(url)
+                while len(self._cache) > ETAG_CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        return payload, response.headers
+
+    def _keyset_pages(self, path, params, limit):
+        """Follow the rel="next" links of a keyset-paginated collection"""
+        items = []
+        url, query = path, dict(params, pagination="keyset", order_by="id", sort="asc", per_page=PER_PAGE)
+        while url and len(items) < limit:
+            page, headers = self.get(url, query)
+            items.extend(page)
+            links = requests.utils.parse_header_links(headers.get("Link", ""))
+            # The next link carries the whole query, including the keyset cursor
+            url, query = next((link["url"] for link in links if link.get("rel") == "next"), None), None
+        return items[:limit], bool(url) or len(items) > limit
+
+    def _offset_pages(self, path, params, limit):
+        """Fetch the first page, then the remaining ones concurrently"""
+        params = dict(params, per_page=PER_PAGE)
+        first, headers = self.get(path, dict(params, page=1))
+        max_pages = max(1, (limit + PER_PAGE - 1) // PER_PAGE)
+        total_pages = headers.get("X-Total-Pages")
+
+        items = list(first)
+        if total_pages:
+            # Offset pages are independent, so they can be fetched in parallel
+            pages = list(range(2, min(int(total_pages), max_pages) + 1))
+            for page, _ in self._pages.map(lambda number: self.get(path, dict(params, page=number)), pages):
+                items.extend(page)
+            truncated = int(total_pages) > max_pages
+        else:
+            # GitLab omits totals for very large collections; walk X-Next-Page instead
+            next_page = headers.get("X-Next-Page")
+            while next_page and len(items) < limit:
+                page, headers = self.get(path, dict(params, page=int(next_page)))
+                items.extend(page)
+                next_page = headers.get("X-Next-Page")
+            truncated = bool(next_page)
+        return items[:limit], truncated or len(items) > limit
+
+    def projects(self, limit=MAX_ITEMS, **params):
+        """
+        Projects the token's user is a member of, in the simple representation.
+        Returns (projects, truncated).
+        """
+        with stage("gitlab_projects"):
+            return self._keyset_pages("/projects", dict({"membership": "true", "simple": "true"}, **params), limit)
+
+    def issues(self, project_id, limit=MAX_ITEMS, **params):
+        """Issues of a project reduced to ISSUE_FIELDS. Returns (issues, truncated)."""
+        with stage("gitlab_issues"):
+            issues, truncated = self._offset_pages(f"/projects/{project_id}/issues", params, limit)
+        return [project_issue(issue) for issue in issues], truncated
@@ -0,0 +1,304 @@
+"""
+Local SQLite mirror of GitLab issues, kept current with delta syncs.
+
+A project is mirrored from the first time its issues are requested: that
+request runs a full sync, and from then on a background thread asks GitLab
+only for issues updated since the newest `updated_at` already stored
+(`updated_after`), on a schedule or right away when a webhook reports a
+change. Issue lists are served from the mirror with filtering and sorting,
+so GitLab API use scales with how often issues change rather than with how
+often they are viewed.
+
+Deleted and moved issues never show up in a delta, so each project is also
+fully re-synced once per full_sync_interval.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from instrumentation import stage
+
+logger = logging.getLogger("mcp_server")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS issues (
+    id INTEGER PRIMARY KEY,
+    project_id INTEGER NOT NULL,
+    iid INTEGER NOT NULL,
+    state TEXT,
+    title TEXT,
+    description TEXT,
+    labels TEXT NOT NULL DEFAULT '[]',
+    created_at TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS issues_project_updated ON issues (project_id, updated_at);
+CREATE TABLE IF NOT EXISTS projects (
+    project_id INTEGER PRIMARY KEY,
+    updated_after TEXT,
+    last_sync REAL,
+    last_full_sync REAL
+);
+"""
+
+# Sort keys accepted by IssueMirror.list, as in GitLab's order_by
+ORDER_BY = ('created_at', 'updated_at', 'title')
+
+
+def issue_row(issue):
+    """Stored columns of an issue from the REST API"""
+    return (
+        issue['id'],
+        issue['project_id'],
+        issue['iid'],
+        issue.get('state'),
+        issue.get('title'),
+        issue.get('description'),
+        json.dumps(issue.get('labels', [])),
+        issue.get('created_at'),
+        issue.get('updated_at'),
+        json.dumps(issue),
+    )
+
+
+def _like(word):
+    escaped = word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+class IssueMirror:
+    """Thread-safe access to the issue mirror"""
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    def project(self, project_id):
+        """Sync state of a mirrored project, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM projects WHERE project_id = ?", (project_id,)).fetchone()
+        return dict(row) if row else None
+
+    def projects(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM projects ORDER BY project_id").fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self, project_id=None):
+        with self._lock:
+            if project_id is None:
+                return self._conn.execute("SELECT COUNT(*) FROM issues").fetchone()[0]
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM issues WHERE project_id = ?", (project_id,)
+            ).fetchone()[0]
+
+    def _set_project(self, project_id, updated_after, full):
+        # Callers hold self._lock inside a transaction
+        now = time.time()
+        self._conn.execute(
+            "INSERT INTO projects (project_id, updated_after, last_sync, last_full_sync) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (project_id) DO UPDATE SET updated_after = excluded.updated_after, "
+            "last_sync = excluded.last_sync, "
+            "last_full_sync = COALESCE(excluded.last_full_sync, projects.last_full_sync)",
+            (project_id, updated_after, now, now if full else None)
+        )
+
+    def replace_project(self, project_id, issues, updated_after):
+        """Swap in a project's full issue list, in one transaction"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM issues WHERE project_id = ?", (project_id,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [issue_row(issue) for issue in issues]
+            )
+            self._set_project(project_id, updated_after, full=True)
+
+    def apply_delta(self, project_id, issues, updated_after):
+        """Insert or replace changed issues and move the project's cursor"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [issue_row(issue) for issue in issues]
+            )
+            self._set_project(project_id, updated_after, full=False)
+
+    def upsert_issue(self, issue):
+        """Store a single issue (e.g. one just created) if its project is mirrored"""
+        with self._lock, self._conn:
+            mirrored = self._conn.execute(
+                "SELECT 1 FROM projects WHERE project_id = ?", (issue['project_id'],)
+            ).fetchone()
+            if mirrored:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", issue_row(issue)
+                )
+        return bool(mirrored)
+
+    def list(self, project_id, state=None, labels=None, search=None,
+             order_by='created_at', sort='desc', limit=20, offset=0):
+        """
+        Return (issues, total) for a project. `labels` is a list of labels an
+        issue must all carry; every word of `search` must appear in the title
+        or description.
+        """
+        if order_by not in ORDER_BY:
+            raise ValueError(f"order_by must be one of {', '.join(ORDER_BY)}")
+        if sort not in ('asc', 'desc'):
+            raise ValueError("sort must be asc or desc")
+
+        clauses = ["project_id = ?"]
+        params = [project_id]
+        if state and state != 'all':
+            clauses.append("state = ?")
+            params.append(state)
+        for label in labels or []:
+            clauses.append("labels LIKE ? ESCAPE '\\'")
+            params.append(_like(json.dumps(label)))
+        for word in (search or "").split():
+            clauses.append("(title LIKE ? ESCAPE '\\' OR description LIKE ? ESCAPE '\\')")
+            params.extend([_like(word)] * 2)
+        where = f"WHERE {' AND '.join(clauses)}"
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM issues {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT data FROM issues {where} ORDER BY {order_by} {sort}, id {sort} LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return [json.loads(row['data']) for row in rows], total
+
+
+class IssueSync:
+    """
+    Background thread keeping an IssueMirror in step with GitLab.
+
+    Args:
+        client: GitLabClient used for the API calls
+        mirror: IssueMirror to update
+        interval: Seconds between scheduled delta syncs
+        full_sync_interval: Seconds after which a project is fully re-synced
+        max_issues: Most issues fetched for one project per sync
+    """
+
+    def __init__(self, client, mirror, interval=300, full_sync_interval=86400, max_issues=10000):
+        self.client = client
+        self.mirror = mirror
+        self.interval = interval
+        self.full_sync_interval = full_sync_interval
+        self.max_issues = max_issues
+        self._lock = threading.Lock()
+        self._project_locks = {}
+        self._pending = set()
+        self._wake = threading.Event()
+        self._thread = None
+        self.last_error = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="gitlab-mirror", daemon=True)
+            self._thread.start()
+
+    def trigger(self, project_id=None):
+        """Sync one project (or every mirrored one) now instead of at the next interval"""
+        with self._lock:
+            self._pending.add(project_id)
+        self._wake.set()
+
+    def ensure_project(self, project_id):
+        """Run a project's first sync now if it is not mirrored yet, so reads can be served locally"""
+        if self.mirror.project(project_id) is None:
+            self.sync_project(project_id)
+
+    def status(self):
+        return {
+            "projects": {
+                str(project["project_id"]): {
+                    "issues": self.mirror.count(project["project_id"]),
+                    "updated_after": project["updated_after"],
+                    "last_sync": project["last_sync"],
+                    "last_full_sync": project["last_full_sync"],
+                }
+                for project in self.mirror.projects()
+            },
+            "interval": self.interval,
+            "error": self.last_error
+        }
+
+    def _run(self):
+        # Webhook triggers must not postpone the scheduled sync of the other
+        # projects, so the schedule keeps its own deadline
+        next_scheduled = time.monotonic() + self.interval
+        while True:
+            self._wake.wait(max(0.0, next_scheduled - time.monotonic()))
+            self._wake.clear()
+            with self._lock:
+                pending, self._pending = self._pending, set()
+            if None in pending or time.monotonic() >= next_scheduled:
+                project_ids = [project["project_id"] for project in self.mirror.projects()]
+                next_scheduled = time.monotonic() + self.interval
+            else:
+                project_ids = sorted(pending)
+            for project_id in project_ids:
+                try:
+                    self.sync_project(project_id)
+                    self.last_error = None
+                except Exception as e:
+                    self.last_error = str(e)
+                    logger.warning(f"GitLab issue sync of project {project_id} failed: {str(e)}")
+
+    def _project_lock(self, project_id):
+        with self._lock:
+            return self._project_locks.setdefault(project_id, threading.Lock())
+
+    def sync_project(self, project_id):
+        """
+        Bring one project's issues up to date. Returns a summary of the sync.
+
+        Raises:
+            GitLabError: if GitLab rejects the request
+        """
+        project_id = int(project_id)
+        with self._project_lock(project_id):
+            project = self.mirror.project(project_id)
+            full = (
+                project is None
+                or not project["updated_after"]
+                or time.time() - (project["last_full_sync"] or 0) > self.full_sync_interval
+            )
+            params = {"state": "all", "order_by": "updated_at", "sort": "asc"}
+            if not full:
+                # updated_after is inclusive, so the newest stored issue comes back too
+                params["updated_after"] = project["updated_after"]
+
+            with stage("gitlab_mirror_sync"):
+                issues, truncated = self.client.issues(project_id, limit=self.max_issues, **params)
+            if truncated:
+                # Results are oldest change first, so the next delta resumes where this stopped
+                logger.warning(f"GitLab issue sync of project {project_id} stopped at {self.max_issues} issues")
+
+            previous = None if full else project["updated_after"]
+            changed = [issue for issue in issues if not previous or (issue.get("updated_at") or "") > previous]
+            updated_after = max([issue["updated_at"] for issue in issues if issue.get("updated_at")], default=previous)
+            if full:
+                self.mirror.replace_project(project_id, issues, updated_after)
+                logger.info(f"Full GitLab sync stored {len(issues)} issues of project {project_id}")
+            else:
+                self.mirror.apply_delta(project_id, issues, updated_after)
+                if changed:
+                    logger.info(f"GitLab sync of project {project_id}: {len(changed)} issues changed")
+            return {
+                "project_id": project_id,
+                "mode": "full" if full else "delta",
+                "changed": len(changed),
+                "truncated": truncated,
+                "updated_after": updated_after
+            }
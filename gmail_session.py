@@ -0,0 +1,248 @@
+"""
+Process-wide Gmail API session for the MCP server.
+
+Credentials are unpickled once and kept in memory. A background thread
+refreshes them shortly before they expire and writes them back, so requests
+never wait on a token refresh. API clients are built from the discovery
+document bundled with google-api-python-client, parsed once, and kept per
+thread because the underlying httplib2 connections are not thread-safe;
+each thread also keeps its connection alive between requests. The account
+profile is cached for a short TTL.
+"""
+import datetime
+import json
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+from google.auth.transport.requests import Request
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
+from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
+
+from instrumentation import stage
+
+logger = logging.getLogger("mcp_server")
+
+# Seconds before expiry at which credentials are refreshed
+REFRESH_MARGIN = int(os.getenv("GMAIL_REFRESH_MARGIN", "300"))
+# Seconds a fetched profile is served from memory
+PROFILE_TTL = int(os.getenv("GMAIL_PROFILE_TTL", "300"))
+# Pause before retrying a failed background refresh
+REFRESH_RETRY_SECONDS = 60
+# Message details are fetched in batches of at most this many calls
+# (Gmail accepts 100 per batch but rate-limits large ones)
+BATCH_SIZE = int(os.getenv("GMAIL_BATCH_SIZE", "50"))
+# Rounds of retries for calls in a batch that failed (rate limits, server
+# errors), waiting BATCH_BACKOFF seconds before the first and doubling after
+BATCH_RETRIES = int(os.getenv("GMAIL_BATCH_RETRIES", "4"))
+BATCH_BACKOFF = float(os.getenv("GMAIL_BATCH_BACKOFF", "1"))
+
+
+class GmailSession:
+    """
+    Cached credentials, API clients and profile for one Gmail account.
+
+    Args:
+        token_file: Pickled google.oauth2 credentials
+        api_endpoint: Base URL overriding the Gmail API host, or "" for Google
+    """
+
+    def __init__(self, token_file, api_endpoint=""):
+        self.token_file = token_file
+        self.api_endpoint = api_endpoint
+        self._lock = threading.Lock()
+        self._creds = None
+        self._loaded = False
+        # Bumped whenever credentials are replaced, so threads rebuild their client
+        self._generation = 0
+        self._local = threading.local()
+        self._document = None
+        self._profile = None
+        self._profile_at = 0.0
+        self._wake = threading.Event()
+        self._refresher = None
+
+    # ----- credentials -----
+
+    def _load(self):
+        if os.path.exists(self.token_file):
+            with stage("gmail_token_load"), open(self.token_file, 'rb') as token:
+                self._creds = pickle.load(token)
+        self._loaded = True
+
+    def _save(self, creds):
+        directory = os.path.dirname(os.path.abspath(self.token_file))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, 'wb') as token:
+            pickle.dump(creds, token)
+        os.replace(tmp_path, self.token_file)
+
+    def credentials(self):
+        """Usable credentials, or None if the user needs to authenticate"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                self._start_refresher()
+            creds = self._creds
+            if creds is None:
+                return None
+            if not creds.valid:
+                # The background refresh fell behind (or the token was loaded expired)
+                if not (creds.expired and creds.refresh_token):
+                    return None
+                self._refresh(creds)
+            return creds
+
+    def set_credentials(self, creds):
+        """Replace the credentials after a new authorization and persist them"""
+        with self._lock:
+            self._save(creds)
+            self._creds = creds
+            self._loaded = True
+            self._generation += 1
+            self._profile = None
+            self._start_refresher()
+        self._wake.set()
+
+    def _refresh(self, creds):
+        # Callers hold self._lock
+        with stage("gmail_token_refresh"):
+            creds.refresh(Request())
+        self._save(creds)
+        logger.info(f"Refreshed Gmail credentials, valid until {creds.expiry}")
+
+    def _seconds_until_refresh(self, creds):
+        if creds is None or not creds.refresh_token or creds.expiry is None:
+            return None
+        # google.auth keeps expiry as a naive UTC datetime
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return (creds.expiry - now).total_seconds() - REFRESH_MARGIN
+
+    def _start_refresher(self):
+        if self._refresher is None:
+            self._refresher = threading.Thread(target=self._refresh_loop, name="gmail-refresh", daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            with self._lock:
+                creds = self._creds
+            delay = self._seconds_until_refresh(creds)
+            if delay is None or delay > 0:
+                # Sleep until the refresh is due, or until credentials are replaced
+                if self._wake.wait(delay):
+                    self._wake.clear()
+                    continue
+            try:
+                with self._lock:
+                    if self._creds is creds:
+                        self._refresh(creds)
+            except Exception as e:
+                logger.warning(f"Background Gmail token refresh failed: {str(e)}")
+                time.sleep(REFRESH_RETRY_SECONDS)
+
+    # ----- API client -----
+
+    def _discovery_document(self):
+        if self._document is None:
+            self._document = json.loads(discovery_cache.get_static_doc("gmail", "v1"))
+        return self._document
+
+    def service(self):
+        """This thread's Gmail API client, or None if the user needs to authenticate"""
+        creds = self.credentials()
+        if creds is None:
+            return None
+        local = self._local
+        if getattr(local, "generation", None) != self._generation:
+            client_options = {"api_endpoint": self.api_endpoint} if self.api_endpoint else None
+            with stage("gmail_build_service"):
+                local.service = build_from_document(
+                    self._discovery_document(), credentials=creds, client_options=client_options
+                )
+            local.generation = self._generation
+        return local.service
+
+    def profile(self):
+        """The account profile, fetched at most once per PROFILE_TTL seconds"""
+        with self._lock:
+            if self._profile is not None and time.monotonic() - self._profile_at < PROFILE_TTL:
+                return self._profile
+        gmail = self.service()
+        if gmail is None:
+            return None
+        with stage("gmail_profile"):
+            profile = gmail.users().getProfile(userId='me').execute()
+        with self._lock:
+            self._profile = profile
+            self._profile_at = time.monotonic()
+        return profile
+
+    def new_batch(self, gmail, callback):
+        """Batch request for this session's Gmail endpoint"""
+        # The client derives the batch URL from the discovery document's
+        # rootUrl, which ignores the endpoint override
+        if self.api_endpoint:
+            return BatchHttpRequest(callback=callback, batch_uri=f"{self.api_endpoint.rstrip('/')}/batch/gmail/v1")
+        return gmail.new_batch_http_request(callback=callback)
+
+    def fetch_metadata(self, gmail, message_ids, headers, fields, retries=BATCH_RETRIES):
+        """
+        Fetch messages in metadata format with batched requests, one round trip
+        per BATCH_SIZE messages. Calls that fail are batched again, up to
+        `retries` times with exponential backoff, since Gmail answers bursts of
+        batches with per-message 429s.
+
+        Returns:
+            ({message id: message}, [ids that still failed]); messages Gmail
+            no longer has (404) are in neither
+        """
+        fetched = {}
+        errors = {}
+
+        def collect(request_id, response, exception):
+            if exception is None:
+                fetched[request_id] = response
+            elif not (isinstance(exception, HttpError) and exception.resp.status == 404):
+                # A 404 means the message was deleted since it was listed
+                errors[request_id] = exception
+
+        remaining = list(message_ids)
+        for attempt in range(retries + 1):
+            if attempt:
+                delay = BATCH_BACKOFF * 2 ** (attempt - 1)
+                logger.info(f"Retrying {len(remaining)} Gmail messages in {delay:g}s")
+                time.sleep(delay)
+            errors.clear()
+            for start in range(0, len(remaining), BATCH_SIZE):
+                chunk = remaining[start:start + BATCH_SIZE]
+                batch = self.new_batch(gmail, collect)
+                for message_id in chunk:
+                    batch.add(
+                        gmail.users().messages().get(
+                            userId='me', id=message_id, format='metadata', metadataHeaders=headers, fields=fields
+                        ),
+                        request_id=message_id
+                    )
+                try:
+                    with stage("gmail_batch_get"):
+                        batch.execute()
+                except Exception as e:
+                    # The whole batch request failed; every call in it is retried
+                    for message_id in chunk:
+                        if message_id not in fetched:
+                            errors[message_id] = e
+            remaining = [message_id for message_id in remaining if message_id in errors]
+            if not remaining:
+                break
+
+        if remaining:
+            logger.warning(
+                f"Could not fetch {len(remaining)} Gmail messages, e.g. {remaining[0]}: {errors[remaining[0]]}"
+            )
+        return fetched, remaining
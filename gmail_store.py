@@ -0,0 +1,439 @@
+"""
+Local SQLite store of Gmail message metadata, kept current by a background sync.
+
+The first sync records the mailbox's history id, lists message ids and
+fetches their metadata in batches. Later syncs ask Gmail only for what
+changed since the stored history id (history.list) and apply additions,
+deletions and label changes, so API use scales with the change volume
+rather than with how often the message list is viewed. If Gmail no longer
+has the stored history id, or the store holds another account's mailbox
+(after re-authorization), the store is rebuilt with a full sync.
+
+Messages whose metadata could not be fetched even after retries (Gmail
+rate-limits bursts of batches) are kept in a pending table and fetched
+again at the start of every later sync, so the sync position can move on
+without losing them.
+
+Message list reads are served from the store with search and pagination.
+The store only understands plain words (see GmailStore.list); queries using
+Gmail's search operators, and pages older than the synced window, have to
+be answered by the API.
+"""
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+from googleapiclient.errors import HttpError
+
+from instrumentation import stage
+
+logger = logging.getLogger("mcp_server")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    thread_id TEXT,
+    internal_date INTEGER NOT NULL,
+    subject TEXT,
+    sender TEXT,
+    date TEXT,
+    snippet TEXT,
+    label_ids TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS messages_internal_date ON messages (internal_date DESC);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS pending (
+    id TEXT PRIMARY KEY
+);
+"""
+
+# Headers kept per message, and the field mask fetching exactly what is stored
+SYNC_HEADERS = ['Subject', 'From', 'Date']
+SYNC_FIELDS = 'id,threadId,labelIds,snippet,internalDate,payload/headers'
+
+# Messages Gmail leaves out of listings unless asked for
+HIDDEN_LABELS = ('SPAM', 'TRASH')
+
+HISTORY_TYPES = ['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved']
+
+# Gmail search syntax the store cannot evaluate: operators (from:, is:, ...),
+# negation, exact phrases, grouping and OR/AND
+GMAIL_OPERATOR = re.compile(r'\w:|(^|\s)-|["(){}]|\b(OR|AND)\b')
+
+
+def is_local_query(query):
+    """Whether GmailStore.list can answer `query`"""
+    return not GMAIL_OPERATOR.search(query or "")
+
+
+def message_row(msg):
+    """Stored columns of a message fetched in metadata format"""
+    headers = msg.get('payload', {}).get('headers', [])
+
+    def header(name, default):
+        return next((h['value'] for h in headers if h['name'] == name), default)
+
+    return (
+        msg['id'],
+        msg.get('threadId'),
+        int(msg.get('internalDate', 0)),
+        header('Subject', 'No Subject'),
+        header('From', 'Unknown'),
+        header('Date', 'Unknown Date'),
+        msg.get('snippet', ''),
+        json.dumps(msg.get('labelIds', [])),
+    )
+
+
+class GmailStore:
+    """Thread-safe access to the message store"""
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    def get_state(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, **values):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO sync_state (key, value) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                [(key, None if value is None else str(value)) for key, value in values.items()]
+            )
+
+    def upsert_messages(self, messages):
+        """Insert or replace messages fetched in metadata format"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [message_row(msg) for msg in messages]
+            )
+
+    def replace_all(self, messages, history_id, email, complete=True, pending=()):
+        """
+        Swap in a full listing of `email`'s mailbox and the history id it was
+        taken at, in one transaction. `complete` is False when older messages
+        were left out; `pending` are listed ids whose metadata is still missing.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [message_row(msg) for msg in messages]
+            )
+            self._conn.execute("DELETE FROM pending")
+            self._conn.executemany("INSERT OR IGNORE INTO pending VALUES (?)", [(i,) for i in pending])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+                [('history_id', str(history_id)), ('email', email), ('complete', '1' if complete else '0')]
+            )
+
+    def reset(self):
+        """Forget every message and the sync position"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages")
+            self._conn.execute("DELETE FROM pending")
+            self._conn.execute("DELETE FROM sync_state")
+
+    def delete_messages(self, message_ids):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM messages WHERE id = ?", [(i,) for i in message_ids])
+            self._conn.executemany("DELETE FROM pending WHERE id = ?", [(i,) for i in message_ids])
+
+    def pending_ids(self):
+        """Ids of messages whose metadata still has to be fetched"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT id FROM pending")]
+
+    def add_pending(self, message_ids):
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO pending VALUES (?)", [(i,) for i in message_ids])
+
+    def remove_pending(self, message_ids):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM pending WHERE id = ?", [(i,) for i in message_ids])
+
+    def set_labels(self, labels):
+        """Update label ids from {message id: label ids}"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE messages SET label_ids = ? WHERE id = ?",
+                [(json.dumps(label_ids), message_id) for message_id, label_ids in labels.items()]
+            )
+
+    def window_start(self):
+        """
+        Internal date (ms) of the oldest stored message if older mail was left
+        out of the store, or None if the store holds the whole mailbox
+        """
+        if self.get_state('complete') != '0':
+            return None
+        with self._lock:
+            return self._conn.execute("SELECT MIN(internal_date) FROM messages").fetchone()[0]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def list(self, limit=10, offset=0, query=None):
+        """
+        Return (messages, total) newest first, leaving out spam and trash.
+        Every word of `query` must appear (case-insensitively, as a substring)
+        in the subject, sender or snippet. Gmail search operators are not
+        understood; check is_local_query first.
+        """
+        clauses = [f"label_ids NOT LIKE '%\"{label}\"%'" for label in HIDDEN_LABELS]
+        params = []
+        for word in (query or "").split():
+            escaped = word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append(
+                "(subject LIKE ? ESCAPE '\\' OR sender LIKE ? ESCAPE '\\' OR snippet LIKE ? ESCAPE '\\')"
+            )
+            params.extend([f"%{escaped}%"] * 3)
+        where = f"WHERE {' AND '.join(clauses)}"
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM messages {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT * FROM messages {where} ORDER BY internal_date DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return [
+            {
+                'id': row['id'],
+                'threadId': row['thread_id'],
+                'subject': row['subject'],
+                'sender': row['sender'],
+                'date': row['date'],
+                'snippet': row['snippet'],
+                'labelIds': json.loads(row['label_ids'])
+            }
+            for row in rows
+        ], total
+
+
+class GmailSync:
+    """
+    Background thread keeping a GmailStore in step with the mailbox.
+
+    Args:
+        session: GmailSession providing the API client
+        store: GmailStore to update
+        interval: Seconds between syncs
+        max_messages: Most recent messages fetched by a full sync
+    """
+
+    def __init__(self, session, store, interval=60, max_messages=2000):
+        self.session = session
+        self.store = store
+        self.interval = interval
+        self.max_messages = max_messages
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.last_error = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="gmail-sync", daemon=True)
+            self._thread.start()
+
+    def trigger(self):
+        """Run a sync now instead of at the next interval"""
+        self._wake.set()
+
+    def _account(self):
+        profile = self.session.profile()
+        return profile.get('emailAddress') if profile else None
+
+    def ready(self):
+        """
+        Whether a full sync of the signed-in account has completed, so reads
+        can be served locally
+        """
+        if self.store.get_state('history_id') is None:
+            return False
+        return self.store.get_state('email') == self._account()
+
+    def credentials_changed(self):
+        """
+        Drop the store after a new authorization, which may be for another
+        account, and rebuild it with a full sync
+        """
+        self.store.reset()
+        self.trigger()
+
+    def status(self):
+        last_sync = self.store.get_state('last_sync')
+        return {
+            "ready": self.ready(),
+            "email": self.store.get_state('email'),
+            "history_id": self.store.get_state('history_id'),
+            "last_sync": float(last_sync) if last_sync else None,
+            "messages": self.store.count(),
+            "pending": len(self.store.pending_ids()),
+            "error": self.last_error
+        }
+
+    def _run(self):
+        while True:
+            try:
+                self.sync_once()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"Gmail sync failed: {str(e)}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def sync_once(self):
+        """
+        Bring the store up to date. Returns a summary of what changed, or None
+        if Gmail is not authenticated.
+        """
+        gmail = self.session.service()
+        if gmail is None:
+            return None
+        with self._lock:
+            email = self._account()
+            history_id = self.store.get_state('history_id')
+            if history_id and self.store.get_state('email') != email:
+                # Another account's mailbox; its history id means nothing here
+                logger.info(f"Gmail account changed to {email}, rebuilding the message store")
+                self.store.reset()
+                history_id = None
+            summary = None
+            if history_id:
+                try:
+                    summary = self._incremental_sync(gmail, history_id)
+                except HttpError as e:
+                    # Gmail keeps history for about a week; older ids return 404
+                    if e.resp.status != 404:
+                        raise
+                    logger.info(f"Gmail history {history_id} expired, running a full sync")
+            if summary is None:
+                summary = self._full_sync(gmail, email)
+            self.store.set_state(last_sync=time.time())
+            return summary
+
+    def _full_sync(self, gmail, email):
+        # Taken before listing, so changes made meanwhile are replayed next time
+        with stage("gmail_sync_profile"):
+            history_id = gmail.users().getProfile(userId='me', fields='historyId').execute()['historyId']
+
+        message_ids = []
+        page_token = None
+        while len(message_ids) < self.max_messages:
+            with stage("gmail_list_messages"):
+                page = gmail.users().messages().list(
+                    userId='me',
+                    maxResults=min(500, self.max_messages - len(message_ids)),
+                    pageToken=page_token,
+                    fields='messages/id,nextPageToken'
+                ).execute()
+            message_ids.extend(message['id'] for message in page.get('messages', []))
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                break
+
+        fetched, failed = self.session.fetch_metadata(gmail, message_ids, SYNC_HEADERS, SYNC_FIELDS)
+        self.store.replace_all(list(fetched.values()), history_id, email, complete=not page_token, pending=failed)
+        logger.info(
+            f"Full Gmail sync stored {len(fetched)} messages of {email} at history {history_id}"
+            + (f", {len(failed)} left pending" if failed else "")
+        )
+        return {
+            "mode": "full",
+            "added": len(fetched),
+            "deleted": 0,
+            "relabeled": 0,
+            "pending": len(failed),
+            "history_id": history_id
+        }
+
+    def _fetch_pending(self, gmail):
+        """Retry messages an earlier sync could not fetch. Returns how many are still missing."""
+        pending = self.store.pending_ids()
+        if not pending:
+            return 0
+        fetched, failed = self.session.fetch_metadata(gmail, pending, SYNC_HEADERS, SYNC_FIELDS)
+        self.store.upsert_messages(fetched.values())
+        # Fetched ones and those Gmail no longer has (404) are done
+        self.store.remove_pending(set(pending) - set(failed))
+        if fetched:
+            logger.info(f"Gmail sync fetched {len(fetched)} pending messages, {len(failed)} still pending")
+        return len(failed)
+
+    def _incremental_sync(self, gmail, history_id):
+        self._fetch_pending(gmail)
+        added, deleted, labels = [], set(), {}
+        page_token = None
+        latest = history_id
+        while True:
+            with stage("gmail_history"):
+                page = gmail.users().history().list(
+                    userId='me',
+                    startHistoryId=history_id,
+                    historyTypes=HISTORY_TYPES,
+                    maxResults=500,
+                    pageToken=page_token,
+                    fields='history(messagesAdded/message/id,messagesDeleted/message/id,'
+                           'labelsAdded/message(id,labelIds),labelsRemoved/message(id,labelIds)),'
+                           'historyId,nextPageToken'
+                ).execute()
+            latest = page.get('historyId', latest)
+            for record in page.get('history', []):
+                for change in record.get('messagesAdded', []):
+                    message_id = change['message']['id']
+                    deleted.discard(message_id)
+                    if message_id not in added:
+                        added.append(message_id)
+                for change in record.get('messagesDeleted', []):
+                    message_id = change['message']['id']
+                    deleted.add(message_id)
+                    if message_id in added:
+                        added.remove(message_id)
+                for change in record.get('labelsAdded', []) + record.get('labelsRemoved', []):
+                    labels[change['message']['id']] = change['message'].get('labelIds', [])
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                break
+
+        failed = []
+        if added:
+            fetched, failed = self.session.fetch_metadata(gmail, added, SYNC_HEADERS, SYNC_FIELDS)
+            self.store.upsert_messages(fetched.values())
+            # Kept for the next sync, since the history id moves past them
+            self.store.add_pending(failed)
+        if deleted:
+            self.store.delete_messages(deleted)
+        relabeled = {i: l for i, l in labels.items() if i not in deleted and i not in added}
+        if relabeled:
+            self.store.set_labels(relabeled)
+        self.store.set_state(history_id=latest)
+        if added or deleted or relabeled:
+            logger.info(f"Gmail sync: {len(added)} added, {len(deleted)} deleted, {len(relabeled)} relabeled")
+        return {
+            "mode": "incremental",
+            "added": len(added),
+            "deleted": len(deleted),
+            "relabeled": len(relabeled),
+            "pending": len(failed),
+            "history_id": latest
+        }
@@ -0,0 +1,94 @@
+"""
+Import-time report for the service modules.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter and
+aggregates the cumulative import time per top-level package, so it is easy
+to see which dependencies dominate a worker's boot time.
+
+Usage:
+    python import_report.py server startup_api mcp_server --top 15
+    python import_report.py startup_api --budget 2.0   # exit 1 if over budget
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+
+def measure_imports(module_name, cwd=None):
+    """
+    Import `module_name` in a child interpreter with -X importtime.
+
+    Returns (total_seconds, packages) where packages maps each package the
+    module imports directly to its cumulative import time in seconds.
+    """
+    env = dict(os.environ)
+    # Measuring should never start a warm-up thread or a nested report
+    env["WARM_IMPORTS"] = "false"
+    env["IMPORT_TIME_REPORT"] = "false"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        cwd=cwd or os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True
+    )
+
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module_name} failed: {result.stderr.strip().splitlines()[-1:]}")
+
+    # Children are printed before their parent, each level indented two more
+    # spaces. Collect the direct imports of every top-level entry and keep
+    # those that belong to the requested module.
+    total = 0.0
+    packages = {}
+    pending = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        try:
+            _, cumulative_us, name = line.split("|", 2)
+            cumulative = int(cumulative_us) / 1e6
+        except ValueError:
+            continue
+
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        name = name.strip()
+        if depth == 1:
+            pending.append((name.split(".")[0], cumulative))
+        elif depth == 0:
+            if name == module_name:
+                total = cumulative
+                for package, seconds in pending:
+                    packages[package] = packages.get(package, 0.0) + seconds
+            pending = []
+
+    return total, packages
+
+
+def format_report(module_name, total, packages, top=15):
+    """Render a report for one module"""
+    lines = [f"{module_name}: {total:.3f}s total import time"]
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    for package, seconds in ranked[:top]:
+        lines.append(f"  {package:30} {seconds:8.3f}s")
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Report per-package import time for service modules")
+    parser.add_argument("modules", nargs="+", help="modules to import, e.g. server startup_api mcp_server")
+    parser.add_argument("--top", type=int, default=15, help="number of packages to show per module")
+    parser.add_argument("--budget", type=float, help="fail if any module takes longer than this many seconds")
+    args = parser.parse_args()
+
+    over_budget = False
+    for module in args.modules:
+        total, packages = measure_imports(module)
+        print(format_report(module, total, packages, args.top))
+        if args.budget is not None and total > args.budget:
+            print(f"  OVER BUDGET: {total:.3f}s > {args.budget:.3f}s")
+            over_budget = True
+        print()
+
+    sys.exit(1 if over_budget else 0)
@@ -0,0 +1,492 @@
+"""
+Shared instrumentation for the Flask services.
+
+Provides per-stage latency histograms rendered in the Prometheus text format
+on a /metrics endpoint, per-request trace spans that can be exported as JSON
+lines to a local file (set TRACE_EXPORT_FILE to enable), lazy imports of heavy
+dependencies and a startup-time report.
+"""
+import contextvars
+import importlib
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+
+# Reference point for process_uptime() when /proc is unavailable
+_module_loaded = time.perf_counter()
+
+# Latency buckets in seconds, wide enough to cover both SearXNG lookups and crew tasks
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with labels"""
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, **labels):
+        """Record one observation"""
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def snapshot(self):
+        """(count, sum) of every series, keyed by label values"""
+        with self._lock:
+            return {key: (series["count"], series["sum"]) for key, series in self._series.items()}
+
+    def render(self):
+        """Render the histogram in the Prometheus text exposition format"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    labels = _format_labels(self.label_names, key, ("le", _format_value(bound)))
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.label_names, key, ("le", "+Inf"))
+                lines.append(f"{self.name}_bucket{labels} {series['count']}")
+                labels = _format_labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {series['sum']}")
+                lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        """Increase the counter for the given labels"""
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        """Render the counter in the Prometheus text exposition format"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds every metric of a process and renders them for /metrics.
+
+    Collectors are callables returning a list of
+    (name, type, help, [(labels_dict, value), ...]) tuples, used for values
+    that are read on demand such as queue depths.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._collectors = []
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        """Get or create a histogram"""
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, help_text, label_names, buckets)
+            return self._metrics[name]
+
+    def counter(self, name, help_text, label_names=()):
+        """Get or create a counter"""
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, help_text, label_names)
+            return self._metrics[name]
+
+    def register_collector(self, collector):
+        """Register a callable producing metric samples at scrape time"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in collectors:
+            for name, metric_type, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    rendered = _format_labels(tuple(labels.keys()), tuple(labels.values()))
+                    lines.append(f"{name}{rendered} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry shared by every module of a service
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "stage_duration_seconds",
+    "Time spent in each processing stage",
+    ("service", "stage")
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "stage_errors_total",
+    "Processing stages that raised an exception",
+    ("service", "stage")
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "End-to-end HTTP request latency",
+    ("service", "method", "endpoint", "status")
+)
+
+logger = logging.getLogger("instrumentation")
+
+# Name of the service this process runs, set by init_app()
+_service_name = os.getenv("SERVICE_NAME", "app")
+
+# Trace of the request currently being served
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """Spans recorded while serving one request"""
+
+    def __init__(self, trace_id, name):
+        self.trace_id = trace_id
+        self.name = name
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans = []
+
+    def add_span(self, name, start, duration, error=None, **attributes):
+        """Record a finished span"""
+        span = {
+            "name": name,
+            "start": start,
+            "duration_ms": round(duration * 1000, 3),
+        }
+        if error:
+            span["error"] = error
+        if attributes:
+            span["attributes"] = attributes
+        with self._lock:
+            self.spans.append(span)
+
+    def elapsed(self):
+        """Seconds since the trace started"""
+        return time.perf_counter() - self._started
+
+    def to_dict(self, **fields):
+        """Serialize the trace for export"""
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "trace_id": self.trace_id,
+            "service": _service_name,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.elapsed() * 1000, 3),
+            **fields,
+            "spans": spans,
+        }
+
+
+class TraceExporter:
+    """Append finished traces to a JSON lines file from a background thread"""
+
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.Queue(maxsize=10000)
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, trace_dict):
+        """Queue a trace for writing, dropping it if the writer has fallen behind"""
+        try:
+            self._queue.put_nowait(trace_dict)
+        except queue.Full:
+            pass
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            while not self._queue.empty() and len(batch) < 500:
+                batch.append(self._queue.get_nowait())
+            with open(self.path, "a", encoding="utf-8") as f:
+                for trace_dict in batch:
+                    f.write(json.dumps(trace_dict, default=str) + "\n")
+
+
+_exporter = None
+
+
+def current_trace():
+    """Return the trace of the current request, if any"""
+    return _current_trace.get()
+
+
+def _reset_trace(token):
+    """Restore the trace that was current before a request started"""
+    try:
+        _current_trace.reset(token)
+    except (ValueError, RuntimeError):
+        # Closed from another context than the one the request ran in
+        _current_trace.set(None)
+
+
+def current_request_id():
+    """Return the id of the current request, if any"""
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+def record_stage(name, duration, error=None, **attributes):
+    """Record a stage duration measured elsewhere"""
+    STAGE_SECONDS.observe(duration, service=_service_name, stage=name)
+    if error:
+        STAGE_ERRORS.inc(service=_service_name, stage=name)
+
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(name, time.time() - duration, duration, error=error, **attributes)
+
+
+@contextmanager
+def stage(name, **attributes):
+    """Time a block as a named processing stage"""
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        record_stage(name, time.perf_counter() - started, error=error, **attributes)
+
+
+def timed_stage(name):
+    """Decorator timing every call of a function as a named stage"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Import durations of lazily loaded or measured modules, in seconds
+_import_seconds = {}
+_import_lock = threading.Lock()
+_startup_seconds = None
+
+
+def lazy_import(module_name):
+    """Import a module on first use, recording how long the first import took"""
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+
+    with _import_lock:
+        module = sys.modules.get(module_name)
+        if module is None:
+            started = time.perf_counter()
+            module = importlib.import_module(module_name)
+            _import_seconds[module_name] = time.perf_counter() - started
+            logger.info(f"Loaded {module_name} in {_import_seconds[module_name]:.2f}s")
+    return module
+
+
+def warm_imports(module_names, then=None):
+    """Import heavy modules on a background thread so the first request does not pay for them"""
+    def warm():
+        for module_name in module_names:
+            try:
+                lazy_import(module_name)
+            except Exception as e:
+                logger.warning(f"Background import of {module_name} failed: {str(e)}")
+        if then is not None:
+            then()
+
+    thread = threading.Thread(target=warm, name="import-warmer", daemon=True)
+    thread.start()
+    return thread
+
+
+def process_uptime():
+    """Seconds since this process started, from /proc when available"""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22 is the start time in clock ticks since boot; skip the command name which may contain spaces
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            system_uptime = float(f.read().split()[0])
+        return system_uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.perf_counter() - _module_loaded
+
+
+def report_startup(module_name):
+    """
+    Record how long the service took to become ready and warn when it exceeds
+    STARTUP_BUDGET_SECONDS. With IMPORT_TIME_REPORT=true a per-package
+    `-X importtime` breakdown of the module is measured in a child process and
+    logged in the background.
+    """
+    global _startup_seconds
+    _startup_seconds = process_uptime()
+    budget = float(os.getenv("STARTUP_BUDGET_SECONDS", "5"))
+    if _startup_seconds > budget:
+        logger.warning(f"{module_name} took {_startup_seconds:.2f}s to start, over the {budget:.1f}s budget")
+    else:
+        logger.info(f"{module_name} started in {_startup_seconds:.2f}s")
+
+    if os.getenv("IMPORT_TIME_REPORT", "false").lower() == "true":
+        def measure():
+            from import_report import format_report, measure_imports
+            try:
+                total, packages = measure_imports(module_name)
+            except Exception as e:
+                logger.warning(f"Import time report failed: {str(e)}")
+                return
+            with _import_lock:
+                for package, seconds in packages.items():
+                    _import_seconds.setdefault(package, seconds)
+            logger.info("Import time report\n" + format_report(module_name, total, packages))
+
+        threading.Thread(target=measure, name="import-report", daemon=True).start()
+
+
+def _collect_startup_metrics():
+    with _import_lock:
+        imports = dict(_import_seconds)
+    samples = [
+        ("module_import_seconds", "gauge", "Import time of heavy or lazily loaded modules",
+         [({"module": name}, round(seconds, 6)) for name, seconds in sorted(imports.items())]),
+    ]
+    if _startup_seconds is not None:
+        samples.append(("process_startup_seconds", "gauge", "Time from process start until the service was ready",
+                        [({}, round(_startup_seconds, 6))]))
+    return samples
+
+
+REGISTRY.register_collector(_collect_startup_metrics)
+
+
+def init_app(app, service_name, limiter=None):
+    """
+    Instrument a Flask app: time every request, propagate X-Request-ID,
+    export traces and serve the /metrics endpoint.
+    """
+    global _service_name, _exporter
+    from flask import Response, g, request
+
+    _service_name = service_name
+    export_path = os.getenv("TRACE_EXPORT_FILE")
+    if export_path and _exporter is None:
+        _exporter = TraceExporter(export_path)
+
+    @app.before_request
+    def _start_trace():
+        trace_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+        g.trace = Trace(trace_id, f"{request.method} {request.path}")
+        # Reset when the request ends, so pooled threads do not keep
+        # attaching spans and log records to a finished trace
+        g.trace_token = _current_trace.set(g.trace)
+
+    @app.after_request
+    def _finish_trace(response):
+        trace = g.get("trace")
+        if trace is None:
+            return response
+        response.headers["X-Request-ID"] = trace.trace_id
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        method = request.method
+        status = response.status_code
+
+        token = g.get("trace_token")
+
+        # Streamed responses are still running here, so finish them on close
+        def finish():
+            REQUEST_SECONDS.observe(trace.elapsed(), service=_service_name, method=method,
+                                    endpoint=endpoint, status=status)
+            if _exporter is not None:
+                _exporter.export(trace.to_dict(method=method, endpoint=endpoint, status=status))
+
+        def finish_stream():
+            finish()
+            if token is not None:
+                _reset_trace(token)
+
+        if response.is_streamed:
+            # The body's spans belong to this trace; teardown leaves it current
+            g.trace_streamed = True
+            response.call_on_close(finish_stream)
+        else:
+            finish()
+        return response
+
+    @app.teardown_request
+    def _end_trace(exc):
+        token = g.pop("trace_token", None)
+        if token is not None and not g.get("trace_streamed"):
+            _reset_trace(token)
+
+    def metrics():
+        """Expose all metrics in the Prometheus text format"""
+        return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+    app.add_url_rule("/metrics", "metrics", metrics, methods=["GET"])
+    if limiter is not None:
+        limiter.exempt(metrics)
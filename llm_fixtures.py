@@ -0,0 +1,188 @@
+"""
+Record and replay of LLM calls for offline crew benchmarks.
+
+In record mode every completed chat call is appended to a JSON Lines fixture
+file with its request, response and latency. In replay mode calls are
+answered from the fixture instead of the API, after sleeping for the
+recorded (or a configured) latency, so a crew run can be repeated offline,
+deterministically and for free.
+
+Calls are matched on a hash of the model, the messages and the stop words.
+Prompts that differ between runs (dates, ids) fall back to the recording
+made at the same position among calls with the same model and system
+prompt: the third such call of a run is answered by the third such
+recording. Call reset() before each replayed run.
+
+Configuration:
+    LLM_FIXTURE_MODE     "record" or "replay"; unset disables both
+    LLM_FIXTURE_FILE     Fixture path (default llm_fixtures.jsonl)
+    LLM_REPLAY_LATENCY   "recorded" (default) or a fixed number of seconds
+    LLM_REPLAY_LATENCY_SCALE
+                         Multiplier for the replayed latency (default 1.0)
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+from instrumentation import lazy_import
+
+MODES = ("record", "replay")
+
+
+class FixtureMiss(KeyError):
+    """A replayed call has no recording"""
+
+
+def _messages(messages):
+    return [[message.type, message.content] for message in messages]
+
+
+def request_key(model, messages, stop=None):
+    """Stable hash of one chat request"""
+    payload = json.dumps({"model": model, "messages": _messages(messages), "stop": stop}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _prefix_key(model, messages):
+    first = _messages(messages[:1])
+    return hashlib.sha256(json.dumps([model, first]).encode("utf-8")).hexdigest()
+
+
+def _dump_result(result):
+    message_to_dict = lazy_import("langchain_core.messages").message_to_dict
+    return {
+        "generations": [
+            {"message": message_to_dict(generation.message), "generation_info": generation.generation_info}
+            for generation in result.generations
+        ],
+        "llm_output": result.llm_output,
+    }
+
+
+def _load_result(data):
+    messages_from_dict = lazy_import("langchain_core.messages").messages_from_dict
+    outputs = lazy_import("langchain_core.outputs")
+    generations = [
+        outputs.ChatGeneration(
+            message=messages_from_dict([generation["message"]])[0],
+            generation_info=generation.get("generation_info")
+        )
+        for generation in data["generations"]
+    ]
+    return outputs.ChatResult(generations=generations, llm_output=data.get("llm_output"))
+
+
+class LLMFixtures:
+    """
+    A fixture file of recorded chat calls.
+
+    Args:
+        path: JSON Lines file to append to or replay from
+        mode: "record" or "replay"
+        latency: "recorded" to replay each call's own latency, or seconds
+        latency_scale: Multiplier applied to the replayed latency
+    """
+
+    def __init__(self, path, mode, latency="recorded", latency_scale=1.0):
+        if mode not in MODES:
+            raise ValueError(f"Unknown LLM fixture mode {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._by_key = {}
+        self._by_prefix = {}
+        # Per replayed run: recordings handed out and calls seen per prefix
+        self._used = set()
+        self._prefix_calls = Counter()
+        if mode == "replay":
+            self._load()
+
+    @classmethod
+    def from_env(cls):
+        """Fixtures configured by the environment, or None when disabled"""
+        mode = os.getenv("LLM_FIXTURE_MODE", "").strip().lower()
+        if not mode:
+            return None
+        return cls(
+            os.getenv("LLM_FIXTURE_FILE", "llm_fixtures.jsonl"),
+            mode,
+            latency=os.getenv("LLM_REPLAY_LATENCY", "recorded"),
+            latency_scale=float(os.getenv("LLM_REPLAY_LATENCY_SCALE", "1.0"))
+        )
+
+    def __len__(self):
+        return sum(len(records) for records in self._by_key.values())
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for position, line in enumerate(f):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                record["position"] = position
+                self._by_key.setdefault(record["key"], []).append(record)
+                self._by_prefix.setdefault(record["prefix"], []).append(record)
+
+    def record(self, model, messages, stop, result, seconds):
+        """Append one completed call to the fixture file"""
+        record = {
+            "key": request_key(model, messages, stop),
+            "prefix": _prefix_key(model, messages),
+            "model": model,
+            "messages": _messages(messages),
+            "stop": stop,
+            "latency": round(seconds, 4),
+            "recorded_at": time.time(),
+            "response": _dump_result(result),
+        }
+        line = json.dumps(record, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def reset(self):
+        """Start a new replayed run, so recordings are handed out from the beginning again"""
+        with self._lock:
+            self._used.clear()
+            self._prefix_calls.clear()
+
+    def _take(self, model, messages, stop):
+        prefix = _prefix_key(model, messages)
+        with self._lock:
+            # Position of this call among the run's calls with the same prefix
+            call_index = self._prefix_calls[prefix]
+            self._prefix_calls[prefix] += 1
+
+            # Identical requests are answered in recorded order, repeating the last
+            records = self._by_key.get(request_key(model, messages, stop), [])
+            for record in records:
+                if record["position"] not in self._used:
+                    self._used.add(record["position"])
+                    return record
+            if records:
+                return records[-1]
+
+            # Only the recording made at the same position stands in for a changed prompt
+            candidates = self._by_prefix.get(prefix, [])
+            if call_index < len(candidates) and candidates[call_index]["position"] not in self._used:
+                record = candidates[call_index]
+                self._used.add(record["position"])
+                return record
+        raise FixtureMiss(f"No recorded {model} call matches this request")
+
+    def replay(self, model, messages, stop=None):
+        """
+        Return the recorded ChatResult for a request after its simulated latency.
+
+        Raises:
+            FixtureMiss: if nothing in the fixture matches the request
+        """
+        record = self._take(model, messages, stop)
+        latency = record["latency"] if self.latency == "recorded" else float(self.latency)
+        time.sleep(max(0.0, latency * self.latency_scale))
+        return _load_result(record["response"])
@@ -0,0 +1,234 @@
+"""
+Load generator for the Flask services.
+
+Drives a service's endpoints at a target request rate (open loop, so slow
+responses do not lower the offered load) and reports latency percentiles,
+error rates and throughput. Latency is measured from each request's
+scheduled send time, so time spent waiting for a free worker once
+--max-workers requests are in flight counts as well (it is also reported
+separately as queue delay). Throughput counts the successful requests that
+completed within the send window; the time spent draining in-flight
+requests afterwards is reported on its own.
+
+Usage:
+    python load_test.py research --rps 5 --duration 60
+    python load_test.py startup --base-url http://localhost:9001 --rps 20
+    python load_test.py mcp --rps 10 --output mcp_report.json
+
+Run the services against upstream_simulators.py with RATELIMIT_ENABLED=false
+so the numbers reflect the services themselves rather than the rate limiter.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+QUERIES = [
+    "video call application market",
+    "ai meeting summarization tools",
+    "remote collaboration trends",
+    "speech recognition accuracy",
+    "legal assistant startups",
+]
+
+# Weighted request mixes per service: (weight, method, path, json body)
+SCENARIOS = {
+    "research": {
+        "base_url": "http://localhost:9000",
+        "requests": [
+            (6, "POST", "/api/search", lambda: {"query": random.choice(QUERIES)}),
+            (3, "POST", "/api/research", lambda: {"query": random.choice(QUERIES), "mode": "quick"}),
+            (1, "POST", "/api/deep-research", lambda: {"query": random.choice(QUERIES)}),
+        ],
+    },
+    "startup": {
+        "base_url": "http://localhost:9001",
+        "requests": [
+            (8, "GET", "/api/startup-research/list", None),
+            (2, "GET", "/api/startup-research/status/video_call_application_20250519_144255", None),
+        ],
+    },
+    "mcp": {
+        "base_url": "http://localhost:5001",
+        "requests": [
+            (4, "GET", "/mcp/gmail/messages", None),
+            (2, "GET", "/mcp/gmail/status", None),
+            (2, "GET", "/mcp/gitlab/projects", None),
+            (2, "GET", "/mcp/gitlab/issues?project_id=1", None),
+        ],
+    },
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class LoadResults:
+    """Thread-safe collection of per-request outcomes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = []
+
+    def add(self, endpoint, status, latency, queue_delay, finished):
+        with self._lock:
+            self.samples.append((endpoint, status, latency, queue_delay, finished))
+
+    def summarize(self, started, sending_done, drained):
+        """
+        Aggregate latency percentiles, error rates and throughput. Timestamps
+        are time.perf_counter() values for the start and end of sending and
+        the end of draining.
+        """
+        with self._lock:
+            samples = list(self.samples)
+        send_window = sending_done - started
+
+        def is_ok(status):
+            return status != "error" and int(status) < 400
+
+        def summary(rows):
+            latencies = sorted(row[2] for row in rows)
+            queue_delays = sorted(row[3] for row in rows)
+            statuses = Counter(str(row[1]) for row in rows)
+            errors = sum(1 for row in rows if row[1] == "error" or int(row[1]) >= 500)
+            ok = sum(1 for row in rows if is_ok(row[1]))
+            ok_in_window = sum(1 for row in rows if is_ok(row[1]) and row[4] <= sending_done)
+            return {
+                "requests": len(rows),
+                "ok": ok,
+                "error_rate": round(errors / len(rows), 4) if rows else 0.0,
+                "throughput_rps": round(ok_in_window / send_window, 3) if send_window else 0.0,
+                "queue_delay_ms": {
+                    name: round(value * 1000, 1) if value is not None else None
+                    for name, value in (
+                        ("p50", percentile(queue_delays, 50)),
+                        ("p99", percentile(queue_delays, 99)),
+                        ("max", queue_delays[-1] if queue_delays else None),
+                    )
+                },
+                "statuses": dict(statuses),
+                "latency_ms": {
+                    name: round(value * 1000, 1) if value is not None else None
+                    for name, value in (
+                        ("p50", percentile(latencies, 50)),
+                        ("p90", percentile(latencies, 90)),
+                        ("p95", percentile(latencies, 95)),
+                        ("p99", percentile(latencies, 99)),
+                        ("max", latencies[-1] if latencies else None),
+                    )
+                },
+            }
+
+        by_endpoint = {}
+        for row in samples:
+            by_endpoint.setdefault(row[0], []).append(row)
+
+        return {
+            "wall_time_s": round(drained - started, 3),
+            "send_window_s": round(send_window, 3),
+            "drain_time_s": round(drained - sending_done, 3),
+            "overall": summary(samples),
+            "endpoints": {endpoint: summary(rows) for endpoint, rows in sorted(by_endpoint.items())},
+        }
+
+
+def run_load(scenario, base_url, rps, duration, timeout, max_workers):
+    """Issue requests at a fixed rate for `duration` seconds and collect results"""
+    weighted = []
+    for weight, method, path, body in scenario["requests"]:
+        weighted.extend([(method, path, body)] * weight)
+
+    results = LoadResults()
+    session_local = threading.local()
+
+    def send(method, path, body, scheduled):
+        # Measured from the scheduled send time, so waiting for a worker counts
+        queue_delay = max(0.0, time.perf_counter() - scheduled)
+        session = getattr(session_local, "session", None)
+        if session is None:
+            session = session_local.session = requests.Session()
+        try:
+            response = session.request(
+                method,
+                base_url + path,
+                json=body() if body else None,
+                timeout=timeout
+            )
+            status = response.status_code
+        except requests.RequestException:
+            status = "error"
+        finished = time.perf_counter()
+        results.add(f"{method} {path}", status, finished - scheduled, queue_delay, finished)
+
+    interval = 1.0 / rps
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        next_send = started
+        while next_send - started < duration:
+            sleep_for = next_send - time.perf_counter()
+            if sleep_for > 0:
+                time.sleep(sleep_for)
+            pool.submit(send, *random.choice(weighted), next_send)
+            next_send += interval
+        sending_done = time.perf_counter()
+    # Leaving the pool waits for the requests still in flight
+    drained = time.perf_counter()
+    return results.summarize(started, sending_done, drained)
+
+
+def print_report(report):
+    """Print a compact human-readable report"""
+    print(f"Wall time: {report['wall_time_s']}s "
+          f"(sending {report['send_window_s']}s, draining {report['drain_time_s']}s)")
+    header = (f"{'endpoint':55} {'reqs':>6} {'err%':>6} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} "
+              f"{'queue99':>8}")
+    print(header)
+    print("-" * len(header))
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["overall"])]
+    for endpoint, stats in rows:
+        lat = stats["latency_ms"]
+        queue_p99 = stats["queue_delay_ms"]["p99"]
+        print(
+            f"{endpoint[:55]:55} {stats['requests']:>6} {stats['error_rate'] * 100:>5.1f}% "
+            f"{stats['throughput_rps']:>7} {lat['p50'] or '-':>8} {lat['p95'] or '-':>8} {lat['p99'] or '-':>8} "
+            f"{'-' if queue_p99 is None else queue_p99:>8}"
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test a Flask service")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--base-url", help="service base URL (defaults to the scenario's local port)")
+    parser.add_argument("--rps", type=float, default=5.0, help="target requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="test duration in seconds")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--max-workers", type=int, default=256, help="maximum requests in flight")
+    parser.add_argument("--output", help="write the full JSON report to this file")
+    args = parser.parse_args()
+
+    scenario = SCENARIOS[args.scenario]
+    report = run_load(
+        scenario,
+        (args.base_url or scenario["base_url"]).rstrip("/"),
+        args.rps,
+        args.duration,
+        args.timeout,
+        args.max_workers
+    )
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
@@ -0,0 +1,138 @@
+"""
+Shared logging setup for the Flask services.
+
+Log records are handed to a queue on the calling thread and written to the
+console and log file by a background QueueListener, so disk and console I/O
+stay off the request path. Output is JSON lines carrying the current request
+id; set LOG_FORMAT=text for the classic human-readable format. Records below
+INFO are sampled at LOG_DEBUG_SAMPLE_RATE so verbose debug output cannot
+flood the queue under load.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from instrumentation import current_request_id
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects"""
+
+    def __init__(self, service_name):
+        super().__init__()
+        self.service_name = service_name
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "service": self.service_name,
+            "request_id": getattr(record, "request_id", None),
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach the current request id while still on the logging thread"""
+
+    def filter(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = current_request_id() or "-"
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Keep only a sample of records below INFO"""
+
+    def __init__(self, sample_rate):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        if record.levelno >= logging.INFO or self.sample_rate >= 1.0:
+            return True
+        return random.random() < self.sample_rate
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    QueueHandler that renders the message and traceback up front, since the
+    arguments may not be safe to format later on another thread, but keeps
+    them as separate fields for the JSON formatter.
+    """
+
+    def prepare(self, record):
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        # Drop records rather than block the request thread if the writer falls behind
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def configure_logging(service_name, log_file=None, level=None):
+    """
+    Route the root logger through a background queue listener.
+
+    Only the first call in a process installs handlers; later calls (for
+    example from a module imported by an already configured service) just
+    return the root logger.
+    """
+    global _listener
+    root_logger = logging.getLogger()
+    if _listener is not None:
+        return root_logger
+
+    level = level or os.getenv("LOG_LEVEL", "INFO").upper()
+    if os.getenv("LOG_FORMAT", "json").lower() == "text":
+        formatter = logging.Formatter(TEXT_FORMAT)
+    else:
+        formatter = JsonFormatter(service_name)
+
+    handlers = []
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+    handlers.append(console_handler)
+
+    if log_file:
+        file_handler = RotatingFileHandler(log_file, maxBytes=10485760, backupCount=5)
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+
+    log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+    queue_handler = ContextQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+    queue_handler.addFilter(DebugSamplingFilter(float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))))
+
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(queue_handler)
+    root_logger.setLevel(level)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    return root_logger
@@ -8,13 +8,19 @@ import json
 import yaml
 import base64
 import time
+import hmac
+import logging
 from dotenv import load_dotenv
 import requests
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
-import pickle
+
+from gmail_session import GmailSession
+from gmail_store import GmailStore, GmailSync, is_local_query
+from gitlab_client import GitLabClient, GitLabError, MAX_ITEMS as GITLAB_MAX_ITEMS, project_issue
+from gitlab_mirror import IssueMirror, IssueSync
+from instrumentation import init_app as init_instrumentation, report_startup, stage
+from logging_setup import configure_logging
 
 # Allow OAuth over HTTP for development
 os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
@@ -27,43 +33,89 @@ mcp_app = Flask(__name__)
 CORS(mcp_app, resources={r"/mcp/*": {"origins": "*"}})
 mcp_app.secret_key = os.getenv("MCP_SECRET_KEY", os.urandom(24))
 
+# Configure logging
+configure_logging("mcp_server", log_file=os.getenv("MCP_LOG_FILE"))
+logger = logging.getLogger("mcp_server")
+
+# Per-stage latency metrics on /metrics and request traces
+init_instrumentation(mcp_app, "mcp_server")
+
 # Environment variables
 GMAIL_CLIENT_ID = os.getenv('GMAIL_CLIENT_ID', '')
 GMAIL_CLIENT_SECRET = os.getenv('GMAIL_CLIENT_SECRET', '')
 GMAIL_REDIRECT_URI = os.getenv('GMAIL_REDIRECT_URI', 'http://localhost:5001/mcp/gmail/callback')
-GMAIL_TOKEN_FILE = 'gmail_token.pickle'
+GMAIL_TOKEN_FILE = os.getenv('GMAIL_TOKEN_FILE', 'gmail_token.pickle')
+GMAIL_API_ENDPOINT = os.getenv('GMAIL_API_ENDPOINT', '')  # Override to use a local Gmail simulator
 GMAIL_SCOPES = ['https://www.googleapis.com/auth/gmail.readonly', 
                'https://www.googleapis.com/auth/gmail.send',
                'https://www.googleapis.com/auth/gmail.labels']
 
+GMAIL_MAX_RESULTS = 100
+# Headers shown in the message list; everything else is left on the server
+GMAIL_MESSAGE_HEADERS = ['Subject', 'From', 'Date']
+
+# Credentials, API clients and profile shared by every Gmail request
+gmail_session = GmailSession(GMAIL_TOKEN_FILE, GMAIL_API_ENDPOINT)
+
+# Local copy of message metadata, kept current from Gmail's history; the
+# message list is read from it once the first sync has finished
+GMAIL_SYNC_ENABLED = os.getenv('GMAIL_SYNC_ENABLED', 'true').lower() == 'true'
+gmail_store = GmailStore(os.getenv('GMAIL_STORE_DB', 'gmail_store.sqlite3'))
+gmail_sync = GmailSync(
+    gmail_session,
+    gmail_store,
+    interval=int(os.getenv('GMAIL_SYNC_INTERVAL', '60')),
+    max_messages=int(os.getenv('GMAIL_SYNC_MAX_MESSAGES', '2000'))
+)
+if GMAIL_SYNC_ENABLED:
+    gmail_sync.start()
+
 # GitLab configuration
 GITLAB_URL = os.getenv('GITLAB_URL', 'https://gitlab.com')
 GITLAB_TOKEN = os.getenv('GITLAB_TOKEN', '')  # Personal access token
 
+# Pooled connections and ETag revalidation shared by the GitLab endpoints
+gitlab = GitLabClient(GITLAB_URL, GITLAB_TOKEN)
+
+# Local copy of each viewed project's issues, kept current with updated_after
+# deltas on a schedule and on webhook events; issue lists are read from it
+GITLAB_MIRROR_ENABLED = os.getenv('GITLAB_MIRROR_ENABLED', 'true').lower() == 'true'
+GITLAB_WEBHOOK_SECRET = os.getenv('GITLAB_WEBHOOK_SECRET', '')  # Compared with X-Gitlab-Token; unset disables the webhook
+issue_mirror = IssueMirror(os.getenv('GITLAB_MIRROR_DB', 'gitlab_mirror.sqlite3'))
+issue_sync = IssueSync(
+    gitlab,
+    issue_mirror,
+    interval=int(os.getenv('GITLAB_MIRROR_INTERVAL', '300')),
+    full_sync_interval=int(os.getenv('GITLAB_MIRROR_FULL_SYNC_INTERVAL', '86400')),
+    max_issues=int(os.getenv('GITLAB_MIRROR_MAX_ISSUES', '10000'))
+)
+if GITLAB_MIRROR_ENABLED and GITLAB_TOKEN:
+    issue_sync.start()
+
 # ----------------- Gmail Integration -----------------
 
 def get_gmail_service():
-    """Create and return Gmail API service"""
-    creds = None
-    
-    # Check if token file exists
-    if os.path.exists(GMAIL_TOKEN_FILE):
-        with open(GMAIL_TOKEN_FILE, 'rb') as token:
-            creds = pickle.load(token)
-            
-    # Check if credentials are valid
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            return None  # User needs to authenticate
-            
-        # Save the credentials for the next run
-        with open(GMAIL_TOKEN_FILE, 'wb') as token:
-            pickle.dump(creds, token)
-            
-    # Build and return the Gmail API service
-    return build('gmail', 'v1', credentials=creds)
+    """Return this thread's cached Gmail API service, or None if authentication is needed"""
+    return gmail_session.service()
+
+def message_summary(msg):
+    """Subject, sender, date and snippet of a message fetched in metadata format"""
+    headers = msg.get('payload', {}).get('headers', [])
+    return {
+        'id': msg['id'],
+        'subject': next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject'),
+        'sender': next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown'),
+        'date': next((h['value'] for h in headers if h['name'] == 'Date'), 'Unknown Date'),
+        'snippet': msg.get('snippet', '')
+    }
+
+def fetch_message_summaries(gmail, message_ids):
+    """Fetch the list headers and snippet of messages in batched metadata requests"""
+    # One retry at most, so a rate-limited page is not held up for long
+    fetched, _ = gmail_session.fetch_metadata(
+        gmail, message_ids, GMAIL_MESSAGE_HEADERS, 'id,snippet,payload/headers', retries=1
+    )
+    return [message_summary(fetched[message_id]) for message_id in message_ids if message_id in fetched]
 
 @mcp_app.route('/mcp/gmail/auth', methods=['GET'])
 def gmail_auth():
@@ -130,9 +182,9 @@ def gmail_callback():
         # Get credentials
         credentials = flow.credentials
         
-        # Save credentials
-        with open(GMAIL_TOKEN_FILE, 'wb') as token:
-            pickle.dump(credentials, token)
+        # Save credentials and start using them
+        gmail_session.set_credentials(credentials)
+        gmail_sync.credentials_changed()
             
         # Redirect back to the main application
         return redirect('http://localhost:3000/mcp')
@@ -145,14 +197,10 @@ def gmail_callback():
 def gmail_status():
     """Check Gmail authentication status"""
     try:
-        if os.path.exists(GMAIL_TOKEN_FILE):
-            with open(GMAIL_TOKEN_FILE, 'rb') as token:
-                creds = pickle.load(token)
-                
-            if creds and creds.valid:
-                gmail = build('gmail', 'v1', credentials=creds)
-                profile = gmail.users().getProfile(userId='me').execute()
-                return jsonify({"authenticated": True, "email": profile.get('emailAddress')})
+        # Served from memory; the profile is fetched at most once per GMAIL_PROFILE_TTL
+        profile = gmail_session.profile()
+        if profile:
+            return jsonify({"authenticated": True, "email": profile.get('emailAddress')})
                 
         return jsonify({"authenticated": False})
     
@@ -161,41 +209,83 @@ def gmail_status():
 
 @mcp_app.route('/mcp/gmail/messages', methods=['GET'])
 def gmail_messages():
-    """Get recent Gmail messages"""
+    """
+    Get recent Gmail messages, a page at a time (maxResults, pageToken, q).
+
+    Once the message store is synced, pages are read from it and `q` matches
+    messages whose subject, sender or snippet contain every word of it
+    (case-insensitive substrings). Queries using Gmail search operators
+    (from:, is:unread, -word, "phrases", OR, ...) go to the Gmail API with
+    full search semantics, as do pages older than the synced window; their
+    page tokens start with "live:".
+    """
     try:
+        try:
+            max_results = min(max(int(request.args.get('maxResults', 10)), 1), GMAIL_MAX_RESULTS)
+        except ValueError:
+            return jsonify({"error": "maxResults must be an integer"}), 400
+        page_token = request.args.get('pageToken')
+        query = request.args.get('q', '').strip()
+        
+        if gmail_session.credentials() is None:
+            return jsonify({"error": "Gmail authentication required"}), 401
+        
+        # Served from the synced store; page tokens are offsets into it
+        live_token = page_token and page_token.startswith('live:')
+        if GMAIL_SYNC_ENABLED and not live_token and is_local_query(query) and gmail_sync.ready():
+            try:
+                offset = max(int(page_token or 0), 0)
+            except ValueError:
+                return jsonify({"error": "Invalid pageToken"}), 400
+            with stage("gmail_store_list"):
+                messages, total = gmail_store.list(limit=max_results, offset=offset, query=query)
+            next_page_token = str(offset + max_results) if offset + max_results < total else None
+            window_start = gmail_store.window_start()
+            if next_page_token is None and window_start is not None:
+                # Older mail was not synced; continue with the API from where the store ends
+                next_page_token = f"live:{window_start // 1000}:"
+            return jsonify({
+                "messages": messages,
+                "nextPageToken": next_page_token,
+                "resultSizeEstimate": total,
+                "source": "store"
+            })
+
+        # "live:<before>:<Gmail page token>" continues past the store's window
+        before = None
+        if live_token:
+            _, before, page_token = page_token.split(':', 2)
+            if not before.isdigit():
+                return jsonify({"error": "Invalid pageToken"}), 400
+            query = f"{query} before:{before}".strip()
+            page_token = page_token or None
+        
         # Get Gmail service
         gmail = get_gmail_service()
         
         if not gmail:
             return jsonify({"error": "Gmail authentication required"}), 401
             
-        # Get messages
-        results = gmail.users().messages().list(userId='me', maxResults=10).execute()
-        messages = results.get('messages', [])
+        # Get message ids, then their details in one batch
+        with stage("gmail_list_messages"):
+            results = gmail.users().messages().list(
+                userId='me',
+                maxResults=max_results,
+                pageToken=page_token,
+                q=query or None,
+                fields='messages/id,nextPageToken,resultSizeEstimate'
+            ).execute()
+        message_ids = [message['id'] for message in results.get('messages', [])]
+        next_page_token = results.get('nextPageToken')
+        if before and next_page_token:
+            next_page_token = f"live:{before}:{next_page_token}"
         
-        message_list = []
-        
-        for message in messages:
-            msg = gmail.users().messages().get(userId='me', id=message['id']).execute()
-            
-            # Get message details
-            headers = msg['payload']['headers']
-            subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-            sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown')
-            date = next((h['value'] for h in headers if h['name'] == 'Date'), 'Unknown Date')
-            
-            # Get message snippet
-            snippet = msg.get('snippet', '')
-            
-            message_list.append({
-                'id': message['id'],
-                'subject': subject,
-                'sender': sender,
-                'date': date,
-                'snippet': snippet
-            })
-            
-        return jsonify({"messages": message_list})
+        return jsonify({
+            "messages": fetch_message_summaries(gmail, message_ids),
+            "nextPageToken": next_page_token,
+            "resultSizeEstimate": results.get('resultSizeEstimate'),
+            "source": "live"
+        })
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -227,13 +317,27 @@ def gmail_send():
         }
         
         # Send email
-        sent_message = gmail.users().messages().send(userId='me', body=message).execute()
+        with stage("gmail_send"):
+            sent_message = gmail.users().messages().send(userId='me', body=message).execute()
+        gmail_sync.trigger()
         
         return jsonify({"message": "Email sent successfully", "id": sent_message['id']})
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@mcp_app.route('/mcp/gmail/sync', methods=['GET', 'POST'])
+def gmail_sync_status():
+    """Local message store status; POST starts a sync right away"""
+    try:
+        if not GMAIL_SYNC_ENABLED:
+            return jsonify({"enabled": False})
+        if request.method == 'POST':
+            gmail_sync.trigger()
+        return jsonify({"enabled": True, **gmail_sync.status()})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # ----------------- GitLab Integration -----------------
 
 @mcp_app.route('/mcp/gitlab/status', methods=['GET'])
@@ -245,7 +349,8 @@ def gitlab_status():
 
         # Verify token by making an API call
         headers = {'Authorization': f'Bearer {GITLAB_TOKEN}'}
-        response = requests.get(f"{GITLAB_URL}/api/v4/user", headers=headers)
+        with stage("gitlab_user"):
+            response = requests.get(f"{GITLAB_URL}/api/v4/user", headers=headers)
         
         if response.status_code == 200:
             user_data = response.json()
@@ -258,25 +363,35 @@ def gitlab_status():
     except Exception as e:
         return jsonify({"authenticated": False, "error": str(e)})
 
+def gitlab_limit():
+    """The `limit` query parameter, capped at GITLAB_MAX_ITEMS"""
+    return min(max(int(request.args.get('limit', GITLAB_MAX_ITEMS)), 1), GITLAB_MAX_ITEMS)
+
 @mcp_app.route('/mcp/gitlab/projects', methods=['GET'])
 def gitlab_projects():
-    """Get user's GitLab projects"""
+    """Get all of the user's GitLab projects (up to `limit`)"""
     try:
         if not GITLAB_TOKEN:
             return jsonify({"error": "GitLab token not configured"}), 401
 
-        headers = {'Authorization': f'Bearer {GITLAB_TOKEN}'}
-        response = requests.get(f"{GITLAB_URL}/api/v4/projects", headers=headers)
-        
-        if response.status_code == 200:
-            return jsonify({"projects": response.json()})
-        return jsonify({"error": "Failed to fetch projects"}), response.status_code
+        try:
+            limit = gitlab_limit()
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+
+        projects, truncated = gitlab.projects(limit=limit)
+        return jsonify({"projects": projects, "total": len(projects), "truncated": truncated})
+    except GitLabError as e:
+        return jsonify({"error": "Failed to fetch projects"}), e.status_code
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @mcp_app.route('/mcp/gitlab/issues', methods=['GET'])
 def gitlab_issues():
-    """Get issues from a GitLab project"""
+    """
+    Get the issues of a GitLab project (up to `limit`, from `offset`), optionally
+    filtered by state, labels and search words and sorted by order_by/sort
+    """
     try:
         if not GITLAB_TOKEN:
             return jsonify({"error": "GitLab token not configured"}), 401
@@ -285,15 +400,42 @@ def gitlab_issues():
         if not project_id:
             return jsonify({"error": "Project ID required"}), 400
 
-        headers = {'Authorization': f'Bearer {GITLAB_TOKEN}'}
-        response = requests.get(
-            f"{GITLAB_URL}/api/v4/projects/{project_id}/issues",
-            headers=headers
-        )
-        
-        if response.status_code == 200:
-            return jsonify({"issues": response.json()})
-        return jsonify({"error": "Failed to fetch issues"}), response.status_code
+        try:
+            limit = gitlab_limit()
+            offset = max(int(request.args.get('offset', 0)), 0)
+        except ValueError:
+            return jsonify({"error": "limit and offset must be integers"}), 400
+
+        # Projects addressed by path rather than numeric id are read live
+        if GITLAB_MIRROR_ENABLED and project_id.isdigit():
+            issue_sync.ensure_project(project_id)
+            labels = [label.strip() for label in request.args.get('labels', '').split(',') if label.strip()]
+            try:
+                with stage("gitlab_mirror_list"):
+                    issues, total = issue_mirror.list(
+                        int(project_id),
+                        state=request.args.get('state'),
+                        labels=labels,
+                        search=request.args.get('search'),
+                        order_by=request.args.get('order_by', 'created_at'),
+                        sort=request.args.get('sort', 'desc'),
+                        limit=limit,
+                        offset=offset
+                    )
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            return jsonify({
+                "issues": issues,
+                "total": total,
+                "truncated": offset + len(issues) < total,
+                "source": "mirror"
+            })
+
+        filters = {key: request.args[key] for key in ('state', 'labels') if request.args.get(key)}
+        issues, truncated = gitlab.issues(project_id, limit=limit, **filters)
+        return jsonify({"issues": issues, "total": len(issues), "truncated": truncated})
+    except GitLabError as e:
+        return jsonify({"error": "Failed to fetch issues"}), e.status_code
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -313,18 +455,70 @@ def gitlab_create_issue():
             return jsonify({"error": "Missing required fields"}), 400
 
         headers = {'Authorization': f'Bearer {GITLAB_TOKEN}'}
-        response = requests.post(
-            f"{GITLAB_URL}/api/v4/projects/{project_id}/issues",
-            headers=headers,
-            json={'title': title, 'description': description}
-        )
+        with stage("gitlab_create_issue"):
+            response = requests.post(
+                f"{GITLAB_URL}/api/v4/projects/{project_id}/issues",
+                headers=headers,
+                json={'title': title, 'description': description}
+            )
         
         if response.status_code == 201:
-            return jsonify({"issue": response.json()})
+            issue = response.json()
+            if GITLAB_MIRROR_ENABLED:
+                issue_mirror.upsert_issue(project_issue(issue))
+            return jsonify({"issue": issue})
         return jsonify({"error": "Failed to create issue"}), response.status_code
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def is_issue_event(event):
+    """Whether a webhook payload reports a change to an issue"""
+    if event.get('object_kind') == 'issue':
+        return True
+    # Comments touch the issue's updated_at
+    return event.get('object_kind') == 'note' and \
+        (event.get('object_attributes') or {}).get('noteable_type') == 'Issue'
+
+@mcp_app.route('/mcp/gitlab/webhook', methods=['POST'])
+def gitlab_webhook():
+    """
+    GitLab webhook receiver; issue events queue a delta sync of their project.
+    Requests must carry GITLAB_WEBHOOK_SECRET in X-Gitlab-Token.
+    """
+    try:
+        if not GITLAB_WEBHOOK_SECRET:
+            return jsonify({"error": "GitLab webhook secret not configured"}), 403
+        if not hmac.compare_digest(request.headers.get('X-Gitlab-Token', ''), GITLAB_WEBHOOK_SECRET):
+            return jsonify({"error": "Invalid webhook token"}), 401
+
+        event = request.get_json(silent=True) or {}
+        project_id = (event.get('project') or {}).get('id')
+        if not (GITLAB_MIRROR_ENABLED and project_id and is_issue_event(event)):
+            return jsonify({"queued": False})
+        if issue_mirror.project(project_id) is None:
+            # Not viewed yet; its first request will run a full sync
+            return jsonify({"queued": False, "project_id": project_id})
+
+        issue_sync.trigger(project_id)
+        return jsonify({"queued": True, "project_id": project_id}), 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@mcp_app.route('/mcp/gitlab/mirror', methods=['GET', 'POST'])
+def gitlab_mirror_status():
+    """Issue mirror status; POST syncs a project (`project_id`) or every mirrored one right away"""
+    try:
+        if not GITLAB_MIRROR_ENABLED:
+            return jsonify({"enabled": False})
+        if request.method == 'POST':
+            project_id = request.args.get('project_id') or (request.get_json(silent=True) or {}).get('project_id')
+            issue_sync.trigger(int(project_id) if project_id else None)
+        return jsonify({"enabled": True, **issue_sync.status()})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+report_startup("mcp_server")
+
 # Run the app
 if __name__ == '__main__':
     mcp_app.run(host='0.0.0.0', port=5001, debug=True) 
\ No newline at end of file
@@ -0,0 +1,162 @@
+"""
+On-demand rendering of markdown research outputs into download formats.
+
+Renderers are registered per file extension. A rendered file is written
+once into the research cache, keyed by the source's content hash, so later
+downloads of an unchanged report are plain file serves. Rendering runs on a
+small worker pool; callers wait briefly and otherwise tell the client to
+retry, so a slow render never pins a request thread.
+"""
+import hashlib
+import importlib.util
+import io
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from file_cache import CACHE_DIR, content_etag
+from instrumentation import lazy_import, stage
+
+# extension -> (mime type, render function taking (markdown, title) and returning bytes)
+RENDERERS = {}
+
+# Bump to invalidate every cached rendering after a renderer changes
+RENDER_VERSION = "1"
+
+_render_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("RENDER_WORKERS", "2")),
+    thread_name_prefix="report-render"
+)
+_in_flight = {}
+# Reentrant: a render that finishes before add_done_callback runs its callback inline
+_lock = threading.RLock()
+
+
+def register_renderer(extension, mime_type):
+    """Register a function rendering markdown text into a format"""
+    def decorator(func):
+        RENDERERS[extension] = (mime_type, func)
+        return func
+    return decorator
+
+
+@register_renderer(".html", "text/html")
+def render_html(markdown_text, title):
+    return lazy_import("markdown2").markdown(markdown_text).encode("utf-8")
+
+
+@register_renderer(".docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+def render_docx(markdown_text, title):
+    doc = lazy_import("docx").Document()
+    doc.add_heading(title, 0)
+
+    # Simple markdown parsing (headers and paragraphs only)
+    for line in markdown_text.split('\n'):
+        if line.startswith('# '):
+            doc.add_heading(line[2:], 1)
+        elif line.startswith('## '):
+            doc.add_heading(line[3:], 2)
+        elif line.startswith('### '):
+            doc.add_heading(line[4:], 3)
+        elif line.strip():
+            doc.add_paragraph(line)
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def markdown_to_text(markdown_text):
+    """Strip markdown syntax, keeping the text"""
+    text = re.sub(r"^#{1,6}\s*", "", markdown_text, flags=re.MULTILINE)
+    text = re.sub(r"!?\[([^\]]*)\]\([^)]*\)", r"\1", text)
+    text = re.sub(r"(\*\*|__|\*|_|`)(.+?)\1", r"\2", text)
+    return text
+
+
+@register_renderer(".txt", "text/plain")
+def render_text(markdown_text, title):
+    return f"{title}\n{'=' * len(title)}\n\n{markdown_to_text(markdown_text)}".encode("utf-8")
+
+
+# PDF needs fpdf2, which is optional
+if importlib.util.find_spec("fpdf") is not None:
+    @register_renderer(".pdf", "application/pdf")
+    def render_pdf(markdown_text, title):
+        fpdf = lazy_import("fpdf")
+        pdf = fpdf.FPDF()
+        pdf.set_auto_page_break(auto=True, margin=15)
+        pdf.add_page()
+        pdf.set_font("Helvetica", size=11)
+        # Core fonts are latin-1 only
+        pdf.multi_cell(0, 6, render_text(markdown_text, title).decode("utf-8").encode("latin-1", "replace").decode("latin-1"))
+        return bytes(pdf.output())
+
+
+def mime_type_for(extension):
+    """MIME type of a renderable extension, or None"""
+    renderer = RENDERERS.get(extension)
+    return renderer[0] if renderer else None
+
+
+def _cache_path(source, extension, title):
+    # Archived files carry the ETag of the file they were packed from
+    etag = source.etag if hasattr(source, "read_text") else content_etag(source)
+    key = hashlib.sha256(
+        f"{etag}|{extension}|{title}|{RENDER_VERSION}".encode("utf-8")
+    ).hexdigest()[:32]
+    return CACHE_DIR / f"render-{key}{extension}"
+
+
+def _render(source, extension, title, target):
+    if hasattr(source, "read_text"):
+        markdown_text = source.read_text()
+    else:
+        with open(source, "r", encoding="utf-8") as f:
+            markdown_text = f.read()
+    with stage(f"render_{extension.lstrip('.')}"):
+        data = RENDERERS[extension][1](markdown_text, title)
+
+    # Write atomically so concurrent requests never see a partial file
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, target)
+    return target
+
+
+def render_report(source, extension, title, wait=None):
+    """
+    Return the path of `source` rendered to `extension`, rendering it on the
+    worker pool if it is not cached yet. `source` is a markdown file path or
+    an ArchivedFile. Returns None if the render did not finish within `wait`
+    seconds; it keeps going in the background.
+
+    Raises:
+        KeyError: if no renderer is registered for the extension
+    """
+    if extension not in RENDERERS:
+        raise KeyError(extension)
+    target = _cache_path(source, extension, title)
+    if target.exists():
+        return target
+
+    with _lock:
+        future = _in_flight.get(target)
+        if future is None:
+            future = _render_pool.submit(_render, source, extension, title, target)
+            _in_flight[target] = future
+            future.add_done_callback(lambda _: _forget(target))
+
+    try:
+        return future.result(timeout=wait)
+    except FutureTimeout:
+        return None
+
+
+def _forget(target):
+    with _lock:
+        _in_flight.pop(target, None)
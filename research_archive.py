@@ -0,0 +1,142 @@
+"""
+Compacted storage for old research runs.
+
+Runs past the compaction age are packed into one zip archive per month of
+submission (research_archive/2025-05.zip), each file stored as
+<research_id>/<file name>. The zip central directory is the archive's index:
+a single file is read straight out of it without unpacking anything else,
+so archived runs are served without extracting them to disk. Each member
+carries the content ETag of the original file as its comment, keeping
+validators and cached renderings stable across compaction.
+"""
+import datetime
+import os
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+from pathlib import Path
+
+from file_cache import content_etag
+
+ARCHIVE_DIR = Path(os.getenv("RESEARCH_ARCHIVE_DIR", "research_archive"))
+
+# Open archives kept for reads; each holds its parsed central directory
+MAX_OPEN_ARCHIVES = 8
+
+_readers = OrderedDict()
+_lock = threading.Lock()
+
+
+def archive_path_for(created_at, archive_dir=ARCHIVE_DIR):
+    """Monthly archive a run submitted at `created_at` belongs in"""
+    month = datetime.datetime.fromtimestamp(created_at).strftime("%Y-%m")
+    return Path(archive_dir) / f"{month}.zip"
+
+
+def member_name(research_id, file_name):
+    return f"{research_id}/{file_name}"
+
+
+def _reader(archive_path):
+    """Shared ZipFile for an archive, reopened when the archive is rewritten"""
+    st = os.stat(archive_path)
+    key = (str(archive_path), st.st_mtime_ns, st.st_size)
+    with _lock:
+        archive = _readers.get(key)
+        if archive is not None:
+            _readers.move_to_end(key)
+            return archive
+
+        # Members still being read keep their file open after close()
+        for stale in [k for k in _readers if k[0] == key[0]]:
+            _readers.pop(stale).close()
+        archive = zipfile.ZipFile(archive_path)
+        _readers[key] = archive
+        while len(_readers) > MAX_OPEN_ARCHIVES:
+            _readers.popitem(last=False)[1].close()
+        return archive
+
+
+class ArchivedFile:
+    """One file of an archived run"""
+
+    def __init__(self, archive_path, info):
+        self.archive_path = Path(archive_path)
+        self.member = info.filename
+        self.name = info.filename.split("/", 1)[1]
+        self.size = info.file_size
+        self.etag = info.comment.decode("ascii") or f"{info.CRC:08x}-{info.file_size:x}"
+        self.modified = datetime.datetime(*info.date_time).timestamp()
+
+    def read_bytes(self):
+        with _reader(self.archive_path).open(self.member) as f:
+            return f.read()
+
+    def read_text(self):
+        return self.read_bytes().decode("utf-8")
+
+
+def open_member(archive_path, research_id, file_name):
+    """Return the ArchivedFile for one file of a run, or None if it is not archived"""
+    try:
+        info = _reader(archive_path).getinfo(member_name(research_id, file_name))
+    except (OSError, KeyError, zipfile.BadZipFile):
+        return None
+    return ArchivedFile(archive_path, info)
+
+
+def list_members(archive_path, research_id):
+    """File names archived for a run"""
+    prefix = f"{research_id}/"
+    try:
+        names = _reader(archive_path).namelist()
+    except (OSError, zipfile.BadZipFile):
+        return []
+    return [name[len(prefix):] for name in names if name.startswith(prefix)]
+
+
+def write_archive(archive_path, runs):
+    """
+    Add runs to an archive, rewriting it atomically. `runs` maps research ids
+    to {file name: path}; runs already in the archive are replaced. The new
+    archive is verified before it replaces the old one, since callers delete
+    the original files afterwards.
+
+    Returns:
+        Uncompressed and compressed size of the added files in bytes
+    """
+    archive_path = Path(archive_path)
+    archive_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=archive_path.parent, suffix=".tmp")
+    os.close(fd)
+    raw_size = packed_size = 0
+    try:
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9) as out:
+            if archive_path.exists():
+                with zipfile.ZipFile(archive_path) as existing:
+                    for info in existing.infolist():
+                        if info.filename.split("/", 1)[0] not in runs:
+                            out.writestr(info, existing.read(info))
+
+            for research_id, files in runs.items():
+                for file_name, path in sorted(files.items()):
+                    info = zipfile.ZipInfo.from_file(path, member_name(research_id, file_name))
+                    info.comment = content_etag(path).encode("ascii")
+                    with open(path, "rb") as f:
+                        out.writestr(info, f.read(), compress_type=zipfile.ZIP_DEFLATED, compresslevel=9)
+                    written = out.getinfo(info.filename)
+                    raw_size += written.file_size
+                    packed_size += written.compress_size
+
+        with zipfile.ZipFile(tmp_path) as check:
+            bad = check.testzip()
+            if bad is not None:
+                raise zipfile.BadZipFile(f"Corrupt member {bad} in new archive")
+        # mkstemp creates the file private to this user
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, archive_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return raw_size, packed_size
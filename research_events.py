@@ -0,0 +1,116 @@
+"""
+In-process event channels for startup research runs.
+
+The crew publishes lifecycle and per-task events for each research id, and
+the API streams them to clients as Server-Sent Events. Every channel keeps
+its full history, so a client that connects late (or reconnects with
+Last-Event-ID) replays what it missed before receiving live events.
+Finished channels are dropped after a retention period.
+"""
+import json
+import threading
+import time
+
+# Events after which nothing more is published for a research
+FINAL_EVENTS = {"completed", "failed"}
+
+
+class _Channel:
+    __slots__ = ("events", "closed_at")
+
+    def __init__(self):
+        self.events = []
+        self.closed_at = None
+
+
+class ResearchEvents:
+    """
+    Publish/subscribe hub keyed by research id.
+
+    Args:
+        retention: Seconds a finished channel is kept for late subscribers
+        heartbeat: Seconds a subscriber waits before yielding a keep-alive
+    """
+
+    def __init__(self, retention=600, heartbeat=15):
+        self.retention = retention
+        self.heartbeat = heartbeat
+        self._cond = threading.Condition()
+        self._channels = {}
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for research_id in [
+            rid for rid, channel in self._channels.items()
+            if channel.closed_at is not None and now - channel.closed_at > self.retention
+        ]:
+            del self._channels[research_id]
+
+    def open(self, research_id):
+        """
+        Create the channel for a research so subscribers can attach before the
+        first event. A finished channel is reopened, keeping its history, when
+        the research is resumed.
+        """
+        with self._cond:
+            self._evict_expired()
+            self._channels.setdefault(research_id, _Channel()).closed_at = None
+
+    def publish(self, research_id, event, payload=None):
+        """Append an event to a research's channel and wake its subscribers"""
+        with self._cond:
+            channel = self._channels.setdefault(research_id, _Channel())
+            if channel.closed_at is not None:
+                return
+            data = dict(payload or {})
+            data.setdefault("research_id", research_id)
+            data.setdefault("ts", time.time())
+            channel.events.append((len(channel.events) + 1, event, data))
+            if event in FINAL_EVENTS:
+                channel.closed_at = time.monotonic()
+            self._cond.notify_all()
+
+    def has_channel(self, research_id):
+        """Whether this process holds events for a research"""
+        with self._cond:
+            return research_id in self._channels
+
+    def subscribe(self, research_id, after=0):
+        """
+        Yield (event_id, event, payload) tuples for a research, starting after
+        event id `after`, until a final event has been delivered. Yields None
+        every `heartbeat` seconds without events so callers can send a
+        keep-alive and notice disconnected clients.
+        """
+        cursor = after
+        while True:
+            with self._cond:
+                channel = self._channels.get(research_id)
+                if channel is None:
+                    return
+                if len(channel.events) <= cursor and channel.closed_at is None:
+                    self._cond.wait(self.heartbeat)
+                pending = channel.events[cursor:]
+                finished = channel.closed_at is not None
+
+            if not pending:
+                if finished:
+                    return
+                yield None
+                continue
+
+            for item in pending:
+                cursor = item[0]
+                yield item
+            if finished and cursor >= len(channel.events):
+                return
+
+
+def encode_sse(event, payload, event_id=None):
+    """Encode one Server-Sent Events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(payload, default=str)}")
+    return "\n".join(lines) + "\n\n"
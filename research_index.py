@@ -0,0 +1,134 @@
+"""
+Similarity index over past startup evaluations.
+
+Ideas are embedded as TF-IDF weighted, hashed character n-gram vectors, so
+reworded or misspelled ideas ("video call appliaction") still land close to
+earlier runs. The planning and market research of each run are embedded
+with hashed word n-grams as a second signal. Everything lives in NumPy
+arrays in memory; the index is rebuilt from research_outputs on first use
+and extended as runs finish.
+"""
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+DIMENSIONS = 2 ** 12
+
+# Market research can drown a short idea, so it only counts at this weight
+CONTENT_WEIGHT = 0.8
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _normalize(text):
+    return " ".join(_WORD_RE.findall((text or "").lower()))
+
+
+def _bucket(feature):
+    return zlib.crc32(feature.encode("utf-8")) % DIMENSIONS
+
+
+def idea_features(text):
+    """Character 3- and 4-grams of the normalized idea, padded at word edges"""
+    padded = f" {_normalize(text)} "
+    return [padded[i:i + n] for n in (3, 4) for i in range(len(padded) - n + 1)]
+
+
+def content_features(text):
+    """Word unigrams and bigrams"""
+    words = _normalize(text).split()
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def hashed_counts(features):
+    """Term counts of `features` folded into a DIMENSIONS-long vector"""
+    if not features:
+        return np.zeros(DIMENSIONS, dtype=np.float32)
+    buckets = np.fromiter((_bucket(f) for f in features), dtype=np.int64, count=len(features))
+    return np.bincount(buckets, minlength=DIMENSIONS).astype(np.float32)
+
+
+class _TfidfMatrix:
+    """Rows of hashed term counts, scored against a query with TF-IDF cosine similarity"""
+
+    def __init__(self):
+        self.rows = []
+        self.doc_freq = np.zeros(DIMENSIONS, dtype=np.float32)
+        self._weighted = None
+
+    def add(self, counts):
+        self.rows.append(counts)
+        self.doc_freq += counts > 0
+        self._weighted = None
+
+    def _idf(self):
+        return np.log((1.0 + len(self.rows)) / (1.0 + self.doc_freq)) + 1.0
+
+    @staticmethod
+    def _l2_normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        return matrix / np.where(norms == 0, 1.0, norms)
+
+    def similarities(self, query_counts):
+        if not self.rows:
+            return np.zeros(0, dtype=np.float32)
+        idf = self._idf()
+        if self._weighted is None:
+            self._weighted = self._l2_normalize(np.log1p(np.vstack(self.rows)) * idf)
+        query = self._l2_normalize(np.log1p(query_counts) * idf)
+        return self._weighted @ query
+
+
+class ResearchIndex:
+    """Nearest past evaluations for a startup idea"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entries = []
+        self._ideas = _TfidfMatrix()
+        self._contents = _TfidfMatrix()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, research_id, startup_idea, content="", created_at=None):
+        """Index one completed run; `content` is its planning and market research"""
+        with self._lock:
+            if any(entry["research_id"] == research_id for entry in self.entries):
+                return
+            self.entries.append({
+                "research_id": research_id,
+                "startup_idea": startup_idea,
+                "created_at": created_at or time.time(),
+            })
+            self._ideas.add(hashed_counts(idea_features(startup_idea)))
+            self._contents.add(hashed_counts(content_features(content)))
+
+    def search(self, startup_idea, limit=5, max_age=None, min_score=0.0):
+        """
+        Return up to `limit` (entry, score) pairs, best first. Scores are the
+        larger of the idea similarity and the weighted similarity between the
+        idea and a run's research. Runs older than `max_age` seconds are skipped.
+        """
+        with self._lock:
+            if not self.entries:
+                return []
+            idea_scores = self._ideas.similarities(hashed_counts(idea_features(startup_idea)))
+            content_scores = self._contents.similarities(hashed_counts(content_features(startup_idea)))
+            scores = np.maximum(idea_scores, CONTENT_WEIGHT * content_scores)
+            entries = list(self.entries)
+
+        now = time.time()
+        results = []
+        for position in np.argsort(-scores):
+            score = float(scores[position])
+            if score < min_score or len(results) >= limit:
+                break
+            entry = entries[position]
+            if max_age is not None and now - entry["created_at"] > max_age:
+                continue
+            results.append((entry, round(score, 4)))
+        return results
@@ -0,0 +1,258 @@
+"""
+SQLite manifest of startup research runs.
+
+One row per research id holds the original idea, lifecycle state, timings
+and output file names, so listing and status lookups are indexed queries
+instead of directory scans. status.json files in each research directory
+stay the per-run source of truth; the manifest is updated alongside them and
+rebuilt from them for runs it does not know about yet. Once a run is
+compacted its row also names the archive holding its files.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS researches (
+    research_id TEXT PRIMARY KEY,
+    startup_idea TEXT,
+    state TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT '{}',
+    files TEXT NOT NULL DEFAULT '[]',
+    archive TEXT
+);
+CREATE INDEX IF NOT EXISTS researches_created_at ON researches (created_at DESC);
+CREATE INDEX IF NOT EXISTS researches_state_created_at ON researches (state, created_at DESC);
+CREATE TABLE IF NOT EXISTS task_usage (
+    research_id TEXT NOT NULL,
+    task TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    wall_seconds REAL,
+    llm_seconds REAL NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    llm_calls INTEGER NOT NULL,
+    retries INTEGER NOT NULL,
+    cost_usd REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS task_usage_recorded_at ON task_usage (recorded_at);
+CREATE INDEX IF NOT EXISTS task_usage_research_id ON task_usage (research_id);
+CREATE TABLE IF NOT EXISTS batches (
+    batch_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    items TEXT NOT NULL,
+    comparison TEXT
+);
+"""
+
+
+class ResearchManifest:
+    """Thread-safe access to the manifest database"""
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            # Databases created before compaction lack the archive column
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(researches)")}
+            if "archive" not in columns:
+                self._conn.execute("ALTER TABLE researches ADD COLUMN archive TEXT")
+
+    @staticmethod
+    def _row_to_dict(row):
+        return {
+            "research_id": row["research_id"],
+            "startup_idea": row["startup_idea"],
+            "state": row["state"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "status": json.loads(row["status"]),
+            "files": json.loads(row["files"]),
+            "archive": row["archive"],
+        }
+
+    def known_ids(self):
+        """All research ids in the manifest"""
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT research_id FROM researches")}
+
+    def upsert_status(self, research_id, status, created_at=None, files=None):
+        """Insert or update a run from its status dict (and optionally its file names)"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO researches (research_id, startup_idea, state, created_at, updated_at, status, files)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (research_id) DO UPDATE SET
+                    startup_idea = COALESCE(excluded.startup_idea, researches.startup_idea),
+                    state = excluded.state,
+                    updated_at = excluded.updated_at,
+                    status = excluded.status,
+                    files = CASE WHEN ? THEN excluded.files ELSE researches.files END
+                """,
+                (
+                    research_id,
+                    status.get("startup_idea"),
+                    status.get("state"),
+                    created_at or now,
+                    now,
+                    json.dumps(status),
+                    json.dumps(sorted(files or [])),
+                    files is not None,
+                )
+            )
+
+    def add_files(self, research_id, file_names):
+        """Record output files of a run, keeping the list sorted and unique"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT files FROM researches WHERE research_id = ?", (research_id,)
+            ).fetchone()
+            if row is None:
+                return
+            files = sorted(set(json.loads(row["files"])) | set(file_names))
+            self._conn.execute(
+                "UPDATE researches SET files = ?, updated_at = ? WHERE research_id = ?",
+                (json.dumps(files), time.time(), research_id)
+            )
+
+    def set_files(self, research_id, file_names):
+        """Replace the recorded output files of a run"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE researches SET files = ?, updated_at = ? WHERE research_id = ?",
+                (json.dumps(sorted(set(file_names))), time.time(), research_id)
+            )
+
+    def get(self, research_id):
+        """Return one run as a dict, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM researches WHERE research_id = ?", (research_id,)
+            ).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def ids_in_states(self, states):
+        """Research ids whose state is one of `states`"""
+        placeholders = ",".join("?" for _ in states)
+        with self._lock:
+            return [
+                row[0] for row in self._conn.execute(
+                    f"SELECT research_id FROM researches WHERE state IN ({placeholders})", tuple(states)
+                )
+            ]
+
+    def compactable_ids(self, before):
+        """Finished, not yet archived runs submitted before `before`, oldest first"""
+        with self._lock:
+            return [
+                row[0] for row in self._conn.execute(
+                    """
+                    SELECT research_id FROM researches
+                    WHERE state IN ('completed', 'failed') AND archive IS NULL AND created_at < ?
+                    ORDER BY created_at
+                    """,
+                    (before,)
+                )
+            ]
+
+    def set_archive(self, research_id, archive, file_names):
+        """Record that a run's files now live in `archive`"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE researches SET archive = ?, files = ?, updated_at = ? WHERE research_id = ?",
+                (archive, json.dumps(sorted(set(file_names))), time.time(), research_id)
+            )
+
+    def record_task_usage(self, research_id, tasks):
+        """Append the per-task usage of one run attempt"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO task_usage (research_id, task, recorded_at, wall_seconds, llm_seconds,
+                                        prompt_tokens, completion_tokens, llm_calls, retries, cost_usd)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (research_id, task["task"], now, task["wall_seconds"], task["llm_seconds"],
+                     task["prompt_tokens"], task["completion_tokens"], task["llm_calls"],
+                     task["retries"], task["cost_usd"])
+                    for task in tasks
+                ]
+            )
+
+    def task_usage_rows(self, since=None, research_id=None):
+        """Per-task usage rows, optionally only newer than `since` or for one run"""
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("recorded_at >= ?")
+            params.append(since)
+        if research_id is not None:
+            clauses.append("research_id = ?")
+            params.append(research_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM task_usage {where} ORDER BY recorded_at", params
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def create_batch(self, batch_id, items):
+        """Record a batch and its items (dicts carrying at least a research_id)"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO batches (batch_id, created_at, items) VALUES (?, ?, ?)",
+                (batch_id, time.time(), json.dumps(items))
+            )
+
+    def set_batch_comparison(self, batch_id, comparison):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE batches SET comparison = ? WHERE batch_id = ?", (comparison, batch_id)
+            )
+
+    def get_batch(self, batch_id):
+        """Return a batch as a dict, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM batches WHERE batch_id = ?", (batch_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "batch_id": row["batch_id"],
+            "created_at": row["created_at"],
+            "items": json.loads(row["items"]),
+            "comparison": row["comparison"],
+        }
+
+    def list(self, limit=50, offset=0, states=None, query=None):
+        """
+        Return (runs, total) newest first. `states` filters by lifecycle state
+        and `query` by a case-insensitive substring of the idea.
+        """
+        clauses, params = [], []
+        if states:
+            clauses.append(f"state IN ({','.join('?' for _ in states)})")
+            params.extend(states)
+        if query:
+            clauses.append("startup_idea LIKE ? ESCAPE '\\'")
+            escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM researches {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT * FROM researches {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows], total
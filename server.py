@@ -1,22 +1,25 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import requests
 import json
 import os
 import time
 import hashlib
+from contextlib import closing
 from urllib.parse import quote
 from dotenv import load_dotenv
 from functools import lru_cache
-import logging
-from logging.handlers import RotatingFileHandler
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-import whisper
 import tempfile
-import openai
+import threading
 from werkzeug.utils import secure_filename
 
+from admission_control import AdmissionPool, PoolFullError, admit
+from fair_scheduler import FairScheduler, request_client_id
+from instrumentation import REGISTRY, init_app as init_instrumentation, lazy_import, report_startup, stage, warm_imports
+from logging_setup import configure_logging
+
 # Load environment variables
 load_dotenv()
 
@@ -30,50 +33,113 @@ PORT = 9000
 # Get API keys from environment variables
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 SEARXNG_INSTANCE = os.getenv("SEARXNG_INSTANCE", "https://searx.be")  # Default to a public instance
+OPENAI_API_BASE = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1").rstrip("/")  # Point at a simulator for load tests
+OPENAI_CHAT_URL = f"{OPENAI_API_BASE}/chat/completions"
 
-# Initialize OpenAI client
-openai.api_key = OPENAI_API_KEY
-
-# Initialize Whisper model
+# Whisper (and torch with it) is imported and loaded on first use, or by the
+# warm-up thread when WARM_IMPORTS=true, so workers that only serve search
+# endpoints never pay for it
 whisper_model = None
+whisper_model_lock = threading.Lock()
 
-# Configure logging
-def setup_logging():
-    log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    log_file = 'research_api.log'
-    
-    # Create handlers
-    file_handler = RotatingFileHandler(log_file, maxBytes=10485760, backupCount=5)
-    file_handler.setFormatter(log_formatter)
-    file_handler.setLevel(logging.INFO)
-    
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(log_formatter)
-    console_handler.setLevel(logging.INFO)
-    
-    # Configure root logger
-    root_logger = logging.getLogger()
-    root_logger.setLevel(logging.INFO)
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
-    
-    return root_logger
-
-# Initialize logger
-logger = setup_logging()
+# Initialize logger (queued, so file and console writes happen off the request path)
+logger = configure_logging("research_api", log_file='research_api.log')
 
 # Initialize rate limiter
 limiter = Limiter(
     get_remote_address,
     app=app,
     default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://"
+    storage_uri="memory://",
+    enabled=os.getenv("RATELIMIT_ENABLED", "true").lower() != "false"
+)
+
+# Admission pools per workload class. Requests beyond a pool's slots wait in a
+# short queue; once that is full they are rejected with 503 and Retry-After.
+TRANSCRIPTION_POOL = AdmissionPool(
+    "transcription",
+    max_concurrency=int(os.getenv("TRANSCRIPTION_CONCURRENCY", "2")),
+    max_queue=int(os.getenv("TRANSCRIPTION_QUEUE", "4")),
+    max_wait=float(os.getenv("TRANSCRIPTION_MAX_WAIT", "30")),
+    initial_service_time=60.0
+)
+DEEP_RESEARCH_POOL = AdmissionPool(
+    "deep_research",
+    max_concurrency=int(os.getenv("DEEP_RESEARCH_CONCURRENCY", "4")),
+    max_queue=int(os.getenv("DEEP_RESEARCH_QUEUE", "8")),
+    max_wait=float(os.getenv("DEEP_RESEARCH_MAX_WAIT", "15")),
+    initial_service_time=20.0
 )
+QUICK_SEARCH_POOL = AdmissionPool(
+    "quick_search",
+    max_concurrency=int(os.getenv("QUICK_SEARCH_CONCURRENCY", "8")),
+    max_queue=int(os.getenv("QUICK_SEARCH_QUEUE", "16")),
+    max_wait=float(os.getenv("QUICK_SEARCH_MAX_WAIT", "5")),
+    initial_service_time=3.0
+)
+ADMISSION_POOLS = [TRANSCRIPTION_POOL, DEEP_RESEARCH_POOL, QUICK_SEARCH_POOL]
+
+# Weighted fair queue in front of every OpenAI call, keyed on the caller, so
+# one user's deep research cannot starve everybody else's quick searches
+LLM_SCHEDULER = FairScheduler(
+    "research_api",
+    capacity=int(os.getenv("LLM_CONCURRENCY", "8")),
+    interactive_reserved=int(os.getenv("LLM_INTERACTIVE_RESERVED", "2"))
+)
+
+def collect_admission_metrics():
+    """Export admission pool queue depths and rejection counts on /metrics."""
+    stats = [pool.stats() for pool in ADMISSION_POOLS]
+    return [
+        ("admission_active_requests", "gauge", "Requests currently holding an admission slot",
+         [({"pool": st["name"]}, st["active"]) for st in stats]),
+        ("admission_queue_depth", "gauge", "Requests waiting for an admission slot",
+         [({"pool": st["name"]}, st["queue_depth"]) for st in stats]),
+        ("admission_rejected_total", "counter", "Requests rejected by admission control",
+         [({"pool": st["name"], "reason": "queue_full"}, st["rejected_full"]) for st in stats] +
+         [({"pool": st["name"], "reason": "wait_timeout"}, st["rejected_timeout"]) for st in stats]),
+    ]
+
+# Per-stage latency metrics on /metrics and request traces
+init_instrumentation(app, "research_api", limiter=limiter)
+REGISTRY.register_collector(collect_admission_metrics)
+REGISTRY.register_collector(LLM_SCHEDULER.collect_metrics)
+
+def research_pool_for_request():
+    """Pick the admission pool for /api/research based on the requested mode."""
+    data = request.get_json(silent=True) or {}
+    return DEEP_RESEARCH_POOL if data.get('mode', 'deep') == 'deep' else QUICK_SEARCH_POOL
+
+@app.errorhandler(PoolFullError)
+def handle_pool_full(e):
+    """Shed load with a fast 503 when an admission pool is saturated."""
+    logger.warning(f"Rejecting request: {e} (retry after {e.retry_after}s)")
+    response = jsonify({
+        "error": "Server is busy, please retry later",
+        "pool": e.pool_name,
+        "retry_after": e.retry_after
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+@app.route('/api/admission/stats', methods=['GET'])
+@limiter.exempt
+def admission_stats():
+    """Report queue depth and rejection counts for every admission pool and LLM wait times per class."""
+    return jsonify({
+        "pools": [pool.stats() for pool in ADMISSION_POOLS],
+        "llm_scheduler": LLM_SCHEDULER.stats()
+    })
 
 def get_whisper_model():
     global whisper_model
     if whisper_model is None:
-        whisper_model = whisper.load_model("base")
+        with whisper_model_lock:
+            if whisper_model is None:
+                whisper = lazy_import("whisper")
+                with stage("whisper_model_load"):
+                    whisper_model = whisper.load_model("base")
     return whisper_model
 
 def transcribe_audio(audio_file_path):
@@ -81,19 +147,24 @@ def transcribe_audio(audio_file_path):
     try:
         model = get_whisper_model()
         
+        # Decode the upload separately so its cost shows up in the stage metrics
+        with stage("audio_decode"):
+            audio = lazy_import("whisper").load_audio(audio_file_path)
+        
         # Configure transcription options for better accuracy
-        result = model.transcribe(
-            audio_file_path,
-            language="en",  # Specify English language
-            task="transcribe",
-            fp16=False,  # Use full precision for better accuracy
-            verbose=True,  # Show progress
-            temperature=0.0,  # No randomness in transcription
-            best_of=5,  # Take the best of 5 samples
-            beam_size=5,  # Use beam search for better results
-            condition_on_previous_text=True,  # Consider previous text for context
-            initial_prompt="This is a meeting transcription. Please transcribe accurately with proper punctuation and speaker identification if possible."
-        )
+        with stage("whisper_transcribe"):
+            result = model.transcribe(
+                audio,
+                language="en",  # Specify English language
+                task="transcribe",
+                fp16=False,  # Use full precision for better accuracy
+                verbose=None,  # No per-segment console output on the request path
+                temperature=0.0,  # No randomness in transcription
+                best_of=5,  # Take the best of 5 samples
+                beam_size=5,  # Use beam search for better results
+                condition_on_previous_text=True,  # Consider previous text for context
+                initial_prompt="This is a meeting transcription. Please transcribe accurately with proper punctuation and speaker identification if possible."
+            )
         
         # Process the transcription to improve readability
         transcript = result["text"]
@@ -134,23 +205,38 @@ Please provide a summary that includes:
 Format the response in plain text with clear sections. Use markdown-style formatting for better readability.
 For action items, use bullet points and assign owners if mentioned in the transcript."""
 
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a professional meeting summarizer. Provide clear, concise, and well-structured summaries. Focus on extracting actionable insights and key decisions."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1000
-        )
+        # Direct API call using requests, like the research endpoints, so the
+        # openai package is not imported at startup
+        with LLM_SCHEDULER.slot(request_client_id(), "standard"), stage("openai_summary"):
+            response = requests.post(
+                OPENAI_CHAT_URL,
+                headers={
+                    "Authorization": f"Bearer {OPENAI_API_KEY}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": "gpt-3.5-turbo",
+                    "messages": [
+                        {"role": "system", "content": "You are a professional meeting summarizer. Provide clear, concise, and well-structured summaries. Focus on extracting actionable insights and key decisions."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    "temperature": 0.7,
+                    "max_tokens": 1000
+                },
+                timeout=60
+            )
         
-        return response.choices[0].message.content
+        if response.status_code != 200:
+            raise RuntimeError(f"OpenAI API error: {response.status_code} - {response.text}")
+        
+        return response.json()['choices'][0]['message']['content']
     except Exception as e:
         logger.error(f"Error in summary generation: {str(e)}")
         raise
 
 @app.route('/api/summarize-meeting', methods=['POST'])
 @limiter.limit("10 per hour")
+@admit(TRANSCRIPTION_POOL)
 def summarize_meeting():
     """Endpoint to handle meeting audio summarization."""
     try:
@@ -162,7 +248,7 @@ def summarize_meeting():
             return jsonify({"error": "No selected file"}), 400
         
         # Create a temporary file to store the uploaded audio
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as temp_audio:
+        with stage("upload_save"), tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as temp_audio:
             audio_file.save(temp_audio.name)
             temp_audio_path = temp_audio.name
         
@@ -194,6 +280,7 @@ def summarize_meeting():
 
 @app.route('/api/research', methods=['POST'])
 @limiter.limit("10 per minute")
+@admit(research_pool_for_request)
 def research():
     try:
         # Get the search query from the request
@@ -203,6 +290,10 @@ def research():
         
         if not query:
             return jsonify({"error": "No query provided"}), 400
+        
+        # Stream sources first and then synthesis tokens if the client asked for it
+        if wants_progressive_response(data):
+            return progressive_research_response(query, mode)
             
         # Perform research based on the requested mode
         if mode == 'deep':
@@ -218,6 +309,7 @@ def research():
 
 @app.route('/api/search', methods=['POST'])
 @limiter.limit("15 per minute")
+@admit(QUICK_SEARCH_POOL)
 def search():
     try:
         data = request.json
@@ -236,6 +328,7 @@ def search():
 
 @app.route('/api/deep-research', methods=['POST'])
 @limiter.limit("5 per minute")
+@admit(DEEP_RESEARCH_POOL)
 def deep_research():
     try:
         data = request.json
@@ -244,6 +337,9 @@ def deep_research():
         if not query:
             return jsonify({"error": "No query provided"}), 400
         
+        if wants_progressive_response(data):
+            return progressive_research_response(query, 'deep')
+        
         # Perform deep research
         results = perform_deep_research(query)
         return jsonify({"results": results})
@@ -254,6 +350,7 @@ def deep_research():
 
 @app.route('/api/academic-research', methods=['POST'])
 @limiter.limit("5 per minute")
+@admit(DEEP_RESEARCH_POOL)
 def academic_research():
     try:
         data = request.json
@@ -366,7 +463,8 @@ def search_with_searxng(query, result_count=7, time_range='', language='en'):
         }
         
         # Make the search request with timeout
-        response = requests.get(search_url, params=params, headers=headers, timeout=10)
+        with stage("searxng_search"):
+            response = requests.get(search_url, params=params, headers=headers, timeout=10)
         
         if response.status_code != 200:
             logger.error(f"SearXNG error: Status code {response.status_code}")
@@ -399,6 +497,78 @@ def search_with_searxng(query, result_count=7, time_range='', language='en'):
         logger.error(f"Error in search_with_searxng: {str(e)}")
         return []
 
+def build_synthesis_prompts(query, search_results):
+    """
+    Build the system and user prompts for an in-depth research synthesis
+    """
+    # Prepare context from search results
+    context = ""
+    for i, result in enumerate(search_results, 1):
+        context += f"Source {i}: {result['title']}\n"
+        context += f"URL: {result['link']}\n"
+        context += f"Content: {result['snippet']}\n\n"
+    
+    # Create a prompt for OpenAI to synthesize the information
+    system_prompt = """You are an expert Research Analyst AI. Your primary function is to produce comprehensive, factual, and meticulously-structured research reports of approximately 1500 words. 
+    You must critically analyze and synthesize the provided search results to generate a clear, insightful, and informative response that directly addresses the user's query.
+    
+    Core Objectives:
+    1.  Depth and Accuracy: Go beyond surface-level summarization. Extract key insights, data, and arguments from the sources. Ensure all information presented is factually grounded in the provided context.
+    2.  Critical Synthesis: Do not merely list information. Weave together findings from multiple sources to build a coherent and comprehensive understanding of the topic. Identify connections, patterns, and, if present, discrepancies within the search results.
+    3.  Structured Presentation: Adhere strictly to the specified formatting guidelines to ensure readability and professionalism.
+    4.  Objectivity: Maintain a neutral, academic tone. Present information impartially.
+    
+    Mandatory Report Structure:
+    1.  TITLE: Start with a clear, descriptive title: "IN-DEPTH RESEARCH REPORT: [Query Topic]"
+    2.  EXECUTIVE SUMMARY: A concise 6-8 sentence overview. This should encapsulate the main purpose of the report, key findings, and a brief outline of the report's structure.
+    3.  MAIN BODY (4-6 SECTIONS): Each section must have:
+        -   A DESCRIPTIVE HEADING IN ALL CAPS (e.g., "CRITICAL ANALYSIS OF KEY CONCEPTS", "RECENT ADVANCEMENTS AND THEIR IMPLICATIONS").
+        -   Well-organized content with detailed paragraphs. Each paragraph should ideally contain 5-7 sentences, focusing on a specific aspect of the section's topic.
+        -   Natural emphasis on important terms or concepts through clear articulation and context, not through markdown or special symbols.
+        -   Use of numbered or bulleted lists for clarity when presenting multiple points, examples, or data.
+    4.  CONCLUSION: A brief summary of the key insights and findings discussed in the report. This section should reiterate the main takeaways without introducing new information.
+    5.  REFERENCES OVERVIEW (Optional but Recommended): Briefly mention the types of sources consulted (e.g., "Information was synthesized from academic papers, industry reports, and news articles provided in the search results."). Do not list individual URLs unless specifically part of the content synthesis.
+    
+    Formatting and Style Guidelines:
+    -   Word Count: Target approximately 1500 words for the entire report.
+    -   Readability: Ensure ample spacing between sections and paragraphs.
+    -   Language: Use clear, precise, and professional language. Avoid jargon where possible, or explain it if necessary.
+    -   No Markdown: Strictly avoid technical formatting symbols like markdown (#, **, >, --, etc.). The output must be plain text suitable for direct reading.
+    -   Tone: Maintain a formal, objective, and analytical tone throughout the report."""
+    
+    user_prompt = f"""User Query: {query}
+    
+    Provided Search Results for Synthesis:
+    {context}
+    
+    Task: Based *solely* on the provided search results, please generate a comprehensive and well-structured research report addressing the user's query. 
+    
+    Instructions for Content Generation:
+    1.  Analyze and Synthesize: Critically evaluate the information within the provided search results. Synthesize this information to construct a detailed and coherent report. Focus on extracting meaningful insights and connections.
+    2.  Section Heading Selection: Organize your report using relevant and descriptive headings. You should aim for 4-6 main body sections. Consider using headings from the following list if they are appropriate for the query and the provided content. Adapt or create new headings as necessary to best structure the information:
+        -   "INTRODUCTION TO [Query Topic]"
+        -   "KEY CONCEPTS AND DEFINITIONS"
+        -   "HISTORICAL CONTEXT AND EVOLUTION"
+        -   "CURRENT TRENDS AND RECENT DEVELOPMENTS"
+        -   "CORE MECHANISMS AND TECHNOLOGIES"
+        -   "KEY APPLICATIONS AND USE CASES"
+        -   "OPPORTUNITIES AND POTENTIAL BENEFITS"
+        -   "CHALLENGES AND LIMITATIONS"
+        -   "CRITICAL ANALYSIS AND PERSPECTIVES"
+        -   "COMPARATIVE ANALYSIS (if applicable)"
+        -   "ETHICAL CONSIDERATIONS AND SOCIETAL IMPACT"
+        -   "INDUSTRY LEADERS AND MARKET LANDSCAPE"
+        -   "FUTURE OUTLOOK AND PREDICTIONS"
+        -   "CASE STUDIES (if details are available in sources)"
+        -   "CONCLUDING REMARKS AND SYNTHESIS"
+    3.  Content Focus: Ensure each section provides substantial detail, drawing from the provided snippets. Aim for well-developed paragraphs (5-7 sentences each).
+    4.  Adherence to Sources: Base your entire report on the information contained within the 'Search Results'. Do not introduce external knowledge or information not present in the provided context.
+    5.  Formatting: Present the report in a clean, plain-text format with clear headings and appropriate spacing as per the system prompt's structural guidelines. Ensure no markdown formatting is used.
+    
+    Deliverable: A comprehensive research report of approximately 1500 words that is well-organized, insightful, and directly addresses the user's query using only the provided search results."""
+    
+    return system_prompt, user_prompt
+
 def synthesize_with_openai(query, search_results, model="gpt-3.5-turbo"):
     """
     Use OpenAI to synthesize search results into a comprehensive answer
@@ -409,90 +579,27 @@ def synthesize_with_openai(query, search_results, model="gpt-3.5-turbo"):
             logger.warning("No OpenAI API key provided")
             return None
             
-        # Prepare context from search results
-        context = ""
-        for i, result in enumerate(search_results, 1):
-            context += f"Source {i}: {result['title']}\n"
-            context += f"URL: {result['link']}\n"
-            context += f"Content: {result['snippet']}\n\n"
-        
-        # Create a prompt for OpenAI to synthesize the information
-        system_prompt = """You are an expert Research Analyst AI. Your primary function is to produce comprehensive, factual, and meticulously-structured research reports of approximately 1500 words. 
-        You must critically analyze and synthesize the provided search results to generate a clear, insightful, and informative response that directly addresses the user's query.
-        
-        Core Objectives:
-        1.  Depth and Accuracy: Go beyond surface-level summarization. Extract key insights, data, and arguments from the sources. Ensure all information presented is factually grounded in the provided context.
-        2.  Critical Synthesis: Do not merely list information. Weave together findings from multiple sources to build a coherent and comprehensive understanding of the topic. Identify connections, patterns, and, if present, discrepancies within the search results.
-        3.  Structured Presentation: Adhere strictly to the specified formatting guidelines to ensure readability and professionalism.
-        4.  Objectivity: Maintain a neutral, academic tone. Present information impartially.
-        
-        Mandatory Report Structure:
-        1.  TITLE: Start with a clear, descriptive title: "IN-DEPTH RESEARCH REPORT: [Query Topic]"
-        2.  EXECUTIVE SUMMARY: A concise 6-8 sentence overview. This should encapsulate the main purpose of the report, key findings, and a brief outline of the report's structure.
-        3.  MAIN BODY (4-6 SECTIONS): Each section must have:
-            -   A DESCRIPTIVE HEADING IN ALL CAPS (e.g., "CRITICAL ANALYSIS OF KEY CONCEPTS", "RECENT ADVANCEMENTS AND THEIR IMPLICATIONS").
-            -   Well-organized content with detailed paragraphs. Each paragraph should ideally contain 5-7 sentences, focusing on a specific aspect of the section's topic.
-            -   Natural emphasis on important terms or concepts through clear articulation and context, not through markdown or special symbols.
-            -   Use of numbered or bulleted lists for clarity when presenting multiple points, examples, or data.
-        4.  CONCLUSION: A brief summary of the key insights and findings discussed in the report. This section should reiterate the main takeaways without introducing new information.
-        5.  REFERENCES OVERVIEW (Optional but Recommended): Briefly mention the types of sources consulted (e.g., "Information was synthesized from academic papers, industry reports, and news articles provided in the search results."). Do not list individual URLs unless specifically part of the content synthesis.
-        
-        Formatting and Style Guidelines:
-        -   Word Count: Target approximately 1500 words for the entire report.
-        -   Readability: Ensure ample spacing between sections and paragraphs.
-        -   Language: Use clear, precise, and professional language. Avoid jargon where possible, or explain it if necessary.
-        -   No Markdown: Strictly avoid technical formatting symbols like markdown (#, **, >, --, etc.). The output must be plain text suitable for direct reading.
-        -   Tone: Maintain a formal, objective, and analytical tone throughout the report."""
-        
-        user_prompt = f"""User Query: {query}
-        
-        Provided Search Results for Synthesis:
-        {context}
-        
-        Task: Based *solely* on the provided search results, please generate a comprehensive and well-structured research report addressing the user's query. 
-        
-        Instructions for Content Generation:
-        1.  Analyze and Synthesize: Critically evaluate the information within the provided search results. Synthesize this information to construct a detailed and coherent report. Focus on extracting meaningful insights and connections.
-        2.  Section Heading Selection: Organize your report using relevant and descriptive headings. You should aim for 4-6 main body sections. Consider using headings from the following list if they are appropriate for the query and the provided content. Adapt or create new headings as necessary to best structure the information:
-            -   "INTRODUCTION TO [Query Topic]"
-            -   "KEY CONCEPTS AND DEFINITIONS"
-            -   "HISTORICAL CONTEXT AND EVOLUTION"
-            -   "CURRENT TRENDS AND RECENT DEVELOPMENTS"
-            -   "CORE MECHANISMS AND TECHNOLOGIES"
-            -   "KEY APPLICATIONS AND USE CASES"
-            -   "OPPORTUNITIES AND POTENTIAL BENEFITS"
-            -   "CHALLENGES AND LIMITATIONS"
-            -   "CRITICAL ANALYSIS AND PERSPECTIVES"
-            -   "COMPARATIVE ANALYSIS (if applicable)"
-            -   "ETHICAL CONSIDERATIONS AND SOCIETAL IMPACT"
-            -   "INDUSTRY LEADERS AND MARKET LANDSCAPE"
-            -   "FUTURE OUTLOOK AND PREDICTIONS"
-            -   "CASE STUDIES (if details are available in sources)"
-            -   "CONCLUDING REMARKS AND SYNTHESIS"
-        3.  Content Focus: Ensure each section provides substantial detail, drawing from the provided snippets. Aim for well-developed paragraphs (5-7 sentences each).
-        4.  Adherence to Sources: Base your entire report on the information contained within the 'Search Results'. Do not introduce external knowledge or information not present in the provided context.
-        5.  Formatting: Present the report in a clean, plain-text format with clear headings and appropriate spacing as per the system prompt's structural guidelines. Ensure no markdown formatting is used.
-        
-        Deliverable: A comprehensive research report of approximately 1500 words that is well-organized, insightful, and directly addresses the user's query using only the provided search results."""
+        system_prompt, user_prompt = build_synthesis_prompts(query, search_results)
         
         # Direct API call using requests instead of OpenAI client
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {OPENAI_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                "max_tokens": 4000,
-                "temperature": 0.7
-            },
-            timeout=30
-        )
+        with LLM_SCHEDULER.slot(request_client_id(), "standard"), stage("openai_synthesis"):
+            response = requests.post(
+                OPENAI_CHAT_URL,
+                headers={
+                    "Authorization": f"Bearer {OPENAI_API_KEY}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": model,
+                    "messages": [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    "max_tokens": 4000,
+                    "temperature": 0.7
+                },
+                timeout=30
+            )
         
         if response.status_code != 200:
             logger.error(f"OpenAI API error: {response.status_code} - {response.text}")
@@ -508,57 +615,66 @@ def synthesize_with_openai(query, search_results, model="gpt-3.5-turbo"):
         logger.error(f"Error in synthesize_with_openai: {str(e)}")
         return None
 
+def build_summary_prompts(query, search_results):
+    """
+    Build the system and user prompts for a concise search summary
+    """
+    # Prepare context from search results
+    context = ""
+    for i, result in enumerate(search_results, 1):
+        context += f"Source {i}: {result['title']}\n"
+        context += f"URL: {result['link']}\n"
+        context += f"Content: {result['snippet']}\n\n"
+    
+    # Create a prompt for OpenAI to synthesize the information
+    system_prompt = """You are a research assistant that provides clear, concise summaries.
+    Based on the provided search results, synthesize a brief, informative response that addresses the user's query.
+    
+    Format your response with the following structure:
+    1. Start with a clear title: "SEARCH : [Query Topic]"
+    2. Follow with a brief 2-3 sentence overview
+    3. End with a brief conclusion
+    
+    Keep the response concise and to the point, focusing on the most important information.
+    Use straightforward language and avoid technical formatting symbols."""
+    
+    user_prompt = f"""Query: {query}
+    
+    Search Results:
+    {context}
+    
+    Please create a concise search summary about the query, highlighting just the most important points.
+    The summary should be brief but informative, focusing on key facts and trends.
+    Use clear, simple language accessible to a general audience."""
+    
+    return system_prompt, user_prompt
+
 def create_search_summary(query, search_results):
     """
     Use OpenAI to create a concise search summary
     """
     try:
-        # Prepare context from search results
-        context = ""
-        for i, result in enumerate(search_results, 1):
-            context += f"Source {i}: {result['title']}\n"
-            context += f"URL: {result['link']}\n"
-            context += f"Content: {result['snippet']}\n\n"
-        
-        # Create a prompt for OpenAI to synthesize the information
-        system_prompt = """You are a research assistant that provides clear, concise summaries.
-        Based on the provided search results, synthesize a brief, informative response that addresses the user's query.
-        
-        Format your response with the following structure:
-        1. Start with a clear title: "SEARCH : [Query Topic]"
-        2. Follow with a brief 2-3 sentence overview
-        3. End with a brief conclusion
-        
-        Keep the response concise and to the point, focusing on the most important information.
-        Use straightforward language and avoid technical formatting symbols."""
-        
-        user_prompt = f"""Query: {query}
-        
-        Search Results:
-        {context}
-        
-        Please create a concise search summary about the query, highlighting just the most important points.
-        The summary should be brief but informative, focusing on key facts and trends.
-        Use clear, simple language accessible to a general audience."""
+        system_prompt, user_prompt = build_summary_prompts(query, search_results)
         
         # Direct API call using requests
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {OPENAI_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "gpt-3.5-turbo",
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                "max_tokens": 1000,
-                "temperature": 0.5
-            },
-            timeout=15
-        )
+        with LLM_SCHEDULER.slot(request_client_id(), "interactive"), stage("openai_search_summary"):
+            response = requests.post(
+                OPENAI_CHAT_URL,
+                headers={
+                    "Authorization": f"Bearer {OPENAI_API_KEY}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": "gpt-3.5-turbo",
+                    "messages": [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    "max_tokens": 1000,
+                    "temperature": 0.5
+                },
+                timeout=15
+            )
         
         if response.status_code != 200:
             logger.error(f"OpenAI API error: {response.status_code} - {response.text}")
@@ -574,6 +690,129 @@ def create_search_summary(query, search_results):
         logger.error(f"Error in create_search_summary: {str(e)}")
         return None
 
+def wants_progressive_response(data):
+    """Check whether the client asked for a progressive (streamed) response."""
+    if data.get('stream'):
+        return True
+    accept = request.headers.get('Accept', '')
+    return 'application/x-ndjson' in accept or 'text/event-stream' in accept
+
+def encode_progress_event(event, payload, sse=False):
+    """Encode one progress event as an NDJSON line or an SSE message."""
+    if sse:
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    return json.dumps({"event": event, **payload}) + "\n"
+
+def stream_openai_chat(system_prompt, user_prompt, model="gpt-3.5-turbo", max_tokens=1000, temperature=0.7, timeout=30):
+    """
+    Yield content deltas from a streamed OpenAI chat completion.
+    Closing the generator closes the upstream connection, cancelling the completion.
+    """
+    response = requests.post(
+        OPENAI_CHAT_URL,
+        headers={
+            "Authorization": f"Bearer {OPENAI_API_KEY}",
+            "Content-Type": "application/json"
+        },
+        json={
+            "model": model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stream": True
+        },
+        timeout=timeout,
+        stream=True
+    )
+    
+    try:
+        if response.status_code != 200:
+            raise RuntimeError(f"OpenAI API error: {response.status_code} - {response.text}")
+        
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            data = line[len('data:'):].strip()
+            if data == '[DONE]':
+                break
+            
+            choices = json.loads(data).get('choices') or []
+            if choices:
+                delta = choices[0].get('delta', {}).get('content')
+                if delta:
+                    yield delta
+    finally:
+        response.close()
+
+def progressive_research_response(query, mode):
+    """
+    Build a streamed research response.
+    
+    Emits a `sources` event with the formatted search results as soon as the
+    search finishes, then `token` events as the synthesis streams in, and a
+    final `done` event with timings. Uses SSE when the client accepts
+    text/event-stream and NDJSON otherwise.
+    """
+    sse = 'text/event-stream' in request.headers.get('Accept', '')
+    client_id = request_client_id()
+    priority_class = "standard" if mode == 'deep' else "interactive"
+    
+    def generate():
+        started = time.monotonic()
+        
+        if mode == 'deep':
+            search_results = search_with_searxng(query, result_count=10, time_range='', language='en')
+            system_prompt, user_prompt = build_synthesis_prompts(query, search_results)
+            llm_options = {"max_tokens": 4000, "temperature": 0.7, "timeout": 30}
+        else:
+            search_results = cached_search(query, 7, '', 'en')
+            system_prompt, user_prompt = build_summary_prompts(query, search_results)
+            llm_options = {"max_tokens": 1000, "temperature": 0.5, "timeout": 15}
+        
+        search_done = time.monotonic()
+        yield encode_progress_event('sources', {
+            "text": format_results_as_text(search_results),
+            "sources": search_results
+        }, sse)
+        
+        first_token_at = None
+        synthesized = False
+        if OPENAI_API_KEY:
+            try:
+                with LLM_SCHEDULER.slot(client_id, priority_class), stage("openai_stream"), \
+                        closing(stream_openai_chat(system_prompt, user_prompt, **llm_options)) as deltas:
+                    for delta in deltas:
+                        if first_token_at is None:
+                            first_token_at = time.monotonic()
+                        synthesized = True
+                        yield encode_progress_event('token', {"delta": delta}, sse)
+            except requests.exceptions.Timeout:
+                logger.error("OpenAI API streaming request timed out")
+                yield encode_progress_event('error', {"error": "Synthesis timed out"}, sse)
+            except Exception as e:
+                logger.error(f"Error streaming synthesis: {str(e)}")
+                yield encode_progress_event('error', {"error": "Synthesis failed"}, sse)
+        
+        finished = time.monotonic()
+        yield encode_progress_event('done', {
+            "synthesized": synthesized,
+            "timings": {
+                "search_ms": round((search_done - started) * 1000),
+                "first_token_ms": round((first_token_at - started) * 1000) if first_token_at else None,
+                "synthesis_ms": round((finished - search_done) * 1000),
+                "total_ms": round((finished - started) * 1000)
+            }
+        }, sse)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream' if sse else 'application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 def format_results_as_text(results):
     """Format the search results as a nicely formatted text block."""
     if not results:
@@ -592,6 +831,12 @@ def format_results_as_text(results):
     
     return text
 
+# Optionally load Whisper in the background so the first transcription is fast
+if os.getenv("WARM_IMPORTS", "false").lower() == "true":
+    warm_imports(["whisper"], then=get_whisper_model)
+
+report_startup("server")
+
 if __name__ == '__main__':
     # Run the Flask app
     logger.info(f"Starting server on 0.0.0.0:{PORT}")
@@ -1,15 +1,23 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
+import io
 import os
 import json
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from file_cache import compressed_variant, content_etag, is_compressible, negotiate_encoding
 import logging
 
 from startup_research import StartupResearchCrew
+from research_events import encode_sse
+from report_renderers import RENDERERS, mime_type_for, render_report
+from fair_scheduler import request_client_id
+from instrumentation import init_app as init_instrumentation, report_startup
+from logging_setup import configure_logging
 
 # Load environment variables
 load_dotenv()
@@ -19,10 +27,7 @@ app = Flask(__name__)
 CORS(app, resources={r"/api/startup-research/*": {"origins": "*"}})
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+configure_logging("startup_api", log_file=os.getenv("STARTUP_API_LOG_FILE"))
 logger = logging.getLogger("startup_api")
 
 # Initialize rate limiter with more lenient limits
@@ -30,17 +35,123 @@ limiter = Limiter(
     get_remote_address,
     app=app,
     default_limits=["200 per hour", "50 per minute"],
-    storage_uri="memory://"
+    storage_uri="memory://",
+    enabled=os.getenv("RATELIMIT_ENABLED", "true").lower() != "false"
 )
 
+# Per-stage latency metrics on /metrics and request traces
+init_instrumentation(app, "startup_api", limiter=limiter)
+
 # Initialize the research crew
 research_crew = StartupResearchCrew(
     model_name=os.getenv("LLM_MODEL", "gpt-3.5-turbo"),
     temperature=float(os.getenv("LLM_TEMPERATURE", "0.5"))
 )
 
-# Track ongoing researches
+# Optionally import crewai/langchain in the background so the first evaluation is fast
+if os.getenv("WARM_IMPORTS", "false").lower() == "true":
+    research_crew.warm_up()
+
+# Runs left queued or running by a previous process will never finish
+research_crew.recover_interrupted()
+
+# Evaluations run on a bounded worker pool so request threads only enqueue them
+EVAL_WORKERS = int(os.getenv("EVAL_WORKERS", "2"))
+EVAL_QUEUE_LIMIT = int(os.getenv("EVAL_QUEUE_LIMIT", "20"))
+evaluation_pool = ThreadPoolExecutor(max_workers=EVAL_WORKERS, thread_name_prefix="evaluation")
+
+# How long a download that opted into async rendering (?async=1 or
+# Prefer: respond-async) waits for an on-demand render before answering 202;
+# other downloads wait for the render to finish
+RENDER_WAIT_SECONDS = float(os.getenv("RENDER_WAIT_SECONDS", "2"))
+
+# Track ongoing researches (queued or running) by research_id
 ongoing_researches = {}
+ongoing_lock = threading.Lock()
+# Notified whenever a run leaves ongoing_researches
+ongoing_changed = threading.Condition(ongoing_lock)
+
+def run_evaluation(research_id, startup_idea, client_id, resume=False, reuse=None, seed_from=None):
+    """Worker body: run one evaluation and drop it from the ongoing set"""
+    try:
+        research_crew.evaluate_startup(
+            startup_idea,
+            client_id=client_id,
+            research_id=research_id,
+            resume=resume,
+            reuse=reuse,
+            seed_from=seed_from
+        )
+    except Exception as e:
+        logger.error(f"Evaluation {research_id} crashed: {str(e)}", exc_info=True)
+    finally:
+        with ongoing_changed:
+            ongoing_researches.pop(research_id, None)
+            ongoing_changed.notify_all()
+
+# Batches feed the same worker pool. All batches together have at most
+# BATCH_CONCURRENCY runs queued or running, one less than EVAL_WORKERS by
+# default, so a single evaluation always finds a free worker; batch runs also
+# count against EVAL_QUEUE_LIMIT and wait for room instead of exceeding it
+BATCH_MAX_IDEAS = int(os.getenv("BATCH_MAX_IDEAS", "50"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", str(max(1, EVAL_WORKERS - 1))))
+MAX_ACTIVE_BATCHES = int(os.getenv("MAX_ACTIVE_BATCHES", "4"))
+batch_slots = threading.BoundedSemaphore(BATCH_CONCURRENCY)
+batch_admission = threading.BoundedSemaphore(MAX_ACTIVE_BATCHES)
+active_batches = {}
+
+def run_batch(batch, client_id, reuse):
+    """
+    Batch driver thread: submit leaders first, start each run that shares
+    research once its leader has finished, then build the comparison
+    """
+    batch_id = batch["batch_id"]
+    finished = {item["research_id"]: threading.Event() for item in batch["items"]}
+    
+    def submit(item):
+        batch_slots.acquire()
+        research_id = item["research_id"]
+        
+        def on_done(_):
+            batch_slots.release()
+            finished[research_id].set()
+        
+        try:
+            with ongoing_changed:
+                ongoing_changed.wait_for(lambda: len(ongoing_researches) < EVAL_QUEUE_LIMIT)
+                future = evaluation_pool.submit(
+                    run_evaluation, research_id, item["startup_idea"], client_id,
+                    False, reuse, item["seed_from"]
+                )
+                ongoing_researches[research_id] = future
+        except Exception:
+            batch_slots.release()
+            raise
+        future.add_done_callback(on_done)
+    
+    try:
+        leaders = [item for item in batch["items"] if not item["seed_from"]]
+        followers = [item for item in batch["items"] if item["seed_from"]]
+        for item in leaders:
+            submit(item)
+        for item in followers:
+            finished[item["seed_from"]["research_id"]].wait()
+            submit(item)
+        for event in finished.values():
+            event.wait()
+        research_crew.build_batch_comparison(batch_id)
+        logger.info(f"Batch {batch_id} finished")
+    except Exception as e:
+        logger.error(f"Batch {batch_id} failed: {str(e)}", exc_info=True)
+    finally:
+        with ongoing_lock:
+            active_batches.pop(batch_id, None)
+        batch_admission.release()
+
+def queue_full_response():
+    response = jsonify({"error": "Too many evaluations in progress, try again later"})
+    response.headers['Retry-After'] = '60'
+    return response, 503
 
 @app.route('/api/startup-research/evaluate', methods=['POST'])
 @limiter.limit("10 per minute")  # More lenient limit for research requests
@@ -59,24 +170,175 @@ def evaluate_startup():
             
         logger.info(f"Processing research request for: {startup_idea}")
         
-        # Start the research process
-        result = research_crew.evaluate_startup(startup_idea)
+        # Queue the research; the worker pool runs it in the background.
+        # "reuse": false opts out of seeding from a similar earlier run.
+        client_id = request_client_id()
+        reuse = data.get('reuse')
+        with ongoing_lock:
+            if len(ongoing_researches) >= EVAL_QUEUE_LIMIT:
+                return queue_full_response()
+            research_id = research_crew.create_research(startup_idea)
+            ongoing_researches[research_id] = evaluation_pool.submit(
+                run_evaluation, research_id, startup_idea, client_id, False, reuse
+            )
         
-        # Ensure we have a research_id
-        if not result.get('research_id'):
-            return jsonify({"error": "Failed to generate research ID"}), 500
-            
         # Return initial response with research_id
         return jsonify({
-            "research_id": result['research_id'],
+            "research_id": research_id,
             "status": "in_progress",
+            "state": "queued",
+            "stage": "queued",
             "progress": 0
-        })
+        }), 202
         
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/startup-research/batch', methods=['POST'])
+@limiter.limit("5 per minute")
+def evaluate_batch():
+    """
+    Queue many ideas at once. Body: {"ideas": ["idea", {"idea": "...", "sector": "..."}, ...],
+    "reuse": bool}. Returns the batch id and the research id of every idea.
+    """
+    try:
+        data = request.get_json() or {}
+        raw_items = data.get('ideas')
+        if not isinstance(raw_items, list) or not raw_items:
+            return jsonify({"error": "ideas must be a non-empty list"}), 400
+        if len(raw_items) > BATCH_MAX_IDEAS:
+            return jsonify({"error": f"At most {BATCH_MAX_IDEAS} ideas per batch"}), 400
+        
+        items = []
+        for raw in raw_items:
+            if isinstance(raw, dict):
+                idea = raw.get('startup_idea') or raw.get('idea')
+                sector = raw.get('sector')
+            else:
+                idea, sector = raw, None
+            if not isinstance(idea, str) or not idea.strip():
+                return jsonify({"error": "Every idea must be a non-empty string"}), 400
+            if sector is not None and not isinstance(sector, str):
+                return jsonify({"error": "sector must be a string"}), 400
+            items.append({"startup_idea": idea.strip(), "sector": sector})
+        
+        client_id = request_client_id()
+        with ongoing_lock:
+            if len(ongoing_researches) >= EVAL_QUEUE_LIMIT:
+                return queue_full_response()
+        # One admission slot is held from here until the batch thread exits
+        if not batch_admission.acquire(blocking=False):
+            return queue_full_response()
+        try:
+            batch = research_crew.plan_batch(items)
+        except Exception:
+            batch_admission.release()
+            raise
+        thread = threading.Thread(
+            target=run_batch,
+            args=(batch, client_id, data.get('reuse')),
+            name=f"batch-{batch['batch_id']}",
+            daemon=True
+        )
+        with ongoing_lock:
+            active_batches[batch["batch_id"]] = thread
+        thread.start()
+        
+        logger.info(f"Queued batch {batch['batch_id']} with {len(items)} ideas")
+        return jsonify({
+            "batch_id": batch["batch_id"],
+            "status": "in_progress",
+            "research_ids": [item["research_id"] for item in batch["items"]],
+            "shared_research": sum(1 for item in batch["items"] if item["seed_from"])
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"Error queueing batch: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/startup-research/batch/<batch_id>', methods=['GET'])
+@limiter.limit("100 per minute")
+def get_batch_status(batch_id):
+    """Aggregate progress of a batch and the state of each run"""
+    try:
+        status = research_crew.batch_status(batch_id)
+        if status is None:
+            return jsonify({"error": "Batch not found"}), 404
+        return jsonify(status)
+    except Exception as e:
+        logger.error(f"Error getting batch status: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/startup-research/batch/<batch_id>/comparison', methods=['GET'])
+@limiter.limit("30 per minute")
+def get_batch_comparison(batch_id):
+    """Markdown comparison of every run in a finished batch"""
+    batch = research_crew.manifest.get_batch(batch_id)
+    if batch is None:
+        return jsonify({"error": "Batch not found"}), 404
+    comparison = batch["comparison"]
+    if comparison is None and batch_id not in active_batches:
+        # The driver did not get to it, e.g. the process restarted mid-batch
+        if research_crew.batch_status(batch_id)["done"]:
+            comparison = research_crew.build_batch_comparison(batch_id)
+    if comparison is None:
+        response = jsonify({"status": "in_progress", "error": "Batch has not finished yet"})
+        response.headers['Retry-After'] = '60'
+        return response, 202
+    return Response(comparison, mimetype='text/markdown')
+
+@app.route('/api/startup-research/similar', methods=['GET'])
+@limiter.limit("30 per minute")
+def find_similar_researches():
+    """Past researches closest to an idea, with whether they would be reused"""
+    try:
+        startup_idea = request.args.get('idea', '').strip()
+        if not startup_idea:
+            return jsonify({"error": "Missing idea parameter"}), 400
+        limit = min(max(int(request.args.get('limit', 5)), 1), 20)
+        return jsonify(research_crew.find_similar(startup_idea, limit=limit))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    except Exception as e:
+        logger.error(f"Error finding similar researches: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/startup-research/resume/<research_id>', methods=['POST'])
+@limiter.limit("10 per minute")
+def resume_research(research_id):
+    """Re-run a failed research, reusing the outputs of its completed tasks"""
+    try:
+        result = research_crew.get_research_by_id(research_id)
+        if result.get("status") == "not_found":
+            return jsonify({"error": "Research not found"}), 404
+        
+        client_id = request_client_id()
+        with ongoing_lock:
+            if research_id in ongoing_researches:
+                return jsonify({"error": "Research is already in progress"}), 409
+            if len(ongoing_researches) >= EVAL_QUEUE_LIMIT:
+                return queue_full_response()
+            startup_idea = research_crew.prepare_resume(research_id)
+            if startup_idea is None:
+                return jsonify({"error": f"Only failed researches can be resumed (state: {result.get('state', 'completed')})"}), 409
+            ongoing_researches[research_id] = evaluation_pool.submit(
+                run_evaluation, research_id, startup_idea, client_id, True
+            )
+        
+        logger.info(f"Resuming research {research_id}")
+        return jsonify({
+            "research_id": research_id,
+            "status": "in_progress",
+            "state": "queued",
+            "stage": "queued",
+            "progress": result.get("progress", 0)
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"Error resuming research: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/startup-research/status/<research_id>', methods=['GET'])
 @limiter.limit("100 per minute")  # More lenient limit for status checks
 def get_research_status(research_id):
@@ -92,11 +354,86 @@ def get_research_status(research_id):
         logger.error(f"Error getting research status: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/startup-research/events/<research_id>', methods=['GET'])
+@limiter.limit("30 per minute")
+def stream_research_events(research_id):
+    """
+    Server-Sent Events stream of a research's progress: queued, started,
+    task_started / task_finished (with elapsed time and output file) and
+    completed or failed. Reconnecting clients resume from Last-Event-ID.
+    """
+    result = research_crew.get_research_by_id(research_id)
+    if result.get("status") == "not_found":
+        return jsonify({"error": "Research not found"}), 404
+    
+    try:
+        after = int(request.headers.get('Last-Event-ID', 0))
+    except ValueError:
+        after = 0
+    events = research_crew.events
+    
+    def generate():
+        if not events.has_channel(research_id):
+            # Finished before this process started, or running in another
+            # worker: send the persisted status and let the client retry later
+            yield "retry: 5000\n"
+            yield encode_sse("status", result)
+            return
+        for item in events.subscribe(research_id, after=after):
+            if item is None:
+                yield ": keep-alive\n\n"
+                continue
+            event_id, event, payload = item
+            yield encode_sse(event, payload, event_id)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/startup-research/usage', methods=['GET'])
+@limiter.limit("30 per minute")
+def get_usage_summary():
+    """Tokens, cost and wall time per task across runs, with percentiles"""
+    try:
+        days = request.args.get('days')
+        return jsonify(research_crew.usage_summary(days=float(days) if days else None))
+    except ValueError:
+        return jsonify({"error": "days must be a number"}), 400
+    except Exception as e:
+        logger.error(f"Error summarizing usage: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/startup-research/usage/<research_id>', methods=['GET'])
+@limiter.limit("100 per minute")
+def get_research_usage(research_id):
+    """Per-task ledger of one research, one entry per attempt"""
+    usage = research_crew.get_usage(research_id)
+    if usage is None:
+        return jsonify({"error": "No usage recorded for this research"}), 404
+    return jsonify(usage)
+
 @app.route('/api/startup-research/list', methods=['GET'])
 @limiter.limit("30 per minute")  # More lenient limit for listing researches
 def list_researches():
+    """
+    Page through researches, newest first.
+    Query parameters: limit (max 200), offset, state (comma-separated), q (idea text)
+    """
     try:
-        researches = research_crew.list_researches()
+        try:
+            limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+            offset = max(int(request.args.get('offset', 0)), 0)
+        except ValueError:
+            return jsonify({"error": "limit and offset must be integers"}), 400
+        states = [s.strip() for s in request.args.get('state', '').split(',') if s.strip()]
+        researches = research_crew.list_researches(
+            limit=limit,
+            offset=offset,
+            states=states or None,
+            query=request.args.get('q') or None
+        )
         return jsonify(researches)
     except Exception as e:
         logger.error(f"Error listing researches: {str(e)}", exc_info=True)
@@ -111,10 +448,7 @@ def get_research_file(research_id, file_name):
         return jsonify({"error": "Research not found"}), 404
     
     files = result.get("files", {})
-    
-    # Check if the requested file exists
-    if file_name not in files and file_name not in [os.path.basename(f) for f in files.values()]:
-        return jsonify({"error": f"File {file_name} not found in research"}), 404
+    stem, extension = os.path.splitext(file_name)
     
     # Get the file path
     file_path = None
@@ -123,8 +457,41 @@ def get_research_file(research_id, file_name):
             file_path = v
             break
     
-    if not file_path:
-        return jsonify({"error": "File not found"}), 404
+    # Any markdown output can also be downloaded in the renderable formats
+    source_name = f"{stem}.md"
+    derivable = extension in RENDERERS and source_name in files
+    
+    if not file_path and not derivable:
+        return jsonify({"error": f"File {file_name} not found in research"}), 404
+    
+    # Files of compacted runs are read straight out of their archive
+    archived = None
+    if result.get("archived") and file_path and not os.path.exists(file_path):
+        archived = research_crew.open_archived_file(research_id, file_name)
+    
+    if archived is None and (not file_path or not os.path.exists(file_path)):
+        if not derivable:
+            return jsonify({"error": "File not found"}), 404
+        title = f"Startup Evaluation: {result.get('startup_idea') or research_id}"
+        source = files[source_name]
+        if result.get("archived") and not os.path.exists(source):
+            source = research_crew.open_archived_file(research_id, source_name)
+            if source is None:
+                return jsonify({"error": "File not found"}), 404
+        respond_async = request.args.get('async') == '1' or \
+            'respond-async' in request.headers.get('Prefer', '')
+        try:
+            file_path = render_report(
+                source, extension, title, wait=RENDER_WAIT_SECONDS if respond_async else None
+            )
+        except Exception as e:
+            logger.error(f"Error rendering {file_name}: {str(e)}", exc_info=True)
+            return jsonify({"error": str(e)}), 500
+        if file_path is None:
+            response = jsonify({"status": "rendering", "file": file_name})
+            response.headers['Retry-After'] = '2'
+            response.headers['Preference-Applied'] = 'respond-async'
+            return response, 202
     
     # Determine the MIME type based on file extension
     mime_types = {
@@ -136,16 +503,59 @@ def get_research_file(research_id, file_name):
         ".txt": "text/plain"
     }
     
-    extension = os.path.splitext(file_path)[1]
-    mime_type = mime_types.get(extension, "application/octet-stream")
+    mime_type = mime_types.get(extension) or mime_type_for(extension) or "application/octet-stream"
     
-    # Send the file
-    return send_file(
-        file_path, 
-        mimetype=mime_type,
-        as_attachment=True,
-        download_name=os.path.basename(file_path)
-    )
+    if archived is not None:
+        response = send_file(
+            io.BytesIO(archived.read_bytes()),
+            mimetype=mime_type,
+            as_attachment=True,
+            download_name=file_name,
+            conditional=True,
+            etag=archived.etag,
+            last_modified=archived.modified
+        )
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    # Content-hash validator; send_file answers If-None-Match / If-Modified-Since
+    # with 304 and Range requests with 206 when conditional=True
+    etag = content_etag(file_path)
+    last_modified = os.path.getmtime(file_path)
+    
+    # Serve a precompressed variant unless the client asked for a byte range,
+    # since ranges refer to the uncompressed representation
+    encoding = None
+    if 'Range' not in request.headers and is_compressible(file_path, mime_type):
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+    
+    if encoding:
+        response = send_file(
+            compressed_variant(file_path, encoding),
+            mimetype=mime_type,
+            as_attachment=True,
+            download_name=file_name,
+            conditional=True,
+            etag=f"{etag}-{encoding}",
+            last_modified=last_modified
+        )
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_file(
+            file_path,
+            mimetype=mime_type,
+            as_attachment=True,
+            download_name=file_name,
+            conditional=True,
+            etag=etag,
+            last_modified=last_modified
+        )
+    
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+report_startup("startup_api")
 
 if __name__ == "__main__":
     # Set default port
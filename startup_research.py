@@ -1,25 +1,179 @@
+from __future__ import annotations
+
 import os
 import json
-from typing import List, Dict, Any, Optional
+import random
+import re
+import shutil
+import tempfile
+import uuid
+from typing import TYPE_CHECKING, Callable, List, Dict, Any, Optional
 import datetime
 import logging
+import threading
+import time
 from pathlib import Path
-import markdown2
-from docx import Document
 
-from crewai import Agent, Task, Crew, Process
-from langchain_openai import ChatOpenAI
-from crewai.tasks.task_output import TaskOutput
-from pydantic import Field
+from fair_scheduler import FairScheduler, llm_client
+from instrumentation import REGISTRY, lazy_import, record_stage, stage, warm_imports
+from llm_fixtures import LLMFixtures
+from logging_setup import configure_logging
+from research_events import ResearchEvents
+from research_manifest import ResearchManifest
+from report_renderers import RENDERERS
+from research_archive import archive_path_for, list_members, open_member, write_archive
+from task_dag import critical_path_length, run_dag, task_dependencies
+from usage_ledger import RunLedger, record_llm_call, record_llm_retry, summarize_usage, track_run, track_task
+
+if TYPE_CHECKING:
+    from crewai import Agent, Task, Process
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()]
-)
 logger = logging.getLogger("startup_research")
 
+# crewai, langchain and the report renderers take seconds to import, so they
+# are loaded on first use (or by warm_up) rather than when this module loads
+HEAVY_MODULES = ["crewai", "langchain_openai", "research_index"]
+
+# Agent and crew console output is written synchronously, so keep it off by default
+CREW_VERBOSE = os.getenv("CREW_VERBOSE", "false").lower() == "true"
+
+# Model tier of each agent. Planning, summarizing, fact checking and critique
+# run on a fast, cheap model; analysis and report writing on the strongest.
+# Override per role with AGENT_TIERS, e.g. "critic=strong,researcher=fast".
+AGENT_TIERS = {
+    "planner": "fast",
+    "researcher": "standard",
+    "fact_checker": "fast",
+    "summarizer": "fast",
+    "analyst": "strong",
+    "strategist": "standard",
+    "writer": "strong",
+    "critic": "fast",
+}
+for _override in filter(None, os.getenv("AGENT_TIERS", "").split(",")):
+    _role, _, _tier = _override.partition("=")
+    AGENT_TIERS[_role.strip()] = _tier.strip()
+
+# Tasks whose dependencies are done run concurrently, up to this many at once.
+# Setting it to 1 (or passing a crewai Process) runs a regular crewai Crew instead.
+CREW_MAX_PARALLEL = int(os.getenv("CREW_MAX_PARALLEL", "3"))
+
+# Task pipelines: overrides of the context each task receives, by output file
+# stem. "standard" keeps the dependencies declared in create_tasks, which form
+# a chain; "branched" builds the go-to-market strategy from the market research
+# and summary so it runs alongside the business analysis.
+PIPELINES = {
+    "standard": {},
+    "branched": {
+        "gtm_strategy": ["market_research", "research_summary"],
+    },
+}
+
+# Near-duplicate ideas reuse the planning and market research of a recent
+# earlier run instead of paying for those tasks again
+REUSE_PRIOR_RESEARCH = os.getenv("REUSE_PRIOR_RESEARCH", "true").lower() == "true"
+REUSE_SIMILARITY_THRESHOLD = float(os.getenv("REUSE_SIMILARITY_THRESHOLD", "0.6"))
+REUSE_MAX_AGE_DAYS = float(os.getenv("REUSE_MAX_AGE_DAYS", "30"))
+REUSABLE_TASK_FILES = ["research_plan.md", "market_research.md"]
+# Shorter outputs are not worth reusing, e.g. crewai's placeholder final
+# answer left behind when an agent stops before writing its research
+REUSE_MIN_CHARS = int(os.getenv("REUSE_MIN_CHARS", "200"))
+CREWAI_PLACEHOLDER_ANSWER = "I now can give a great answer"
+
+# Batch ideas in the same sector share this task's output with the first run of the sector
+SECTOR_RESEARCH_FILE = "market_research.md"
+
+# Trailing _YYYYMMDD_HHMMSS (and collision suffix) of a research ID
+RESEARCH_ID_TIMESTAMP = re.compile(r"_\d{8}_\d{6}(_\d+)?$")
+
+# Per-task tokens, cost and latency of each run attempt
+USAGE_FILE = "usage.json"
+
+# Report offered for download in every renderable format
+FINAL_REPORT_FILE = "final_startup_evaluation.md"
+
+# Per-research lifecycle state, kept next to the task outputs
+STATUS_FILE = "status.json"
+
+# Finished runs older than this are packed into monthly archives by compact_runs.
+# Keep it above REUSE_MAX_AGE_DAYS so reusable research stays on disk.
+COMPACT_AFTER_DAYS = float(os.getenv("COMPACT_AFTER_DAYS", "90"))
+
+# Fair queue shared by every LLM call the crews in this process make. Crew
+# runs are batch work, so one client's evaluations share a single flow.
+LLM_SCHEDULER = FairScheduler(
+    "startup_research",
+    capacity=int(os.getenv("LLM_CONCURRENCY", "4")),
+    interactive_reserved=int(os.getenv("LLM_INTERACTIVE_RESERVED", "0"))
+)
+REGISTRY.register_collector(LLM_SCHEDULER.collect_metrics)
+
+# Transient OpenAI errors are retried here rather than inside the client, so
+# retries are counted and the scheduler slot is released while backing off
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+TRANSIENT_LLM_ERRORS = ("RateLimitError", "APIConnectionError", "APITimeoutError", "InternalServerError")
+
+# Record every LLM call to a fixture file, or answer calls from one, for
+# offline benchmarks (see llm_fixtures). None unless LLM_FIXTURE_MODE is set.
+LLM_FIXTURES = LLMFixtures.from_env()
+
+_scheduled_chat_model = None
+
+def _token_usage(result):
+    """(prompt_tokens, completion_tokens) reported for a langchain ChatResult"""
+    usage = (result.llm_output or {}).get("token_usage") or {}
+    if usage:
+        return usage.get("prompt_tokens", 0) or 0, usage.get("completion_tokens", 0) or 0
+    prompt_tokens = completion_tokens = 0
+    for generation in result.generations:
+        metadata = getattr(generation.message, "usage_metadata", None) or {}
+        prompt_tokens += metadata.get("input_tokens", 0)
+        completion_tokens += metadata.get("output_tokens", 0)
+    return prompt_tokens, completion_tokens
+
+def scheduled_chat_model(**kwargs):
+    """
+    Create a ChatOpenAI client whose calls wait for an LLM_SCHEDULER slot and
+    report their tokens, latency and retries to the usage ledger
+    """
+    global _scheduled_chat_model
+    if _scheduled_chat_model is None:
+        ChatOpenAI = lazy_import("langchain_openai").ChatOpenAI
+        
+        class ScheduledChatOpenAI(ChatOpenAI):
+            """ChatOpenAI that takes a fair-scheduler slot for each completion"""
+            
+            def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+                for attempt in range(LLM_MAX_RETRIES + 1):
+                    try:
+                        with LLM_SCHEDULER.slot():
+                            started = time.perf_counter()
+                            if LLM_FIXTURES and LLM_FIXTURES.mode == "replay":
+                                result = LLM_FIXTURES.replay(self.model_name, messages, stop)
+                            else:
+                                result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+                            elapsed = time.perf_counter() - started
+                    except Exception as e:
+                        if attempt == LLM_MAX_RETRIES or type(e).__name__ not in TRANSIENT_LLM_ERRORS:
+                            raise
+                        record_llm_retry()
+                        logger.warning(f"Retrying LLM call after {type(e).__name__} (attempt {attempt + 1})")
+                        time.sleep(min(2 ** attempt, 30) + random.random())
+                        continue
+                    
+                    if LLM_FIXTURES and LLM_FIXTURES.mode == "record":
+                        LLM_FIXTURES.record(self.model_name, messages, stop, result, elapsed)
+                    model = (result.llm_output or {}).get("model_name") or self.model_name
+                    record_llm_call(model, *_token_usage(result), elapsed)
+                    return result
+        
+        _scheduled_chat_model = ScheduledChatOpenAI
+    kwargs.setdefault("max_retries", 0)
+    if LLM_FIXTURES and LLM_FIXTURES.mode == "replay":
+        # Replayed runs never reach the API
+        kwargs.setdefault("api_key", os.getenv("OPENAI_API_KEY") or "replay")
+    return _scheduled_chat_model(**kwargs)
+
 # Ensure environment variables are loaded
 if not os.getenv("OPENAI_API_KEY"):
     logger.warning("OPENAI_API_KEY not found in environment variables")
@@ -33,7 +187,9 @@ class StartupResearchCrew:
         self,
         model_name: str = "gpt-3.5-turbo",
         temperature: float = 0.5,
-        process: Process = Process.sequential
+        process: Optional[Process] = None,
+        max_parallel: Optional[int] = None,
+        pipeline: Optional[str] = None
     ):
         """
         Initialize the research crew.
@@ -41,26 +197,110 @@ class StartupResearchCrew:
         Args:
             model_name: The name of the LLM model to use
             temperature: The temperature setting for the LLM
-            process: The process type for the crew
+            process: A crewai process to run the tasks with instead of the
+                dependency graph executor
+            max_parallel: Maximum number of tasks running at once
+            pipeline: Name of the task pipeline in PIPELINES
         """
         self.model_name = model_name
         self.temperature = temperature
         self.process = process
+        self.max_parallel = max_parallel or CREW_MAX_PARALLEL
+        self.pipeline = pipeline or os.getenv("CREW_PIPELINE", "standard")
         
-        # Initialize the LLM
-        self.llm = ChatOpenAI(
-            model_name=model_name,
-            temperature=temperature
-        )
+        # Model and temperature per tier. "standard" is the crew's configured
+        # model; the others default to it too unless configured.
+        self.model_tiers = {
+            "fast": (
+                os.getenv("LLM_MODEL_FAST", "gpt-4o-mini"),
+                float(os.getenv("LLM_TEMPERATURE_FAST", "0.3"))
+            ),
+            "standard": (model_name, temperature),
+            "strong": (
+                os.getenv("LLM_MODEL_STRONG", model_name),
+                float(os.getenv("LLM_TEMPERATURE_STRONG", str(temperature)))
+            ),
+        }
+        
+        # LLM clients are created on first use and shared by every agent on
+        # the same model; agent sets are reused across runs, one per concurrent run
+        self._llms = {}
+        self._llm_lock = threading.Lock()
+        self._idle_agents = []
+        self._agents_lock = threading.Lock()
+        
+        # Serializes read-modify-write of status files
+        self._status_lock = threading.Lock()
+        
+        # Lifecycle and per-task events, streamed to clients by the API
+        self.events = ResearchEvents(retention=int(os.getenv("RESEARCH_EVENTS_RETENTION", "600")))
+        
+        # Similarity index over past runs, built on first use
+        self._index = None
+        self._index_lock = threading.Lock()
+        
+        # One compaction at a time rewrites the monthly archives
+        self._compact_lock = threading.Lock()
         
         # Create output directory
         self.output_dir = Path("research_outputs")
         self.output_dir.mkdir(exist_ok=True)
         
-        logger.info(f"StartupResearchCrew initialized with {model_name} at temp {temperature}")
+        # Indexed list of runs; picks up directories written before it existed
+        self.manifest = ResearchManifest(
+            os.getenv("RESEARCH_MANIFEST_DB", str(self.output_dir / "manifest.sqlite3"))
+        )
+        self.sync_manifest()
+        
+        logger.info(
+            f"StartupResearchCrew initialized with {model_name} at temp {temperature} "
+            f"(tiers: {', '.join(f'{tier}={model}' for tier, (model, _) in self.model_tiers.items())})"
+        )
 
+    def llm_for_tier(self, tier: str):
+        """The shared LLM client for a model tier, created on first use"""
+        model_name, temperature = self.model_tiers.get(tier, self.model_tiers["standard"])
+        key = (model_name, temperature)
+        if key not in self._llms:
+            with self._llm_lock:
+                if key not in self._llms:
+                    self._llms[key] = scheduled_chat_model(
+                        model_name=model_name,
+                        temperature=temperature
+                    )
+        return self._llms[key]
+    
+    def llm_for_role(self, role: str):
+        """The LLM client for an agent role, per AGENT_TIERS"""
+        return self.llm_for_tier(AGENT_TIERS.get(role, "standard"))
+    
+    @property
+    def llm(self):
+        """The LLM client for the crew's configured model"""
+        return self.llm_for_tier("standard")
+    
+    def _acquire_agents(self) -> Dict[str, Agent]:
+        """
+        Take an idle agent set, or build one. Agents keep per-task executor
+        state, so a set is used by one run at a time.
+        """
+        with self._agents_lock:
+            if self._idle_agents:
+                return self._idle_agents.pop()
+        return self.create_agents()
+    
+    def _release_agents(self, agents: Dict[str, Agent]) -> None:
+        """Return an agent set for the next run"""
+        with self._agents_lock:
+            self._idle_agents.append(agents)
+    
+    def warm_up(self) -> None:
+        """Import the heavy dependencies and build a set of agents in the background"""
+        warm_imports(HEAVY_MODULES, then=lambda: self._release_agents(self._acquire_agents()))
+    
     def create_agents(self) -> Dict[str, Agent]:
-        """Create and return all the agents for the research crew"""
+        """Create and return all the agents for the research crew, each on its role's model tier"""
+        Agent = lazy_import("crewai").Agent
         
         # Planner agent - coordinates the research plan
         planner = Agent(
@@ -69,9 +309,9 @@ class StartupResearchCrew:
             backstory="""You are an experienced startup strategist who has helped 
             numerous founders evaluate their ideas. You excel at breaking down complex 
             research questions into clear, actionable tasks.""",
-            verbose=True,
+            verbose=CREW_VERBOSE,
             allow_delegation=True,
-            llm=self.llm
+            llm=self.llm_for_role("planner")
         )
         
         # Researcher agent - gathers market data and trends
@@ -81,8 +321,8 @@ class StartupResearchCrew:
             backstory="""You are a diligent market researcher with expertise in analyzing 
             emerging industries. You have a knack for finding relevant data and identifying 
             key market trends that others might miss.""",
-            verbose=True,
-            llm=self.llm
+            verbose=CREW_VERBOSE,
+            llm=self.llm_for_role("researcher")
         )
         
         # Fact checker agent - validates research findings
@@ -92,8 +332,8 @@ class StartupResearchCrew:
             backstory="""You are a meticulous fact-checker with a background in journalism 
             and academic research. You have a critical eye for distinguishing between 
             reliable information and speculation.""",
-            verbose=True,
-            llm=self.llm
+            verbose=CREW_VERBOSE,
+            llm=self.llm_for_role("fact_checker")
         )
         
         # Summarizer agent - condenses findings into clear points
@@ -103,8 +343,8 @@ class StartupResearchCrew:
             backstory="""You excel at distilling complex information into easily 
             digestible summaries. You can identify the most important points in any research 
             and present them in a clear, structured way.""",
-            verbose=True,
-            llm=self.llm
+            verbose=CREW_VERBOSE,
+            llm=self.llm_for_role("summarizer")
         )
         
         # Analyst agent - performs SWOT and critical evaluation
@@ -114,8 +354,8 @@ class StartupResearchCrew:
             backstory="""You have analyzed hundreds of startups across various industries. 
             You specialize in SWOT analysis, identifying competitive advantages, and 
             assessing business model viability.""",
-            verbose=True,
-            llm=self.llm
+            verbose=CREW_VERBOSE,
+            llm=self.llm_for_role("analyst")
         )
         
         # Strategy agent - recommends go-to-market approach
@@ -125,8 +365,8 @@ class StartupResearchCrew:
             backstory="""You're a seasoned go-to-market expert who has helped numerous 
             startups successfully launch their products. You know how to identify the 
             right channels, positioning, and business models for new ventures.""",
-            verbose=True,
-            llm=self.llm
+            verbose=CREW_VERBOSE,
+            llm=self.llm_for_role("strategist")
         )
         
         # Writer agent - creates the final report
@@ -136,8 +376,8 @@ class StartupResearchCrew:
             backstory="""You are an expert business writer who specializes in creating 
             engaging, insightful reports. You know how to structure information for 
             maximum clarity and impact, with executive-friendly language.""",
-            verbose=True,
-            llm=self.llm
+            verbose=CREW_VERBOSE,
+            llm=self.llm_for_role("writer")
         )
         
         # Critic agent - reviews and improves the report
@@ -147,8 +387,8 @@ class StartupResearchCrew:
             backstory="""You have edited hundreds of business reports and presentations.
             You have a keen eye for logical inconsistencies, clarity issues, and areas
             where additional evidence or explanation would strengthen the argument.""",
-            verbose=True,
-            llm=self.llm
+            verbose=CREW_VERBOSE,
+            llm=self.llm_for_role("critic")
         )
         
         return {
@@ -163,7 +403,8 @@ class StartupResearchCrew:
         }
         
     def create_tasks(self, agents: Dict[str, Agent], startup_idea: str) -> List[Task]:
-        """Create the sequence of research tasks"""
+        """Create the research tasks, wired together through their context"""
+        Task = lazy_import("crewai").Task
         
         planning_task = Task(
             description=f"""
@@ -344,7 +585,7 @@ class StartupResearchCrew:
             output_file="final_startup_evaluation.md"
         )
         
-        return [
+        tasks = [
             planning_task,
             research_task,
             fact_checking_task,
@@ -355,90 +596,560 @@ class StartupResearchCrew:
             report_critique_task,
             final_report_task
         ]
+        self._apply_pipeline(tasks)
+        return tasks
+    
+    def _apply_pipeline(self, tasks: List[Task]) -> None:
+        """Rewire task contexts according to the selected pipeline definition"""
+        if self.pipeline not in PIPELINES:
+            raise ValueError(f"Unknown pipeline {self.pipeline!r}, expected one of {sorted(PIPELINES)}")
+        by_name = {Path(task.output_file).stem: task for task in tasks}
+        for name, dependencies in PIPELINES[self.pipeline].items():
+            by_name[name].context = [by_name[dep] for dep in dependencies]
+    
+    def new_research_id(self, startup_idea: str) -> str:
+        """Generate a unique ID for a research"""
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        idea_slug = startup_idea.lower().replace(" ", "_")[:30]
+        research_id = f"{idea_slug}_{timestamp}"
+        
+        # Two submissions of the same idea within a second get distinct IDs
+        suffix = 1
+        while (self.output_dir / research_id).exists():
+            suffix += 1
+            research_id = f"{idea_slug}_{timestamp}_{suffix}"
+        return research_id
+    
+    def _read_status(self, research_id: str) -> Optional[Dict[str, Any]]:
+        """Return the persisted status of a research, or None for legacy runs"""
+        try:
+            with open(self.output_dir / research_id / STATUS_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def _write_status(self, research_id: str, **fields) -> Dict[str, Any]:
+        """Merge fields into a research's status file, replacing it atomically"""
+        research_dir = self.output_dir / research_id
+        with self._status_lock:
+            status = self._read_status(research_id) or {"research_id": research_id}
+            status.update(fields)
+            status["updated_at"] = datetime.datetime.now().isoformat()
+            
+            fd, tmp_path = tempfile.mkstemp(dir=research_dir, suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(status, f, indent=2)
+            os.replace(tmp_path, research_dir / STATUS_FILE)
+            self.manifest.upsert_status(research_id, status)
+        return status
+    
+    def create_research(self, startup_idea: str) -> str:
+        """Reserve a research ID and record it as queued"""
+        with self._status_lock:
+            research_id = self.new_research_id(startup_idea)
+            os.makedirs(self.output_dir / research_id)
+        self._write_status(
+            research_id,
+            startup_idea=startup_idea,
+            state="queued",
+            stage="queued",
+            tasks_completed=0,
+            tasks_total=None,
+            worker_pid=os.getpid(),
+            submitted_at=datetime.datetime.now().isoformat()
+        )
+        self.events.open(research_id)
+        self.events.publish(research_id, "queued", {"startup_idea": startup_idea})
+        return research_id
+    
+    def prepare_resume(self, research_id: str) -> Optional[str]:
+        """
+        Queue a failed research to run again from its checkpoints. Returns the
+        startup idea, or None if the research is not in a resumable state.
+        """
+        status = self._read_status(research_id)
+        if not status or status.get("state") != "failed" or not status.get("startup_idea"):
+            return None
+        self._write_status(
+            research_id,
+            state="queued",
+            stage="queued",
+            error=None,
+            finished_at=None,
+            worker_pid=os.getpid(),
+            attempts=status.get("attempts", 1) + 1
+        )
+        self.events.open(research_id)
+        self.events.publish(research_id, "queued", {
+            "startup_idea": status["startup_idea"],
+            "resumed": True,
+            "tasks_completed": len(status.get("completed_tasks", []))
+        })
+        return status["startup_idea"]
+    
+    @staticmethod
+    def idea_from_research_id(research_id: str) -> str:
+        """Best-effort idea text for runs that predate status files"""
+        return RESEARCH_ID_TIMESTAMP.sub("", research_id).replace("_", " ")
+    
+    def read_run_file(self, research_id: str, file_name: str) -> Optional[str]:
+        """Text of one file of a run, from its directory or its archive"""
+        try:
+            with open(self.output_dir / research_id / file_name, 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            pass
+        archived = self.open_archived_file(research_id, file_name)
+        return archived.read_text() if archived else None
+    
+    def open_archived_file(self, research_id: str, file_name: str):
+        """The ArchivedFile for a file of a compacted run, or None"""
+        record = self.manifest.get(research_id)
+        if not record or not record["archive"]:
+            return None
+        return open_member(record["archive"], research_id, file_name)
+    
+    def _reusable_content(self, research_id: str) -> Optional[str]:
+        """Planning and market research of a run, or None if either is missing or not real research"""
+        contents = []
+        for file_name in REUSABLE_TASK_FILES:
+            content = self.read_run_file(research_id, file_name)
+            if not content or len(content.replace(CREWAI_PLACEHOLDER_ANSWER, "").strip()) < REUSE_MIN_CHARS:
+                return None
+            contents.append(content)
+        return "\n\n".join(contents)
+    
+    def _research_created_at(self, research_id: str) -> Optional[float]:
+        """
+        When a run's reusable research was produced. A run seeded from another
+        carries its source's time (following chains of reuse), so reuse does
+        not restart the REUSE_MAX_AGE_DAYS window.
+        """
+        seen = set()
+        while True:
+            seen.add(research_id)
+            record = self.manifest.get(research_id) or {}
+            # status.json is inside the archive for compacted runs; the manifest keeps a copy
+            status = self._read_status(research_id) or record.get("status") or {}
+            reused_from = status.get("reused_from") or {}
+            if reused_from.get("research_created_at") is not None:
+                return reused_from["research_created_at"]
+            source_id = reused_from.get("research_id")
+            if source_id and source_id not in seen and self.manifest.get(source_id):
+                research_id = source_id
+                continue
+            if reused_from:
+                # The source is gone; this run's submission is the closest bound left
+                return record.get("created_at")
+            try:
+                return os.path.getmtime(self.output_dir / research_id / REUSABLE_TASK_FILES[-1])
+            except OSError:
+                # Compacted run
+                return record.get("created_at")
+    
+    def _index_run(self, index, research_id: str) -> None:
+        status = self._read_status(research_id)
+        if status and status.get("state") != "completed":
+            return
+        content = self._reusable_content(research_id)
+        if content is None:
+            return
+        startup_idea = (status or {}).get("startup_idea") or self.idea_from_research_id(research_id)
+        index.add(research_id, startup_idea, content, created_at=self._research_created_at(research_id))
+    
+    @property
+    def similarity_index(self):
+        """Index of completed runs with reusable research, built on first use"""
+        if self._index is None:
+            with self._index_lock:
+                if self._index is None:
+                    index = lazy_import("research_index").ResearchIndex()
+                    with stage("similarity_index_build"):
+                        for research_id in self.manifest.ids_in_states(["completed"]):
+                            self._index_run(index, research_id)
+                    logger.info(f"Similarity index built with {len(index)} runs")
+                    self._index = index
+        return self._index
+    
+    def find_similar(self, startup_idea: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Past runs closest to an idea, flagged when they are close and fresh enough to reuse"""
+        max_age = REUSE_MAX_AGE_DAYS * 86400
+        now = time.time()
+        matches = []
+        for entry, score in self.similarity_index.search(startup_idea, limit=limit):
+            matches.append({
+                "research_id": entry["research_id"],
+                "startup_idea": entry["startup_idea"],
+                "similarity": score,
+                "created_at": datetime.datetime.fromtimestamp(entry["created_at"]).isoformat(),
+                "reusable": score >= REUSE_SIMILARITY_THRESHOLD and now - entry["created_at"] <= max_age
+            })
+        return matches
+    
+    def _seed_from_similar(self, research_id: str, startup_idea: str) -> bool:
+        """
+        Copy the planning and market research of the closest fresh match into
+        a new run as checkpoints. Returns whether anything was reused.
+        """
+        matches = self.similarity_index.search(
+            startup_idea,
+            limit=1,
+            max_age=REUSE_MAX_AGE_DAYS * 86400,
+            min_score=REUSE_SIMILARITY_THRESHOLD
+        )
+        if not matches:
+            return False
+        
+        entry, score = matches[0]
+        return self._seed_from(research_id, entry["research_id"], REUSABLE_TASK_FILES, similarity=score)
+    
+    def _seed_from(
+        self,
+        research_id: str,
+        source_id: str,
+        file_names: List[str],
+        similarity: Optional[float] = None
+    ) -> bool:
+        """Copy task outputs of another run, compacted or not, into a new run as checkpoints"""
+        # Read everything first so a missing file leaves no unrecorded checkpoint behind
+        try:
+            contents = {file_name: self.read_run_file(source_id, file_name) for file_name in file_names}
+            missing = [file_name for file_name, content in contents.items() if content is None]
+            if missing:
+                logger.warning(f"Could not reuse research from {source_id}: {', '.join(missing)} not found")
+                return False
+            for file_name, content in contents.items():
+                self._write_task_output(research_id, file_name, content)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not reuse research from {source_id}: {str(e)}")
+            return False
+        
+        source = self.manifest.get(source_id) or {}
+        reused_from = {
+            "research_id": source_id,
+            "startup_idea": source.get("startup_idea"),
+            "similarity": similarity,
+            # Kept so this run ages with the research it reused, even once the source is gone
+            "research_created_at": self._research_created_at(source_id)
+        }
+        self._write_status(research_id, completed_tasks=list(file_names), reused_from=reused_from)
+        self.events.publish(research_id, "reused", {"reused_from": reused_from, "files": list(file_names)})
+        logger.info(f"Seeding {research_id} from {source_id} ({', '.join(file_names)})")
+        return True
+    
+    def _write_task_output(self, research_id: str, file_name: str, content: str) -> None:
+        """Write one task's output atomically so a checkpoint is never partial"""
+        research_dir = self.output_dir / research_id
+        with stage("checkpoint_write"):
+            fd, tmp_path = tempfile.mkstemp(dir=research_dir, suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp_path, research_dir / file_name)
+            self.manifest.add_files(research_id, [file_name])
+    
+    def _load_checkpoints(self, research_id: str, tasks: List[Task]) -> set:
+        """
+        Restore the outputs of tasks a previous attempt completed, so they can
+        serve as context without being run again. Returns their indices.
+        """
+        TaskOutput = lazy_import("crewai.tasks.task_output").TaskOutput
+        status = self._read_status(research_id) or {}
+        checkpointed = set(status.get("completed_tasks", []))
+        
+        restored = set()
+        for index, task in enumerate(tasks):
+            if task.output_file not in checkpointed:
+                continue
+            output_path = self.output_dir / research_id / task.output_file
+            try:
+                with open(output_path, 'r', encoding='utf-8') as f:
+                    raw = f.read()
+            except OSError:
+                continue
+            task.output = TaskOutput(description=task.description, raw=raw, agent=task.agent.role)
+            restored.add(index)
+        return restored
+    
+    def recover_interrupted(self) -> int:
+        """
+        Mark queued or running researches whose worker process has exited as
+        failed, so clients stop polling runs that will never finish.
+        """
+        recovered = 0
+        for research_id in self.manifest.ids_in_states(["queued", "running"]):
+            status = self._read_status(research_id)
+            if not status or status.get("state") not in ("queued", "running"):
+                continue
+            pid = status.get("worker_pid")
+            if pid and pid != os.getpid():
+                try:
+                    os.kill(pid, 0)
+                    continue
+                except ProcessLookupError:
+                    pass
+                except PermissionError:
+                    continue
+            self._write_status(
+                research_id,
+                state="failed",
+                stage="failed",
+                error="Interrupted before completion",
+                finished_at=datetime.datetime.now().isoformat()
+            )
+            recovered += 1
+        if recovered:
+            logger.warning(f"Marked {recovered} interrupted researches as failed")
+        return recovered
+    
+    @staticmethod
+    def _public_status(status: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Status fields for API responses. `status` and `progress` (a percentage)
+        keep the values the frontend polls on; `state` and `stage` carry the
+        detailed lifecycle.
+        """
+        state = status.get("state")
+        total = status.get("tasks_total") or 0
+        completed = status.get("tasks_completed") or 0
+        if state == "completed":
+            progress = 100
+        else:
+            progress = int(completed * 100 / total) if total else 0
+        
+        result = {
+            "status": {"completed": "completed", "failed": "error"}.get(state, "in_progress"),
+            "state": state,
+            "stage": status.get("stage", state),
+            "progress": progress,
+            "tasks_completed": completed,
+            "tasks_total": status.get("tasks_total")
+        }
+        for key in ("startup_idea", "submitted_at", "started_at", "finished_at", "error", "reused_from"):
+            if status.get(key) is not None:
+                result[key] = status[key]
+        return result
+    
+    def _task_event(self, tasks: List[Task], index: int, **fields) -> Dict[str, Any]:
+        """Payload describing one task in a research's event stream"""
+        return {
+            "task": Path(tasks[index].output_file).stem,
+            "index": index + 1,
+            "total": len(tasks),
+            **fields
+        }
+    
+    def _attach_task_callbacks(
+        self,
+        tasks: List[Task],
+        research_id: Optional[str] = None,
+        sequential: bool = True,
+        restored: Optional[set] = None,
+        ledger: Optional[RunLedger] = None
+    ) -> Callable[[int], None]:
+        """
+        Record each task's wall time as a crew_task stage when it completes.
+        For a tracked research, also write the task's output file right away,
+        advance the persisted progress and publish task events.
+        
+        Returns a function to call with a task's index when it starts. In
+        sequential mode each task is marked started when the previous one
+        finishes, so only the first needs to be marked by the caller.
+        """
+        lock = threading.Lock()
+        started_at = {}
+        running = set()
+        completed = [len(restored or ())]
+        completed_files = [tasks[index].output_file for index in sorted(restored or ())]
+        
+        def mark_started(index):
+            with lock:
+                started_at[index] = time.perf_counter()
+                running.add(index)
+                current = ",".join(str(i + 1) for i in sorted(running))
+            if ledger:
+                ledger.task_started(Path(tasks[index].output_file).stem)
+            if research_id:
+                self._write_status(research_id, stage=f"running: task {current}/{len(tasks)}")
+                self.events.publish(research_id, "task_started", self._task_event(tasks, index))
+        
+        def make_callback(index):
+            task = tasks[index]
+            task_name = Path(task.output_file).stem
+            
+            def on_complete(output):
+                now = time.perf_counter()
+                with lock:
+                    elapsed = now - started_at.get(index, now)
+                    running.discard(index)
+                    completed[0] += 1
+                    tasks_completed = completed[0]
+                record_stage(f"crew_task_{task_name}", elapsed)
+                if ledger:
+                    ledger.task_finished(task_name, elapsed)
+                
+                if research_id:
+                    # Checkpoint the output as soon as the task finishes; it is
+                    # listed in completed_tasks only once it is fully on disk
+                    self._write_task_output(research_id, task.output_file, str(output))
+                    with lock:
+                        completed_files.append(task.output_file)
+                        checkpoints = list(completed_files)
+                    self._write_status(research_id, tasks_completed=tasks_completed, completed_tasks=checkpoints)
+                    self.events.publish(research_id, "task_finished", self._task_event(
+                        tasks, index, elapsed=round(elapsed, 3), output_file=task.output_file
+                    ))
+                
+                if sequential and index + 1 < len(tasks):
+                    mark_started(index + 1)
+            return on_complete
+        
+        for index, task in enumerate(tasks):
+            task.callback = make_callback(index)
+        return mark_started
+    
+    def _run_task_graph(
+        self,
+        tasks: List[Task],
+        agents: Dict[str, Agent],
+        on_start: Callable[[int], None],
+        completed: Optional[set] = None
+    ) -> Any:
+        """
+        Run the tasks in dependency order, starting independent tasks in
+        parallel, and return the output of the last task.
+        """
+        all_agents = list(agents.values())
+        # An agent's executor holds per-task state, so tasks sharing an agent take turns
+        agent_locks = {id(agent): threading.Lock() for agent in all_agents}
+        
+        def execute(index):
+            task = tasks[index]
+            context = "\n\n----------\n\n".join(
+                str(dep.output) for dep in (task.context or []) if dep.output is not None
+            )
+            tools = list(task.tools or [])
+            if getattr(task.agent, "allow_delegation", False):
+                tools += task.agent.get_delegation_tools([a for a in all_agents if a is not task.agent])
+            with agent_locks[id(task.agent)], track_task(Path(task.output_file).stem):
+                return task.execute_sync(agent=task.agent, context=context, tools=tools)
+        
+        dependencies = task_dependencies(tasks)
+        logger.info(
+            f"Running {len(tasks)} tasks with up to {self.max_parallel} in parallel "
+            f"(critical path: {critical_path_length(dependencies)} tasks)"
+        )
+        run_dag(tasks, execute, self.max_parallel, on_start=on_start, completed=completed)
+        return tasks[-1].output
     
-    def evaluate_startup(self, startup_idea: str) -> Dict[str, Any]:
+    def evaluate_startup(
+        self,
+        startup_idea: str,
+        client_id: Optional[str] = None,
+        research_id: Optional[str] = None,
+        resume: bool = False,
+        reuse: Optional[bool] = None,
+        seed_from: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """
         Run the full startup evaluation process.
         
         Args:
             startup_idea: The startup idea to evaluate
+            client_id: Who requested the evaluation, for fair scheduling of LLM calls
+            research_id: ID reserved with create_research(); a new one is created if omitted
+            resume: Reuse the task outputs checkpointed by a previous attempt
+                and run only the missing tasks
+            reuse: Seed planning and market research from a similar recent
+                run (REUSE_PRIOR_RESEARCH by default)
+            seed_from: Seed from a specific run instead: {"research_id": ...,
+                "files": [...]}, as planned by plan_batch()
             
         Returns:
             A dictionary containing the results and file paths
         """
-        # Generate a unique ID for this research
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        idea_slug = startup_idea.lower().replace(" ", "_")[:30]
-        research_id = f"{idea_slug}_{timestamp}"
+        if research_id is None:
+            research_id = self.create_research(startup_idea)
+        research_dir = self.output_dir / research_id
         
         logger.info(f"Starting evaluation of: {startup_idea} (ID: {research_id})")
         
-        # Create the agents and tasks
-        agents = self.create_agents()
-        tasks = self.create_tasks(agents, startup_idea)
-        
-        # Create and run the crew
-        crew = Crew(
-            agents=list(agents.values()),
-            tasks=tasks,
-            verbose=True,
-            process=self.process
-        )
-        
+        agents = None
+        ledger = None
         try:
-            # Run the evaluation
-            result = crew.kickoff()
+            crewai = lazy_import("crewai")
+            TaskOutput = lazy_import("crewai.tasks.task_output").TaskOutput
             
-            # Create directory for this specific research
-            research_dir = self.output_dir / research_id
-            os.makedirs(research_dir, exist_ok=True)
+            # Check out a reusable set of agents and create the tasks
+            agents = self._acquire_agents()
+            tasks = self.create_tasks(agents, startup_idea)
+            if reuse is None:
+                reuse = REUSE_PRIOR_RESEARCH
+            seeded = False
+            if not resume and seed_from:
+                seeded = self._seed_from(research_id, seed_from["research_id"], seed_from["files"])
+            if not resume and not seeded and reuse:
+                seeded = self._seed_from_similar(research_id, startup_idea)
+            restored = self._load_checkpoints(research_id, tasks) if resume or seeded else set()
+            if restored:
+                logger.info(f"{research_id}: {len(restored)}/{len(tasks)} tasks restored from checkpoints")
+            
+            # Skipping completed tasks needs the graph executor
+            run_as_graph = bool(restored) or (self.process is None and self.max_parallel > 1)
+            ledger = RunLedger(research_id)
+            mark_started = self._attach_task_callbacks(
+                tasks, research_id, sequential=not run_as_graph, restored=restored, ledger=ledger
+            )
             
-            # Save all task outputs
+            self._write_status(
+                research_id,
+                state="running",
+                stage="running",
+                tasks_total=len(tasks),
+                tasks_completed=len(restored),
+                completed_tasks=[tasks[index].output_file for index in sorted(restored)],
+                worker_pid=os.getpid(),
+                started_at=datetime.datetime.now().isoformat()
+            )
+            self.events.publish(research_id, "started", {"tasks_total": len(tasks), "tasks_restored": len(restored)})
+            
+            # Run the evaluation
+            with stage("crew_kickoff"), llm_client(client_id or "anonymous", "batch"), track_run(ledger):
+                if run_as_graph:
+                    result = self._run_task_graph(tasks, agents, mark_started, completed=restored)
+                else:
+                    crew = crewai.Crew(
+                        agents=list(agents.values()),
+                        tasks=tasks,
+                        verbose=CREW_VERBOSE,
+                        process=self.process or crewai.Process.sequential
+                    )
+                    mark_started(0)
+                    result = crew.kickoff()
+            
+            # Save any task outputs the callbacks have not written
             files = {}
             for task in tasks:
                 output_path = research_dir / task.output_file
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    if isinstance(task.output, TaskOutput):
-                        f.write(str(task.output))
-                    elif task.output:
-                        f.write(str(task.output))
+                if not output_path.exists():
+                    with open(output_path, 'w', encoding='utf-8') as f:
+                        if isinstance(task.output, TaskOutput):
+                            f.write(str(task.output))
+                        elif task.output:
+                            f.write(str(task.output))
                 files[task.output_file] = str(output_path)
             
-            # Generate additional output formats for the final report
-            final_report_path = research_dir / "final_startup_evaluation.md"
-            
-            # Create PDF (simulated as HTML for now)
-            html_path = research_dir / "final_startup_evaluation.html"
-            if os.path.exists(final_report_path):
-                with open(final_report_path, 'r', encoding='utf-8') as f:
-                    markdown_content = f.read()
-                html_content = markdown2.markdown(markdown_content)
-                with open(html_path, 'w', encoding='utf-8') as f:
-                    f.write(html_content)
-                files["html"] = str(html_path)
-            
-            # Create DOCX
-            docx_path = research_dir / "final_startup_evaluation.docx"
-            if os.path.exists(final_report_path):
-                doc = Document()
-                doc.add_heading(f"Startup Evaluation: {startup_idea}", 0)
-                
-                with open(final_report_path, 'r', encoding='utf-8') as f:
-                    markdown_content = f.read()
-                
-                # Simple markdown parsing (headers and paragraphs only)
-                for line in markdown_content.split('\n'):
-                    if line.startswith('# '):
-                        doc.add_heading(line[2:], 1)
-                    elif line.startswith('## '):
-                        doc.add_heading(line[3:], 2)
-                    elif line.startswith('### '):
-                        doc.add_heading(line[4:], 3)
-                    elif line.strip():
-                        doc.add_paragraph(line)
-                
-                doc.save(docx_path)
-                files["docx"] = str(docx_path)
+            # HTML, DOCX and other formats are rendered on first download
+            self.manifest.add_files(research_id, [os.path.basename(path) for path in files.values()])
+            self._write_status(
+                research_id,
+                state="completed",
+                stage="completed",
+                tasks_completed=len(tasks),
+                finished_at=datetime.datetime.now().isoformat()
+            )
+            if self._index is not None:
+                self._index_run(self._index, research_id)
+            self.events.publish(research_id, "completed", {"files": sorted(os.path.basename(p) for p in files.values())})
             
             # Return results
             return {
@@ -451,63 +1162,382 @@ class StartupResearchCrew:
             
         except Exception as e:
             logger.error(f"Error during startup evaluation: {str(e)}", exc_info=True)
+            self._write_status(
+                research_id,
+                state="failed",
+                stage="failed",
+                error=str(e),
+                finished_at=datetime.datetime.now().isoformat()
+            )
+            self.events.publish(research_id, "failed", {"error": str(e)})
             return {
                 "research_id": research_id,
                 "startup_idea": startup_idea,
                 "status": "error",
                 "error": str(e)
             }
+        finally:
+            if agents is not None:
+                self._release_agents(agents)
+            if ledger is not None:
+                self._save_usage(research_id, ledger)
     
-    def get_research_by_id(self, research_id: str) -> Dict[str, Any]:
-        """Retrieve a previously completed research by its ID"""
+    def _save_usage(self, research_id: str, ledger: RunLedger) -> None:
+        """Append a run attempt's ledger to usage.json and the manifest"""
+        try:
+            attempt = ledger.to_dict()
+            usage_path = self.output_dir / research_id / USAGE_FILE
+            try:
+                with open(usage_path, 'r', encoding='utf-8') as f:
+                    usage = json.load(f)
+            except (OSError, ValueError):
+                usage = {"research_id": research_id, "attempts": []}
+            usage["attempts"].append(attempt)
+            
+            fd, tmp_path = tempfile.mkstemp(dir=self.output_dir / research_id, suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(usage, f, indent=2)
+            os.replace(tmp_path, usage_path)
+            
+            self.manifest.record_task_usage(research_id, attempt["tasks"])
+            totals = attempt["totals"]
+            logger.info(
+                f"{research_id}: {totals['llm_calls']} LLM calls, "
+                f"{totals['prompt_tokens']}+{totals['completion_tokens']} tokens, ${totals['cost_usd']:.4f}"
+            )
+        except Exception as e:
+            logger.error(f"Could not save usage for {research_id}: {str(e)}", exc_info=True)
+    
+    def get_usage(self, research_id: str) -> Optional[Dict[str, Any]]:
+        """A run's ledger, one entry per attempt, or None if it has none"""
+        if not self._valid_research_id(research_id):
+            return None
+        try:
+            return json.loads(self.read_run_file(research_id, USAGE_FILE) or "null")
+        except ValueError:
+            return None
+    
+    def usage_summary(self, days: Optional[float] = None) -> Dict[str, Any]:
+        """Per-task usage aggregated across runs, optionally over the last `days`"""
+        since = time.time() - days * 86400 if days else None
+        rows = self.manifest.task_usage_rows(since=since)
+        return {
+            "runs": len({row["research_id"] for row in rows}),
+            "since": datetime.datetime.fromtimestamp(since).isoformat() if since else None,
+            "tasks": summarize_usage(rows)
+        }
+    
+    def plan_batch(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Reserve a queued research for every idea of a batch and decide which
+        runs share research. An idea close to an earlier idea of the batch
+        reuses that run's planning and market research; otherwise an idea with
+        the same sector as an earlier one reuses its market research. Runs
+        that seed others are the group leaders and must run first.
+        
+        Args:
+            items: Dicts with "startup_idea" and an optional "sector"
+        
+        Returns:
+            The batch as stored in the manifest
+        """
+        index = lazy_import("research_index").ResearchIndex()
+        sector_leaders = {}
+        planned = []
+        for item in items:
+            startup_idea = item["startup_idea"]
+            sector = (item.get("sector") or "").strip().lower() or None
+            research_id = self.create_research(startup_idea)
+            
+            seed_from = None
+            matches = index.search(startup_idea, limit=1, min_score=REUSE_SIMILARITY_THRESHOLD)
+            if matches:
+                seed_from = {"research_id": matches[0][0]["research_id"], "files": list(REUSABLE_TASK_FILES)}
+            elif sector in sector_leaders:
+                seed_from = {"research_id": sector_leaders[sector], "files": [SECTOR_RESEARCH_FILE]}
+            else:
+                index.add(research_id, startup_idea)
+                if sector:
+                    sector_leaders[sector] = research_id
+            
+            planned.append({
+                "research_id": research_id,
+                "startup_idea": startup_idea,
+                "sector": sector,
+                "seed_from": seed_from
+            })
+        
+        batch_id = f"batch_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        self.manifest.create_batch(batch_id, planned)
+        leaders = sum(1 for item in planned if not item["seed_from"])
+        logger.info(f"Planned {batch_id}: {len(planned)} ideas, {leaders} without shared research")
+        return self.manifest.get_batch(batch_id)
+    
+    def batch_status(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """Aggregate progress of a batch and the state of each of its runs"""
+        batch = self.manifest.get_batch(batch_id)
+        if batch is None:
+            return None
+        
+        items = []
+        counts = {}
+        for item in batch["items"]:
+            status = self.get_research_by_id(item["research_id"])
+            state = "missing" if status.get("status") == "not_found" else status.get("state", "completed")
+            counts[state] = counts.get(state, 0) + 1
+            items.append({
+                "research_id": item["research_id"],
+                "startup_idea": item["startup_idea"],
+                "sector": item.get("sector"),
+                "state": state,
+                "stage": status.get("stage"),
+                "progress": status.get("progress", 0),
+                "reused_from": status.get("reused_from")
+            })
+        
+        finished = sum(counts.get(state, 0) for state in ("completed", "failed", "missing"))
+        return {
+            "batch_id": batch_id,
+            "created_at": datetime.datetime.fromtimestamp(batch["created_at"]).isoformat(),
+            "total": len(items),
+            "counts": counts,
+            "progress": int(sum(item["progress"] for item in items) / len(items)) if items else 100,
+            "done": finished == len(items),
+            "comparison_ready": batch["comparison"] is not None,
+            "items": items
+        }
+    
+    def _report_excerpt(self, research_id: str, max_chars: int = 400) -> str:
+        """First substantial paragraph of a run's final report"""
+        report = self.read_run_file(research_id, FINAL_REPORT_FILE) or ""
+        for paragraph in report.split("\n\n"):
+            paragraph = " ".join(paragraph.split())
+            if len(paragraph) >= 80 and not paragraph.startswith("#"):
+                return paragraph if len(paragraph) <= max_chars else paragraph[:max_chars].rsplit(" ", 1)[0] + "..."
+        return ""
+    
+    def build_batch_comparison(self, batch_id: str) -> Optional[str]:
+        """Write and store a markdown comparison of every run in a batch"""
+        status = self.batch_status(batch_id)
+        if status is None:
+            return None
+        
+        lines = [
+            f"# Batch comparison: {batch_id}",
+            "",
+            f"{status['total']} ideas, " + ", ".join(f"{count} {state}" for state, count in sorted(status["counts"].items())),
+            "",
+            "| # | Startup idea | Outcome | Cost (USD) | LLM calls | Reused from |",
+            "|---|---|---|---|---|---|"
+        ]
+        sections = []
+        for position, item in enumerate(status["items"], 1):
+            usage = self.get_usage(item["research_id"]) or {"attempts": []}
+            cost = sum(attempt["totals"]["cost_usd"] for attempt in usage["attempts"])
+            calls = sum(attempt["totals"]["llm_calls"] for attempt in usage["attempts"])
+            reused = (item["reused_from"] or {}).get("research_id") or "-"
+            idea = item["startup_idea"].replace("|", "/")
+            lines.append(f"| {position} | {idea} | {item['state']} | {cost:.4f} | {calls} | {reused} |")
+            
+            excerpt = self._report_excerpt(item["research_id"])
+            sections.extend([
+                f"## {position}. {item['startup_idea']}",
+                "",
+                f"Research ID: `{item['research_id']}`" + (f" (sector: {item['sector']})" if item.get("sector") else ""),
+                "",
+                excerpt or "_No final report._",
+                ""
+            ])
+        
+        comparison = "\n".join(lines + [""] + sections)
+        self.manifest.set_batch_comparison(batch_id, comparison)
+        return comparison
+    
+    def compact_runs(self, older_than_days: Optional[float] = None, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Pack finished runs submitted more than `older_than_days` ago into
+        monthly zip archives and delete their directories. Renderings of a
+        markdown output are left out, since they are rebuilt on download.
+        
+        Args:
+            older_than_days: Age threshold, COMPACT_AFTER_DAYS by default
+            dry_run: Only report which runs would be archived
+        
+        Returns:
+            Counts of archived runs and files and the bytes before and after
+        """
+        days = COMPACT_AFTER_DAYS if older_than_days is None else older_than_days
+        candidates = self.manifest.compactable_ids(time.time() - days * 86400)
+        
+        by_archive = {}
+        for research_id in candidates:
+            record = self.manifest.get(research_id)
+            research_dir = self.output_dir / research_id
+            if record is None or not research_dir.is_dir():
+                continue
+            names = {path.name for path in research_dir.iterdir() if path.is_file() and path.suffix != ".tmp"}
+            files = {
+                name: research_dir / name for name in names
+                if not (Path(name).suffix in RENDERERS and f"{Path(name).stem}.md" in names)
+            }
+            by_archive.setdefault(archive_path_for(record["created_at"]), {})[research_id] = files
+        
+        summary = {
+            "runs": sum(len(runs) for runs in by_archive.values()),
+            "files": sum(len(files) for runs in by_archive.values() for files in runs.values()),
+            "archives": sorted(str(path) for path in by_archive),
+            "bytes_before": sum(
+                path.stat().st_size
+                for runs in by_archive.values() for research_id in runs
+                for path in (self.output_dir / research_id).iterdir() if path.is_file()
+            ),
+            "bytes_after": 0,
+            "dry_run": dry_run
+        }
+        if dry_run:
+            return summary
+        
+        with self._compact_lock:
+            for archive_path, runs in sorted(by_archive.items()):
+                with stage("compact_archive"):
+                    _, packed = write_archive(archive_path, runs)
+                summary["bytes_after"] += packed
+                for research_id, files in runs.items():
+                    # Point the manifest at the archive before the directory goes away
+                    self.manifest.set_archive(research_id, str(archive_path), [
+                        name for name in list_members(archive_path, research_id) if name != STATUS_FILE
+                    ])
+                    shutil.rmtree(self.output_dir / research_id, ignore_errors=True)
+                logger.info(f"Compacted {len(runs)} runs into {archive_path}")
+        return summary
+    
+    def _valid_research_id(self, research_id: str) -> bool:
+        return bool(research_id) and "/" not in research_id and "\\" not in research_id and not research_id.startswith(".")
+    
+    def _backfill_manifest(self, research_id: str) -> Optional[Dict[str, Any]]:
+        """Add a run directory the manifest does not know about yet"""
         research_dir = self.output_dir / research_id
+        if not research_dir.is_dir():
+            return None
         
-        if not os.path.exists(research_dir):
+        # Runs from before status tracking have no status file and are complete
+        status = self._read_status(research_id) or {
+            "research_id": research_id,
+            "startup_idea": self.idea_from_research_id(research_id),
+            "state": "completed",
+            "stage": "completed"
+        }
+        files = [
+            path.name for path in research_dir.iterdir()
+            if path.name != STATUS_FILE and path.suffix != ".tmp"
+        ]
+        try:
+            created_at = datetime.datetime.fromisoformat(status["submitted_at"]).timestamp()
+        except (KeyError, TypeError, ValueError):
+            match = RESEARCH_ID_TIMESTAMP.search(research_id)
+            if match:
+                stamp = match.group(0).lstrip("_")[:15]
+                created_at = datetime.datetime.strptime(stamp, "%Y%m%d_%H%M%S").timestamp()
+            else:
+                created_at = research_dir.stat().st_mtime
+        self.manifest.upsert_status(research_id, status, created_at=created_at, files=files)
+        return self.manifest.get(research_id)
+    
+    def sync_manifest(self) -> int:
+        """Add run directories missing from the manifest. Returns how many were added."""
+        known = self.manifest.known_ids()
+        added = 0
+        for research_dir in self.output_dir.iterdir():
+            if research_dir.is_dir() and research_dir.name not in known:
+                if self._backfill_manifest(research_dir.name):
+                    added += 1
+        if added:
+            logger.info(f"Added {added} research directories to the manifest")
+        return added
+    
+    def get_research_by_id(self, research_id: str) -> Dict[str, Any]:
+        """Retrieve a research and its current status by ID"""
+        if not self._valid_research_id(research_id):
+            return {"status": "not_found", "error": "Research ID not found"}
+        
+        record = self.manifest.get(research_id) or self._backfill_manifest(research_id)
+        if record is None:
             return {"status": "not_found", "error": "Research ID not found"}
         
-        files = {}
-        for file_path in research_dir.glob("*"):
-            files[file_path.name] = str(file_path)
+        research_dir = self.output_dir / research_id
+        files = {name: str(research_dir / name) for name in record["files"]}
         
-        return {
+        # Other formats of the final report are rendered when first downloaded
+        if FINAL_REPORT_FILE in files:
+            stem = Path(FINAL_REPORT_FILE).stem
+            for extension in RENDERERS:
+                files.setdefault(f"{stem}{extension}", str(research_dir / f"{stem}{extension}"))
+        
+        result = {
             "research_id": research_id,
             "status": "completed",
-            "files": files
+            "files": files,
+            "archived": bool(record["archive"])
         }
+        result.update(self._public_status(record["status"]))
+        return result
     
-    def list_researches(self) -> List[Dict[str, str]]:
-        """List all completed researches"""
+    def list_researches(
+        self,
+        limit: int = 50,
+        offset: int = 0,
+        states: Optional[List[str]] = None,
+        query: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        List researches newest first, including queued and running ones.
+        
+        Args:
+            limit: Page size
+            offset: Number of researches to skip
+            states: Only include these lifecycle states
+            query: Only include ideas containing this text
+        """
+        records, total = self.manifest.list(limit=limit, offset=offset, states=states, query=query)
         researches = []
+        for record in records:
+            public = self._public_status(record["status"])
+            researches.append({
+                "research_id": record["research_id"],
+                "startup_idea": record["startup_idea"],
+                "created_at": datetime.datetime.fromtimestamp(record["created_at"]).isoformat(),
+                "status": public["status"],
+                "state": record["state"],
+                "progress": public["progress"]
+            })
         
-        for research_dir in self.output_dir.glob("*"):
-            if research_dir.is_dir():
-                # Try to extract the startup idea from the directory name
-                parts = research_dir.name.split("_")
-                timestamp_parts = [p for p in parts if p.isdigit() and len(p) >= 8]
-                if timestamp_parts:
-                    # Remove timestamp parts from name
-                    for tp in timestamp_parts:
-                        parts.remove(tp)
-                    startup_idea = " ".join(parts).replace("_", " ").title()
-                else:
-                    startup_idea = research_dir.name.replace("_", " ").title()
-                
-                researches.append({
-                    "research_id": research_dir.name,
-                    "startup_idea": startup_idea,
-                    "created_at": datetime.datetime.fromtimestamp(research_dir.stat().st_ctime).isoformat()
-                })
-        
-        # Sort by creation time (newest first)
-        researches.sort(key=lambda x: x["created_at"], reverse=True)
-        return researches
+        return {
+            "researches": researches,
+            "total": total,
+            "limit": limit,
+            "offset": offset
+        }
 
 
-# For direct testing
+# For direct testing; `python startup_research.py compact [--days N] [--dry-run]`
+# archives old runs instead
 if __name__ == "__main__":
+    import argparse
+    
+    configure_logging("startup_research")
+    
+    parser = argparse.ArgumentParser(description="Run a test evaluation or compact old research runs")
+    parser.add_argument("command", nargs="?", choices=["evaluate", "compact"], default="evaluate")
+    parser.add_argument("--days", type=float, default=None, help="Compact runs older than this many days")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be compacted")
+    args = parser.parse_args()
+    
     # Set your API key
     # os.environ["OPENAI_API_KEY"] = "your-api-key"
     
     crew = StartupResearchCrew()
-    result = crew.evaluate_startup("AI tool for personalized mental health")
-    print(json.dumps(result, indent=2)) 
\ No newline at end of file
+    if args.command == "compact":
+        print(json.dumps(crew.compact_runs(older_than_days=args.days, dry_run=args.dry_run), indent=2))
+    else:
+        result = crew.evaluate_startup("AI tool for personalized mental health")
+        print(json.dumps(result, indent=2)) 
\ No newline at end of file
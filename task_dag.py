@@ -0,0 +1,104 @@
+"""
+Dependency-ordered parallel execution of crew tasks.
+
+Each task's `context` list names the tasks whose outputs it needs, which
+makes the task list a DAG. run_dag() starts every task whose dependencies
+have finished, up to a parallelism cap, so independent branches run side by
+side and the wall-clock time approaches the critical path rather than the
+sum of all tasks.
+"""
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def task_dependencies(tasks):
+    """
+    Return, for each task, the set of indices of the tasks in its context.
+    Context tasks that are not part of `tasks` are ignored.
+
+    Raises:
+        ValueError: if the dependencies contain a cycle
+    """
+    positions = {id(task): index for index, task in enumerate(tasks)}
+    dependencies = []
+    for task in tasks:
+        context = getattr(task, "context", None) or []
+        dependencies.append({positions[id(dep)] for dep in context if id(dep) in positions})
+
+    # Kahn's algorithm: every task must become ready eventually
+    remaining = {index: set(deps) for index, deps in enumerate(dependencies)}
+    while remaining:
+        ready = [index for index, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Task dependencies contain a cycle among tasks {sorted(remaining)}")
+        for index in ready:
+            del remaining[index]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return dependencies
+
+
+def critical_path_length(dependencies):
+    """Number of tasks on the longest dependency chain"""
+    depth = {}
+
+    def visit(index):
+        if index not in depth:
+            depth[index] = 1 + max((visit(dep) for dep in dependencies[index]), default=0)
+        return depth[index]
+
+    return max((visit(index) for index in range(len(dependencies))), default=0)
+
+
+def run_dag(tasks, execute, max_parallel=1, on_start=None, completed=None):
+    """
+    Run `execute(index)` for every task once all of its dependencies are done.
+
+    Args:
+        tasks: Tasks with `context` dependency lists
+        execute: Callable that runs the task at an index and returns its output
+        max_parallel: Maximum number of tasks running at once
+        on_start: Optional callable invoked with the index just before a task runs
+        completed: Indices that are already done and must not run again
+
+    Returns:
+        A dict mapping each executed index to its output
+
+    Raises:
+        The first exception raised by a task. Tasks already running are
+        allowed to finish, but nothing new is started.
+    """
+    dependencies = task_dependencies(tasks)
+    done = set(completed or ())
+    pending = [index for index in range(len(tasks)) if index not in done]
+    outputs = {}
+    error = None
+
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel), thread_name_prefix="crew-task") as pool:
+        running = {}
+        while pending or running:
+            if error is None:
+                ready = [index for index in pending if dependencies[index] <= done]
+                for index in ready[:max(0, max_parallel - len(running))]:
+                    pending.remove(index)
+                    if on_start:
+                        on_start(index)
+                    # Carry the caller's context (LLM client, trace) into the worker
+                    running[pool.submit(contextvars.copy_context().run, execute, index)] = index
+
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                index = running.pop(future)
+                try:
+                    outputs[index] = future.result()
+                    done.add(index)
+                except Exception as e:
+                    if error is None:
+                        error = e
+
+    if error is not None:
+        raise error
+    return outputs
@@ -0,0 +1,640 @@
+"""
+Offline stand-ins for the upstream services used by the Flask apps.
+
+A single Flask app serves:
+    - OpenAI chat completions   POST /v1/chat/completions (blocking and streamed)
+    - SearXNG JSON search       GET  /search
+    - GitLab REST API v4        /api/v4/user, /api/v4/projects, /api/v4/projects/<id>/issues[/<iid>]
+    - Gmail API v1              /gmail/v1/users/me/... (incl. history), POST /batch/gmail/v1
+
+Point the services at it with:
+    OPENAI_API_BASE=http://localhost:9100/v1
+    SEARXNG_INSTANCE=http://localhost:9100
+    GITLAB_URL=http://localhost:9100
+    GMAIL_API_ENDPOINT=http://localhost:9100/
+    GMAIL_TOKEN_FILE=<file written with --write-gmail-token>
+
+Latency, token rate and 429 injection are configurable on the command line.
+"""
+import argparse
+import base64
+import email.parser
+import json
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+from http import HTTPStatus
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from flask import Flask, Response, jsonify, request
+
+sim_app = Flask(__name__)
+
+# Simulation knobs, overridden from the command line
+SIM_CONFIG = {
+    "latency": 0.2,        # Mean added latency per request, in seconds
+    "jitter": 0.1,         # Uniform jitter around the mean latency, in seconds
+    "token_rate": 50.0,    # Completion tokens generated per second
+    "completion_tokens": 300,
+    "error_rate": 0.0,     # Fraction of OpenAI calls answered with 429
+    "gmail_batch_error_rate": 0.0,  # Fraction of calls inside Gmail batches answered with 429
+    "projects": 45,
+    "issues_per_project": 60,
+    "messages": 200,
+}
+
+_rng = random.Random(42)
+_rng_lock = threading.Lock()
+
+LOREM = (
+    "market growth customers platform video calls meeting transcription research "
+    "competition pricing revenue adoption enterprise teams collaboration security "
+    "latency quality integration analytics summary insight strategy"
+).split()
+
+
+def _random():
+    with _rng_lock:
+        return _rng.random()
+
+
+def simulate_latency(scale=1.0):
+    """Sleep for the configured latency with uniform jitter"""
+    jitter = SIM_CONFIG["jitter"]
+    delay = SIM_CONFIG["latency"] * scale + (_random() * 2 - 1) * jitter
+    if delay > 0:
+        time.sleep(delay)
+
+
+def fake_words(count, seed):
+    """Deterministic filler text"""
+    rng = random.Random(seed)
+    return " ".join(rng.choice(LOREM) for _ in range(count))
+
+
+def iso_time(offset_minutes):
+    """ISO-8601 timestamp offset_minutes before a fixed reference time"""
+    reference = datetime(2025, 5, 19, 12, 0, tzinfo=timezone.utc)
+    return (reference - timedelta(minutes=offset_minutes)).isoformat().replace("+00:00", "Z")
+
+
+# ----------------- OpenAI -----------------
+
+@sim_app.route('/v1/chat/completions', methods=['POST'])
+def chat_completions():
+    """Mimic the OpenAI chat completions API"""
+    if SIM_CONFIG["error_rate"] and _random() < SIM_CONFIG["error_rate"]:
+        response = jsonify({"error": {"message": "Rate limit reached (simulated)", "type": "requests", "code": "rate_limit_exceeded"}})
+        response.status_code = 429
+        response.headers["Retry-After"] = "1"
+        return response
+
+    body = request.get_json(silent=True) or {}
+    model = body.get("model", "gpt-3.5-turbo")
+    messages = body.get("messages", [])
+    prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+    completion_tokens = min(int(body.get("max_tokens") or SIM_CONFIG["completion_tokens"]), SIM_CONFIG["completion_tokens"])
+    words = fake_words(completion_tokens, seed=prompt_tokens).split()
+    created = int(time.time())
+    completion_id = f"chatcmpl-sim{created}{prompt_tokens}"
+
+    # Time to first token
+    simulate_latency()
+
+    if body.get("stream"):
+        def generate():
+            interval = 1.0 / SIM_CONFIG["token_rate"] if SIM_CONFIG["token_rate"] > 0 else 0
+            for i, word in enumerate(words):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                if interval:
+                    time.sleep(interval)
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return Response(generate(), mimetype="text/event-stream")
+
+    if SIM_CONFIG["token_rate"] > 0:
+        time.sleep(completion_tokens / SIM_CONFIG["token_rate"])
+
+    return jsonify({
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": " ".join(words)},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    })
+
+
+# ----------------- SearXNG -----------------
+
+@sim_app.route('/search', methods=['GET'])
+def searxng_search():
+    """Mimic SearXNG's JSON search output"""
+    simulate_latency()
+    query = request.args.get("q", "")
+    count = int(request.args.get("results", 10))
+    results = []
+    for i in range(count):
+        results.append({
+            "title": f"{query.title()} - result {i + 1}",
+            "url": f"https://example.com/{zlib.crc32(query.encode()) % 10000}/{i}",
+            "content": fake_words(40, seed=f"{query}-{i}"),
+            "engine": ["google", "bing", "duckduckgo", "wikipedia"][i % 4],
+            "score": round(1.0 / (i + 1), 4),
+        })
+    return jsonify({"query": query, "number_of_results": len(results), "results": results})
+
+
+# ----------------- GitLab -----------------
+
+def gitlab_project(project_id):
+    return {
+        "id": project_id,
+        "name": f"project-{project_id}",
+        "path_with_namespace": f"sim-group/project-{project_id}",
+        "description": fake_words(20, seed=f"project-{project_id}"),
+        "web_url": f"https://gitlab.example.com/sim-group/project-{project_id}",
+        "last_activity_at": iso_time(project_id * 7),
+        "star_count": project_id % 9,
+        "forks_count": project_id % 4,
+        "namespace": {"id": 1, "name": "sim-group", "path": "sim-group", "kind": "group"},
+        "statistics": {"commit_count": project_id * 13},
+        "permissions": {"project_access": {"access_level": 30}, "group_access": None},
+        "_links": {"self": f"https://gitlab.example.com/api/v4/projects/{project_id}"},
+    }
+
+
+def gitlab_simple_project(project):
+    """The fields GitLab returns for simple=true"""
+    keys = ("id", "name", "path_with_namespace", "description", "web_url", "last_activity_at",
+            "star_count", "forks_count", "namespace")
+    return {key: project[key] for key in keys}
+
+
+def gitlab_issue(project_id, iid):
+    return {
+        "id": project_id * 10000 + iid,
+        "iid": iid,
+        "project_id": project_id,
+        "title": f"Issue {iid}: {fake_words(5, seed=f'{project_id}-{iid}')}",
+        "description": fake_words(80, seed=f"issue-{project_id}-{iid}"),
+        "state": "opened" if iid % 4 else "closed",
+        "created_at": iso_time(iid * 60),
+        "updated_at": iso_time(iid * 11),
+        "labels": ["bug"] if iid % 3 == 0 else ["feature"],
+        "web_url": f"https://gitlab.example.com/sim-group/project-{project_id}/-/issues/{iid}",
+        "author": {"id": 7, "username": "sim-user", "name": "Sim User"},
+    }
+
+
+def gitlab_conditional(response):
+    """Tag a response with an ETag and answer a matching If-None-Match with 304"""
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+def gitlab_keyset_page(items):
+    """Keyset pagination by ascending id, with a rel="next" Link header"""
+    per_page = min(100, max(1, int(request.args.get("per_page", 20))))
+    id_after = int(request.args.get("id_after", 0))
+    remaining = sorted((item for item in items if item["id"] > id_after), key=lambda item: item["id"])
+    response = jsonify(remaining[:per_page])
+    if len(remaining) > per_page:
+        args = request.args.to_dict()
+        args["id_after"] = remaining[per_page - 1]["id"]
+        response.headers["Link"] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return gitlab_conditional(response)
+
+
+def gitlab_page(items):
+    """Apply page/per_page pagination and GitLab's pagination headers"""
+    if request.args.get("pagination") == "keyset":
+        return gitlab_keyset_page(items)
+    page = max(1, int(request.args.get("page", 1)))
+    per_page = min(100, max(1, int(request.args.get("per_page", 20))))
+    start = (page - 1) * per_page
+    response = jsonify(items[start:start + per_page])
+    total_pages = max(1, (len(items) + per_page - 1) // per_page)
+    response.headers["X-Page"] = str(page)
+    response.headers["X-Per-Page"] = str(per_page)
+    response.headers["X-Total"] = str(len(items))
+    response.headers["X-Total-Pages"] = str(total_pages)
+    response.headers["X-Next-Page"] = str(page + 1) if page < total_pages else ""
+    return gitlab_conditional(response)
+
+
+@sim_app.route('/api/v4/user', methods=['GET'])
+def gitlab_user():
+    simulate_latency(0.5)
+    return jsonify({"id": 7, "username": "sim-user", "name": "Sim User"})
+
+
+@sim_app.route('/api/v4/projects', methods=['GET'])
+def gitlab_projects():
+    simulate_latency()
+    projects = [gitlab_project(i) for i in range(1, SIM_CONFIG["projects"] + 1)]
+    if request.args.get("simple") == "true":
+        projects = [gitlab_simple_project(project) for project in projects]
+    return gitlab_page(projects)
+
+
+# Issues created or edited through the simulator, by (project id, iid),
+# layered over the generated ones with a current updated_at
+_issue_changes = {}
+_issues_lock = threading.Lock()
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def gitlab_project_issues(project_id):
+    """A project's issues, newest first: generated ones with simulated changes applied"""
+    issues = {iid: gitlab_issue(project_id, iid) for iid in range(1, SIM_CONFIG["issues_per_project"] + 1)}
+    with _issues_lock:
+        issues.update({iid: dict(issue) for (pid, iid), issue in _issue_changes.items() if pid == project_id})
+    return [issues[iid] for iid in sorted(issues, reverse=True)]
+
+
+@sim_app.route('/api/v4/projects/<int:project_id>/issues', methods=['GET', 'POST'])
+def gitlab_issues(project_id):
+    simulate_latency()
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        with _issues_lock:
+            iid = max([SIM_CONFIG["issues_per_project"]] + [i for pid, i in _issue_changes if pid == project_id]) + 1
+            issue = gitlab_issue(project_id, iid)
+            issue.update({
+                "title": body.get("title", issue["title"]),
+                "description": body.get("description"),
+                "state": "opened",
+                "created_at": now_iso(),
+                "updated_at": now_iso(),
+            })
+            _issue_changes[(project_id, issue["iid"])] = issue
+        return jsonify(issue), 201
+
+    issues = gitlab_project_issues(project_id)
+    state = request.args.get("state")
+    if state and state != "all":
+        issues = [i for i in issues if i["state"] == state]
+    updated_after = request.args.get("updated_after")
+    if updated_after:
+        # Inclusive, as in GitLab
+        issues = [i for i in issues if i["updated_at"] >= updated_after]
+    order_by = request.args.get("order_by")
+    if order_by in ("created_at", "updated_at"):
+        issues.sort(key=lambda i: (i[order_by], i["id"]), reverse=request.args.get("sort", "desc") == "desc")
+    return gitlab_page(issues)
+
+
+@sim_app.route('/api/v4/projects/<int:project_id>/issues/<int:iid>', methods=['PUT'])
+def gitlab_update_issue(project_id, iid):
+    """Edit title, description or state (state_event=close|reopen) of an issue"""
+    simulate_latency()
+    issues = {issue["iid"]: issue for issue in gitlab_project_issues(project_id)}
+    if iid not in issues:
+        return jsonify({"message": "404 Issue Not Found"}), 404
+    body = request.get_json(silent=True) or {}
+    issue = issues[iid]
+    issue.update({key: body[key] for key in ("title", "description") if key in body})
+    if body.get("state_event") in ("close", "reopen"):
+        issue["state"] = "closed" if body["state_event"] == "close" else "opened"
+    issue["updated_at"] = now_iso()
+    with _issues_lock:
+        _issue_changes[(project_id, iid)] = issue
+    return jsonify(issue)
+
+
+# ----------------- Gmail -----------------
+
+def parse_fields(spec):
+    """Parse a Google API field mask ("a,b/c,d(e,f)") into a tree of dicts"""
+    tree = {}
+    depth, start = 0, 0
+    items = []
+    for i, char in enumerate(spec + ","):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            items.append(spec[start:i].strip())
+            start = i + 1
+    for item in filter(None, items):
+        path, _, inner = item.partition("(")
+        node = tree
+        for key in path.split("/"):
+            node = node.setdefault(key, {})
+        if inner:
+            node.update(parse_fields(inner[:-1]))
+    return tree
+
+
+def apply_fields(value, tree):
+    """Keep only the parts of a response selected by a parsed field mask"""
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [apply_fields(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: apply_fields(value[key], sub) for key, sub in tree.items() if key in value}
+    return value
+
+
+def gmail_json(result, args):
+    """JSON response honouring the `fields` query parameter"""
+    fields = args.get("fields")
+    return apply_fields(result, parse_fields(fields)) if fields else result
+
+
+# Messages sent through the simulator, appended to the generated mailbox.
+# Each one is a history record after the mailbox's initial history id.
+_sent_messages = []
+_mailbox_lock = threading.Lock()
+
+FIRST_HISTORY_ID = 100000
+
+
+def gmail_history_id():
+    """Current history id of the mailbox"""
+    with _mailbox_lock:
+        return FIRST_HISTORY_ID + SIM_CONFIG["messages"] + len(_sent_messages)
+
+
+def gmail_message_ids():
+    """Message indexes newest first: sent messages, then the generated ones"""
+    with _mailbox_lock:
+        sent = len(_sent_messages)
+    base = SIM_CONFIG["messages"]
+    return list(range(base + sent - 1, base - 1, -1)) + list(range(base))
+
+
+def gmail_internal_date(index):
+    """internalDate (ms) of a message index"""
+    if index >= SIM_CONFIG["messages"]:
+        with _mailbox_lock:
+            return _sent_messages[index - SIM_CONFIG["messages"]]["internal_date"]
+    return 1747656000000 - index * 60000
+
+
+def gmail_message(index, fmt="full", metadata_headers=None):
+    message_id = f"{index:016x}"
+    headers = [
+        {"name": "Subject", "value": f"Simulated message {index}"},
+        {"name": "From", "value": f"Sender {index % 17} <sender{index % 17}@example.com>"},
+        {"name": "Date", "value": f"Mon, 19 May 2025 {index % 24:02d}:00:00 +0000"},
+        {"name": "To", "value": "me@example.com"},
+    ]
+    message = {
+        "id": message_id,
+        "threadId": message_id,
+        "labelIds": ["INBOX"],
+        "snippet": fake_words(25, seed=f"mail-{index}"),
+        "historyId": str(FIRST_HISTORY_ID + index),
+        "internalDate": str(gmail_internal_date(index)),
+        "sizeEstimate": 4096,
+    }
+    if index >= SIM_CONFIG["messages"]:
+        with _mailbox_lock:
+            sent = _sent_messages[index - SIM_CONFIG["messages"]]
+        headers = [
+            {"name": "Subject", "value": sent["subject"]},
+            {"name": "From", "value": "me@example.com"},
+            {"name": "Date", "value": sent["date"]},
+            {"name": "To", "value": sent["to"]},
+        ]
+        message.update({
+            "labelIds": ["SENT"],
+            "snippet": sent["snippet"],
+            "historyId": str(sent["history_id"]),
+            "internalDate": str(sent["internal_date"]),
+        })
+    if fmt == "metadata":
+        names = metadata_headers or []
+        message["payload"] = {"headers": [h for h in headers if not names or h["name"] in names]}
+    elif fmt != "minimal":
+        body = base64.urlsafe_b64encode(fake_words(400, seed=f"body-{index}").encode()).decode()
+        message["payload"] = {"mimeType": "text/plain", "headers": headers, "body": {"size": 2400, "data": body}}
+    return message
+
+
+@sim_app.route('/gmail/v1/users/me/profile', methods=['GET'])
+def gmail_profile():
+    simulate_latency(0.5)
+    return jsonify({
+        "emailAddress": "me@example.com",
+        "messagesTotal": len(gmail_message_ids()),
+        "threadsTotal": len(gmail_message_ids()),
+        "historyId": str(gmail_history_id()),
+    })
+
+
+@sim_app.route('/gmail/v1/users/me/messages', methods=['GET'])
+def gmail_list_messages():
+    simulate_latency()
+    max_results = min(500, int(request.args.get("maxResults", 100)))
+    start = int(request.args.get("pageToken") or 0)
+    indexes = gmail_message_ids()
+    # Of Gmail's search operators only before:<epoch seconds> is simulated
+    before = re.search(r'\bbefore:(\d+)\b', request.args.get("q", ""))
+    if before:
+        indexes = [i for i in indexes if gmail_internal_date(i) < int(before.group(1)) * 1000]
+    end = min(len(indexes), start + max_results)
+    result = {
+        "messages": [{"id": f"{i:016x}", "threadId": f"{i:016x}"} for i in indexes[start:end]],
+        "resultSizeEstimate": len(indexes),
+    }
+    if end < len(indexes):
+        result["nextPageToken"] = str(end)
+    return jsonify(gmail_json(result, request.args))
+
+
+@sim_app.route('/gmail/v1/users/me/history', methods=['GET'])
+def gmail_history():
+    """Changes after startHistoryId; only messageAdded records are produced"""
+    simulate_latency()
+    start_history_id = int(request.args.get("startHistoryId", 0))
+    if start_history_id < FIRST_HISTORY_ID:
+        return jsonify({"error": {"code": 404, "message": "Requested entity was not found."}}), 404
+
+    max_results = min(500, int(request.args.get("maxResults", 100)))
+    with _mailbox_lock:
+        records = [
+            {
+                "id": str(sent["history_id"]),
+                "messages": [{"id": f"{sent['index']:016x}", "threadId": f"{sent['index']:016x}"}],
+                "messagesAdded": [{"message": {
+                    "id": f"{sent['index']:016x}",
+                    "threadId": f"{sent['index']:016x}",
+                    "labelIds": ["SENT"],
+                }}],
+            }
+            for sent in _sent_messages if sent["history_id"] > start_history_id
+        ]
+    start = int(request.args.get("pageToken") or 0)
+    result = {"historyId": str(gmail_history_id())}
+    if records[start:start + max_results]:
+        result["history"] = records[start:start + max_results]
+    if start + max_results < len(records):
+        result["nextPageToken"] = str(start + max_results)
+    return jsonify(gmail_json(result, request.args))
+
+
+def gmail_message_result(message_id, args):
+    """(status code, body) of a messages.get call"""
+    try:
+        index = int(message_id, 16)
+    except ValueError:
+        return 404, {"error": {"code": 404, "message": "Not Found"}}
+    message = gmail_message(index, args.get("format", "full"), args.getlist("metadataHeaders"))
+    return 200, gmail_json(message, args)
+
+
+@sim_app.route('/gmail/v1/users/me/messages/<message_id>', methods=['GET'])
+def gmail_get_message(message_id):
+    simulate_latency()
+    status, body = gmail_message_result(message_id, request.args)
+    return jsonify(body), status
+
+
+class _QueryArgs:
+    """The parts of werkzeug's MultiDict interface used by the handlers"""
+
+    def __init__(self, query):
+        self._values = parse_qs(query)
+
+    def get(self, key, default=None):
+        return self._values.get(key, [default])[0]
+
+    def getlist(self, key):
+        return self._values.get(key, [])
+
+
+@sim_app.route('/batch/gmail/v1', methods=['POST'])
+def gmail_batch():
+    """
+    Batch endpoint: a multipart/mixed body of application/http requests is
+    answered in one round trip. Only messages.get is supported inside a batch.
+    """
+    simulate_latency()
+    head = f"Content-Type: {request.headers.get('Content-Type', '')}\r\n\r\n".encode()
+    batch = email.parser.BytesParser().parsebytes(head + request.get_data())
+    if not batch.is_multipart():
+        return jsonify({"error": {"code": 400, "message": "Batch body must be multipart/mixed"}}), 400
+
+    boundary = f"batch_{uuid.uuid4().hex}"
+    chunks = []
+    for part in batch.get_payload():
+        request_line = part.get_payload().split("\n", 1)[0].strip()
+        method, target = request_line.split(" ")[:2]
+        url = urlsplit(target)
+        prefix = "/gmail/v1/users/me/messages/"
+        if SIM_CONFIG["gmail_batch_error_rate"] and _random() < SIM_CONFIG["gmail_batch_error_rate"]:
+            status, body = 429, {"error": {"code": 429, "message": "Too many concurrent requests for user"}}
+        elif method == "GET" and url.path.startswith(prefix):
+            status, body = gmail_message_result(url.path[len(prefix):], _QueryArgs(url.query))
+        else:
+            status, body = 404, {"error": {"code": 404, "message": "Not Found"}}
+        content_id = (part.get("Content-ID") or "").strip("<>")
+        chunks.append(
+            f"--{boundary}\r\n"
+            "Content-Type: application/http\r\n"
+            f"Content-ID: <response-{content_id}>\r\n\r\n"
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            "Content-Type: application/json; charset=UTF-8\r\n\r\n"
+            f"{json.dumps(body)}\r\n"
+        )
+    chunks.append(f"--{boundary}--\r\n")
+    return Response("".join(chunks), mimetype=f"multipart/mixed; boundary={boundary}")
+
+
+@sim_app.route('/gmail/v1/users/me/messages/send', methods=['POST'])
+def gmail_send():
+    simulate_latency()
+    raw = (request.get_json(silent=True) or {}).get("raw", "")
+    sent = email.parser.BytesParser().parsebytes(base64.urlsafe_b64decode(raw.encode() + b"==="))
+    now = datetime.now(timezone.utc)
+    with _mailbox_lock:
+        index = SIM_CONFIG["messages"] + len(_sent_messages)
+        entry = {
+            "index": index,
+            "history_id": FIRST_HISTORY_ID + index + 1,
+            "subject": sent.get("Subject", ""),
+            "to": sent.get("To", ""),
+            "date": now.strftime("%a, %d %b %Y %H:%M:%S +0000"),
+            "snippet": str(sent.get_payload())[:200],
+            "internal_date": int(now.timestamp() * 1000),
+        }
+        _sent_messages.append(entry)
+    return jsonify({"id": f"{index:016x}", "threadId": f"{index:016x}", "labelIds": ["SENT"]})
+
+
+def write_gmail_token(path):
+    """Write a pickled credential the MCP server accepts as valid"""
+    import pickle
+    from google.oauth2.credentials import Credentials
+
+    with open(path, 'wb') as token:
+        pickle.dump(Credentials(token="simulated-token"), token)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run offline upstream simulators")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=SIM_CONFIG["latency"], help="mean added latency in seconds")
+    parser.add_argument("--jitter", type=float, default=SIM_CONFIG["jitter"], help="uniform jitter in seconds")
+    parser.add_argument("--token-rate", type=float, default=SIM_CONFIG["token_rate"], help="completion tokens per second")
+    parser.add_argument("--completion-tokens", type=int, default=SIM_CONFIG["completion_tokens"])
+    parser.add_argument("--error-rate", type=float, default=SIM_CONFIG["error_rate"], help="fraction of OpenAI calls answered with 429")
+    parser.add_argument("--gmail-batch-error-rate", type=float, default=SIM_CONFIG["gmail_batch_error_rate"],
+                        help="fraction of calls inside Gmail batches answered with 429")
+    parser.add_argument("--projects", type=int, default=SIM_CONFIG["projects"])
+    parser.add_argument("--issues-per-project", type=int, default=SIM_CONFIG["issues_per_project"])
+    parser.add_argument("--messages", type=int, default=SIM_CONFIG["messages"])
+    parser.add_argument("--write-gmail-token", metavar="PATH", help="write a simulator Gmail token file and exit")
+    args = parser.parse_args()
+
+    if args.write_gmail_token:
+        write_gmail_token(args.write_gmail_token)
+        print(f"Wrote simulator Gmail token to {args.write_gmail_token}")
+    else:
+        SIM_CONFIG.update({
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "token_rate": args.token_rate,
+            "completion_tokens": args.completion_tokens,
+            "error_rate": args.error_rate,
+            "gmail_batch_error_rate": args.gmail_batch_error_rate,
+            "projects": args.projects,
+            "issues_per_project": args.issues_per_project,
+            "messages": args.messages,
+        })
+        sim_app.run(host='0.0.0.0', port=args.port, threaded=True)
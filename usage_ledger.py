@@ -0,0 +1,195 @@
+"""
+Token, cost and latency accounting for crew runs.
+
+Every LLM call reports its token usage, latency and retries to the ledger of
+the run it belongs to, attributed to the task that made it. Calls are
+matched to tasks through context variables: the dependency-graph executor
+sets the task on each worker, and in a sequential crew run the single task
+in flight is used. Ledgers are saved per run and summarized across runs
+with percentiles.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# USD per million (prompt, completion) tokens; extend or override with
+# LLM_PRICES='{"model": [prompt, completion]}'
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+MODEL_PRICES.update({model: tuple(prices) for model, prices in json.loads(os.getenv("LLM_PRICES", "{}")).items()})
+
+_current_run = contextvars.ContextVar("usage_run", default=None)
+_current_task = contextvars.ContextVar("usage_task", default=None)
+
+
+def call_cost(model, prompt_tokens, completion_tokens):
+    """Estimated USD cost of one call, or 0.0 for unknown models"""
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        # Versioned names such as gpt-4o-mini-2024-07-18 use the base model's price
+        matches = [name for name in MODEL_PRICES if model and model.startswith(name)]
+        prices = MODEL_PRICES[max(matches, key=len)] if matches else (0.0, 0.0)
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1e6
+
+
+class TaskUsage:
+    """Counters for one task of one run"""
+
+    FIELDS = ("prompt_tokens", "completion_tokens", "llm_calls", "retries", "llm_seconds", "cost_usd")
+
+    def __init__(self, task):
+        self.task = task
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.llm_calls = 0
+        self.retries = 0
+        self.llm_seconds = 0.0
+        self.cost_usd = 0.0
+        self.wall_seconds = None
+        self.models = set()
+
+    def to_dict(self):
+        entry = {"task": self.task, "wall_seconds": self.wall_seconds, "models": sorted(self.models)}
+        for field in self.FIELDS:
+            value = getattr(self, field)
+            entry[field] = round(value, 6) if isinstance(value, float) else value
+        return entry
+
+
+class RunLedger:
+    """Per-task usage of one crew run"""
+
+    UNATTRIBUTED = "unattributed"
+
+    def __init__(self, research_id):
+        self.research_id = research_id
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._tasks = {}
+        self._active = []
+
+    def _usage(self, task):
+        if task not in self._tasks:
+            self._tasks[task] = TaskUsage(task)
+        return self._tasks[task]
+
+    def task_started(self, task):
+        with self._lock:
+            self._usage(task)
+            self._active.append(task)
+
+    def task_finished(self, task, wall_seconds):
+        with self._lock:
+            self._usage(task).wall_seconds = round(wall_seconds, 3)
+            if task in self._active:
+                self._active.remove(task)
+
+    def _attribute(self, task):
+        # Without an explicit task, only an unambiguous single active task will do
+        if task is None:
+            task = self._active[0] if len(self._active) == 1 else self.UNATTRIBUTED
+        return self._usage(task)
+
+    def record_call(self, task, model, prompt_tokens, completion_tokens, seconds):
+        with self._lock:
+            usage = self._attribute(task)
+            usage.llm_calls += 1
+            usage.prompt_tokens += prompt_tokens
+            usage.completion_tokens += completion_tokens
+            usage.llm_seconds += seconds
+            usage.cost_usd += call_cost(model, prompt_tokens, completion_tokens)
+            if model:
+                usage.models.add(model)
+
+    def record_retry(self, task):
+        with self._lock:
+            self._attribute(task).retries += 1
+
+    def to_dict(self):
+        with self._lock:
+            tasks = [usage.to_dict() for usage in self._tasks.values()]
+        totals = {field: sum(task[field] for task in tasks) for field in TaskUsage.FIELDS}
+        totals["cost_usd"] = round(totals["cost_usd"], 6)
+        totals["llm_seconds"] = round(totals["llm_seconds"], 3)
+        return {
+            "research_id": self.research_id,
+            "started_at": self.started_at,
+            "tasks": tasks,
+            "totals": totals,
+        }
+
+
+@contextmanager
+def track_run(ledger):
+    """Send usage of LLM calls made inside the block to `ledger`"""
+    token = _current_run.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _current_run.reset(token)
+
+
+@contextmanager
+def track_task(task):
+    """Attribute LLM calls made inside the block to `task`"""
+    token = _current_task.set(task)
+    try:
+        yield
+    finally:
+        _current_task.reset(token)
+
+
+def record_llm_call(model, prompt_tokens, completion_tokens, seconds):
+    """Report one completed LLM call to the current run, if any"""
+    ledger = _current_run.get()
+    if ledger is not None:
+        ledger.record_call(_current_task.get(), model, prompt_tokens, completion_tokens, seconds)
+
+
+def record_llm_retry():
+    """Report a retried LLM call to the current run, if any"""
+    ledger = _current_run.get()
+    if ledger is not None:
+        ledger.record_retry(_current_task.get())
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def summarize_usage(rows):
+    """
+    Aggregate per-task rows from many runs into totals and p50/p90/p95 of
+    wall time, tokens and cost per task, most expensive tasks first.
+    """
+    by_task = {}
+    for row in rows:
+        by_task.setdefault(row["task"], []).append(row)
+
+    summary = []
+    for task, task_rows in by_task.items():
+        entry = {"task": task, "runs": len({row["research_id"] for row in task_rows})}
+        for field in ("wall_seconds", "prompt_tokens", "completion_tokens", "llm_calls", "retries", "cost_usd"):
+            values = sorted(row[field] for row in task_rows if row[field] is not None)
+            entry[field] = {
+                "total": round(sum(values), 6),
+                "mean": round(sum(values) / len(values), 6) if values else None,
+                "p50": percentile(values, 50),
+                "p90": percentile(values, 90),
+                "p95": percentile(values, 95),
+            }
+        summary.append(entry)
+    summary.sort(key=lambda entry: entry["cost_usd"]["total"], reverse=True)
+    return summary